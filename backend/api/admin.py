@@ -1,13 +1,25 @@
 from django.contrib import admin
-from .models import Registration, Attendance
+from .models import Registration, Attendance, Section, ArchivedSchoolYear
+
+@admin.register(Section)
+class SectionAdmin(admin.ModelAdmin):
+    list_display = ('grade', 'name', 'adviser', 'school_year')
+    list_filter = ('school_year', 'grade')
+    search_fields = ('name', 'adviser')
 
 @admin.register(Registration)
 class RegistrationAdmin(admin.ModelAdmin):
-    list_display = ('student', 'lrn', 'sex', 'created_at')
+    list_display = ('student', 'lrn', 'sex', 'section', 'created_at')
+    list_filter = ('section',)
     search_fields = ('student', 'lrn', 'parent', 'guardian')
 
 @admin.register(Attendance)
 class AttendanceAdmin(admin.ModelAdmin):
-    list_display = ('student', 'time')
-    list_filter = ('time',)
+    list_display = ('student', 'time', 'local_date', 'session')
+    list_filter = ('local_date', 'session')
     search_fields = ('student__student', 'student__lrn')
+
+@admin.register(ArchivedSchoolYear)
+class ArchivedSchoolYearAdmin(admin.ModelAdmin):
+    list_display = ('school_year', 'filename', 'size_bytes', 'created_at')
+    readonly_fields = ('school_year', 'filename', 'size_bytes', 'sha256', 'counts', 'created_at')
@@ -0,0 +1,293 @@
+"""Cold storage for closed school years.
+
+archive_school_year() writes one zip per school year under settings.ARCHIVE_DIR, records
+it in the ArchivedSchoolYear index and then removes the year's rows from the database in
+chunked deletes (api/bulk_delete.py), so the hot database only holds the current year.
+
+Each table is stored column by column (one JSON array per field, dates and times as
+integers) and deflated, which compresses the repetitive attendance columns well and
+needs nothing beyond the standard library. SchoolYearArchive reads a file back
+read-only; export_school_year() and month_summary() regenerate the year's SF2 workbook
+and statistics from it with the same renderers the live exports use.
+"""
+import calendar
+import hashlib
+import json
+import os
+import zipfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import bulk_delete, presence_matrix, versioning
+from .models import (
+    ArchivedSchoolYear, Attendance, DroppedRegistration, MonthlyPresence, Registration, Section,
+)
+from .utils_export import (
+    MatrixPresence, SetPresence, _split_roster, current_school_year, export_path, mask_presence,
+    matrix_month_summary, render_school_year_workbook, school_year_bounds, school_year_months,
+)
+
+ARCHIVE_FORMAT = 1
+
+# table name -> (model, archived fields); `id` columns keep the original primary keys
+TABLES = {
+    'sections': (Section, ['id', 'grade', 'name', 'adviser', 'school_year', 'created_at']),
+    'registrations': (Registration, ['id', 'lrn', 'student', 'sex', 'parent', 'guardian', 'section_id', 'created_at']),
+    'dropped': (DroppedRegistration, ['id', 'lrn', 'student', 'sex', 'parent', 'guardian', 'dropped_at',
+                                      'original_id', 'section_id']),
+    'attendance': (Attendance, ['id', 'student_id', 'time', 'local_date', 'session']),
+    'presence': (MonthlyPresence, ['student_id', 'year', 'month', 'am_mask', 'pm_mask']),
+}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class ArchiveError(Exception):
+    """A school year can't be archived, or has no archive."""
+
+
+def archive_dir() -> str:
+    path = str(getattr(settings, 'ARCHIVE_DIR', os.path.join(str(settings.BASE_DIR), 'archives')))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _field_kind(model, name: str):
+    field = model._meta.get_field(name)
+    if isinstance(field, models.DateTimeField):
+        return 'datetime'
+    if isinstance(field, models.DateField):
+        return 'date'
+    return None
+
+
+def _encode(kind, value):
+    if value is None or kind is None:
+        return value
+    if kind == 'datetime':
+        # microseconds since the epoch: exact, and small once deflated
+        return (value - EPOCH) // timedelta(microseconds=1)
+    return value.toordinal()
+
+
+def _decode(kind, value):
+    if value is None or kind is None:
+        return value
+    if kind == 'datetime':
+        return EPOCH + timedelta(microseconds=value)
+    return date.fromordinal(value)
+
+
+def year_querysets(school_year: int) -> Dict[str, models.QuerySet]:
+    """The rows of each archived table that belong to `school_year`."""
+    start, end = school_year_bounds(school_year)
+    period = Q()
+    for year, month in school_year_months(school_year):
+        period |= Q(year=year, month=month)
+    attendance = Attendance.objects.filter(local_date__gte=start, local_date__lte=end)
+    presence = MonthlyPresence.objects.filter(period)
+    # the year's roster: its sections' learners plus anyone with a scan that year
+    registrations = Registration.objects.filter(
+        Q(section__school_year=school_year)
+        | Q(pk__in=attendance.values('student_id'))
+        | Q(pk__in=presence.values('student_id'))
+    )
+    dropped = DroppedRegistration.objects.filter(
+        Q(section__school_year=school_year)
+        | Q(section__isnull=True, dropped_at__date__gte=start, dropped_at__date__lte=end)
+    )
+    return {
+        'sections': Section.objects.filter(school_year=school_year),
+        'registrations': registrations,
+        'dropped': dropped,
+        'attendance': attendance,
+        'presence': presence,
+    }
+
+
+def write_archive(school_year: int, path: str) -> Dict[str, int]:
+    """Write the year's rows to a new archive at `path`; returns rows written per table."""
+    counts = {}
+    querysets = year_querysets(school_year)
+    tmp = path + '.tmp'
+    with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+        for name, (model, fields) in TABLES.items():
+            kinds = [_field_kind(model, f) for f in fields]
+            columns: List[list] = [[] for _ in fields]
+            rows = querysets[name].order_by(*(['pk'] if 'id' in fields else fields[:3])).values_list(*fields)
+            for row in rows.iterator(chunk_size=2000):
+                for column, kind, value in zip(columns, kinds, row):
+                    column.append(_encode(kind, value))
+            counts[name] = len(columns[0])
+            zf.writestr(f'{name}.json', json.dumps(dict(zip(fields, columns)), separators=(',', ':')))
+        zf.writestr('manifest.json', json.dumps({
+            'format': ARCHIVE_FORMAT,
+            'school_year': school_year,
+            'created_at': timezone.now().isoformat(),
+            'counts': counts,
+            'tables': {name: fields for name, (_, fields) in TABLES.items()},
+        }))
+    os.replace(tmp, path)
+    return counts
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def purge_school_year(school_year: int, chunk_size: Optional[int] = None,
+                      purge_registrations: bool = False) -> Dict[str, int]:
+    """Delete an archived year's rows from the database; returns rows deleted per table.
+
+    Learners still in one of the year's sections leave with it unless they have later
+    scans. Registrations without a section carry no school year, so a continuing learner
+    who hasn't scanned yet looks just like one who left: they are kept, and only their
+    scans from the year go, unless purge_registrations also removes those registered
+    before the year ended and without later scans.
+    """
+    _, end = school_year_bounds(school_year)
+    querysets = year_querysets(school_year)
+    roster = list(querysets['registrations'].values_list('pk', flat=True))
+    deleted = {
+        'presence': bulk_delete.delete_in_chunks(querysets['presence'], chunk_size, versioning.ATTENDANCE_CHANGE),
+        'attendance': bulk_delete.delete_in_chunks(querysets['attendance'], chunk_size, versioning.ATTENDANCE_CHANGE),
+        'dropped': bulk_delete.delete_in_chunks(querysets['dropped'], chunk_size, versioning.DROPPED),
+    }
+    unsectioned = Q(section__isnull=True, created_at__date__gt=end) if purge_registrations else Q(section__isnull=True)
+    active = Registration.objects.filter(pk__in=roster).filter(
+        Q(attendance__isnull=False)
+        | Q(section__school_year__gt=school_year)
+        | unsectioned
+    ).values_list('pk', flat=True)
+    leaving = set(roster) - set(active)
+    deleted['registrations'] = bulk_delete.delete_registrations(leaving, chunk_size)
+    # sections go once nobody is left in them; the ORM delete nulls any dropped-learner links
+    sections = querysets['sections'].filter(registrations__isnull=True)
+    deleted['sections'] = sections.delete()[1].get(Section._meta.label, 0)
+    return deleted
+
+
+def archive_school_year(school_year: int, purge: bool = True, chunk_size: Optional[int] = None,
+                        purge_registrations: bool = False) -> ArchivedSchoolYear:
+    """Archive a closed school year to disk, index it and (by default) purge it from the database."""
+    _, end = school_year_bounds(school_year)
+    if end >= timezone.localdate():
+        raise ArchiveError(f'School year {school_year}-{school_year + 1} has not ended yet')
+    if ArchivedSchoolYear.objects.filter(school_year=school_year).exists():
+        raise ArchiveError(f'School year {school_year}-{school_year + 1} is already archived')
+
+    filename = f'school_year_{school_year}-{school_year + 1}.zip'
+    path = os.path.join(archive_dir(), filename)
+    counts = write_archive(school_year, path)
+    with transaction.atomic():
+        entry = ArchivedSchoolYear.objects.create(
+            school_year=school_year, filename=filename, size_bytes=os.path.getsize(path),
+            sha256=_sha256(path), counts=counts,
+        )
+    if purge:
+        purge_school_year(school_year, chunk_size, purge_registrations)
+    return entry
+
+
+def closed_school_years() -> List[int]:
+    """Ended school years that still have rows in the database and no archive yet."""
+    first = Attendance.objects.order_by('local_date').values_list('local_date', flat=True).first()
+    if first is None:
+        return []
+    archived = set(ArchivedSchoolYear.objects.values_list('school_year', flat=True))
+    return [
+        sy for sy in range(current_school_year(first), current_school_year())
+        if sy not in archived and school_year_bounds(sy)[1] < timezone.localdate()
+    ]
+
+
+class SchoolYearArchive:
+    """Read-only view of one archive file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with zipfile.ZipFile(path) as zf:
+            self.manifest = json.loads(zf.read('manifest.json'))
+        if self.manifest.get('format') != ARCHIVE_FORMAT:
+            raise ArchiveError(f'Unsupported archive format: {self.manifest.get("format")}')
+        self.school_year = self.manifest['school_year']
+        self._tables = {}
+
+    @classmethod
+    def open(cls, school_year: int) -> 'SchoolYearArchive':
+        entry = ArchivedSchoolYear.objects.filter(school_year=school_year).first()
+        if entry is None:
+            raise ArchiveError(f'School year {school_year}-{school_year + 1} is not archived')
+        return cls(os.path.join(archive_dir(), entry.filename))
+
+    def columns(self, name: str) -> Dict[str, list]:
+        """{field: decoded values} for one table, read from the file once."""
+        if name not in self._tables:
+            with zipfile.ZipFile(self.path) as zf:
+                raw = json.loads(zf.read(f'{name}.json'))
+            model, _ = TABLES[name]
+            self._tables[name] = {f: [_decode(_field_kind(model, f), v) for v in values] for f, values in raw.items()}
+        return self._tables[name]
+
+    def rows(self, name: str, *fields: str) -> list:
+        columns = self.columns(name)
+        return list(zip(*(columns[f] for f in fields)))
+
+    def registrations(self, section_id: Optional[int] = None) -> List[Registration]:
+        """The archived roster as unsaved Registration instances, ordered by name."""
+        columns = self.columns('registrations')
+        regs = [Registration(**dict(zip(columns, values))) for values in zip(*columns.values())]
+        if section_id is not None:
+            regs = [r for r in regs if r.section_id == section_id]
+        return sorted(regs, key=lambda r: (r.student, r.pk))
+
+    def presence(self, student_ids):
+        """Presence source for render_school_year_workbook, like load_school_year_presence."""
+        wanted = set(student_ids)
+        rows = [row for row in self.rows('presence', *TABLES['presence'][1]) if row[0] in wanted]
+        if presence_matrix.available():
+            matrices = presence_matrix.matrices_from_rows(school_year_months(self.school_year), student_ids, rows)
+            return MatrixPresence({month: matrix for (_, month), matrix in matrices.items()})
+        return SetPresence(mask_presence(rows))
+
+
+def export_school_year(school_year: int, include_names: bool = False, section_id: Optional[int] = None) -> str:
+    """Regenerate an archived year's SF2 workbook under exports/; returns the filename."""
+    archive = SchoolYearArchive.open(school_year)
+    registrations = archive.registrations(section_id)
+    bio = render_school_year_workbook(registrations, archive.presence([r.pk for r in registrations]), include_names)
+    label = f"_sec{section_id}" if section_id is not None else ''
+    filename = f"sf2_{school_year}-{school_year + 1}{label}_archived_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    with open(export_path(filename), 'wb') as dest:
+        dest.write(bio.getvalue())
+    return filename
+
+
+def month_summary(school_year: int, year: int, month: int, section_id: Optional[int] = None) -> dict:
+    """utils_export.sf2_month_summary for a month of an archived year. Requires NumPy."""
+    if not presence_matrix.available():
+        raise RuntimeError('NumPy is required for SF2 summaries')
+    if (year, month) not in school_year_months(school_year):
+        raise ArchiveError(f'{year}-{month:02d} is not in school year {school_year}-{school_year + 1}')
+    archive = SchoolYearArchive.open(school_year)
+    males, females = _split_roster(archive.registrations(section_id))
+    student_ids = [r.pk for r in males + females]
+    wanted = set(student_ids)
+    rows = [
+        row for row in archive.rows('presence', *TABLES['presence'][1])
+        if row[0] in wanted and (row[1], row[2]) == (year, month)
+    ]
+    matrix = presence_matrix.matrices_from_rows([(year, month)], student_ids, rows)[(year, month)]
+    last_day = date(year, month, calendar.monthrange(year, month)[1])
+    summary = matrix_month_summary(matrix, len(males), last_day)
+    summary['section'] = section_id
+    return summary
@@ -0,0 +1,145 @@
+"""Chunked deletes for end-of-year resets (clear attendance, clear the roster).
+
+A single QuerySet.delete() first collects every row for cascades and signals, then
+deletes them all in one transaction that holds the SQLite write lock while scans fail.
+These helpers delete in bounded primary-key ranges instead, each range in its own short
+transaction, using raw deletes because no per-row signal work is needed: data versions
+and the LRN cache are updated here per chunk, the presence rollup once the rows are gone.
+
+Only rows that existed when the operation started (pk <= the max pk seen then) are
+deleted, so scans and registrations made while a clear is running are kept.
+"""
+from datetime import date
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import events, presence, versioning
+from .lrn_cache import lrn_cache
+from .models import Attendance, MonthlyPresence, Registration
+
+Progress = Optional[Callable[[int, str], None]]
+
+
+def _chunk_size(chunk_size: Optional[int]) -> int:
+    return chunk_size or getattr(settings, 'BULK_DELETE_CHUNK_SIZE', 2000)
+
+
+def _pk_ranges(queryset, chunk_size: int):
+    """Yield (after, upto] pk bounds covering the rows of `queryset` that exist now,
+    at most `chunk_size` rows per range. Bounds are looked up lazily, so rows deleted
+    by earlier ranges are never re-read."""
+    last = queryset.aggregate(m=Max('pk'))['m']
+    if last is None:
+        return
+    after = 0
+    while after < last:
+        bound = list(
+            queryset.filter(pk__gt=after, pk__lte=last).order_by('pk')
+            .values_list('pk', flat=True)[chunk_size - 1:chunk_size]
+        )
+        upto = bound[0] if bound else last
+        yield after, upto
+        after = upto
+
+
+def _raw_delete(queryset) -> int:
+    return queryset._raw_delete(queryset.db)
+
+
+def delete_in_chunks(queryset, chunk_size: Optional[int] = None, version: Optional[str] = None) -> int:
+    """Raw-delete the rows of `queryset` that exist now, one short transaction per pk range.
+
+    `version` names a data version (see api/versioning.py) to bump with every chunk.
+    Returns the number of rows deleted.
+    """
+    deleted = 0
+    for after, upto in _pk_ranges(queryset, _chunk_size(chunk_size)):
+        with transaction.atomic():
+            deleted += _raw_delete(queryset.filter(pk__gt=after, pk__lte=upto))
+            if version is not None:
+                versioning.bump(version)
+    return deleted
+
+
+def _report(progress: Progress, done: int, total: int, what: str):
+    if progress is not None and total:
+        progress(min(99, done * 100 // total), f'Deleted {done} of {total} {what}')
+
+
+def clear_attendance(scope: str = 'today', chunk_size: Optional[int] = None, progress: Progress = None,
+                     today: Optional[date] = None) -> int:
+    """Delete today's ('today') or every ('all') attendance record; returns rows deleted."""
+    chunk_size = _chunk_size(chunk_size)
+    if scope == 'all':
+        records = Attendance.objects.all()
+        # drop the rollup first, so no export sees presence for scans that are gone
+        delete_in_chunks(MonthlyPresence.objects.all(), chunk_size, versioning.ATTENDANCE_CHANGE)
+    else:
+        today = today or timezone.localdate()
+        records = Attendance.objects.filter(local_date=today)
+
+    total = records.count()
+    deleted = 0
+    for after, upto in _pk_ranges(records, chunk_size):
+        with transaction.atomic():
+            deleted += _raw_delete(records.filter(pk__gt=after, pk__lte=upto))
+            versioning.bump(versioning.ATTENDANCE_CHANGE)
+        _report(progress, deleted, total, 'attendance records')
+
+    # only scans made while the clear ran are left; settle the rollup to them in one
+    # transaction, which the first write locks before they are read
+    with transaction.atomic():
+        if scope != 'all':
+            presence.clear_day(today)
+        versioning.bump(versioning.ATTENDANCE_CHANGE)
+        presence.mark_many(records.values_list('student_id', 'local_date', 'session').order_by())
+    events.publish_on_commit(events.ATTENDANCE_CLEARED, {'scope': scope})
+    return deleted
+
+
+def delete_registrations(student_ids, chunk_size: Optional[int] = None) -> int:
+    """Delete the given registrations with their scans and rollup rows, chunk by chunk."""
+    student_ids = sorted(student_ids)
+    chunk_size = _chunk_size(chunk_size)
+    deleted = 0
+    for i in range(0, len(student_ids), chunk_size):
+        ids = student_ids[i:i + chunk_size]
+        with transaction.atomic():
+            _raw_delete(Attendance.objects.filter(student_id__in=ids))
+            _raw_delete(MonthlyPresence.objects.filter(student_id__in=ids))
+            deleted += _raw_delete(Registration.objects.filter(pk__in=ids))
+            versioning.bump(versioning.REGISTRATION)
+            lrn_cache.clear()
+            transaction.on_commit(lrn_cache.clear)
+    return deleted
+
+
+def clear_registrations(chunk_size: Optional[int] = None, progress: Progress = None) -> int:
+    """Delete every registration with its attendance and rollup rows; returns registrations deleted.
+
+    Attendance, by far the largest table, is cleared first in its own chunks. Each
+    registration chunk then also removes the rows that cascade from it (scans and rollups
+    written in the meantime), so no orphans are left between chunks.
+    """
+    chunk_size = _chunk_size(chunk_size)
+    half = None if progress is None else (lambda pct, message: progress(pct // 2, message))
+    clear_attendance('all', chunk_size, half)
+
+    registrations = Registration.objects.all()
+    total = registrations.count()
+    deleted = 0
+    for after, upto in _pk_ranges(registrations, chunk_size):
+        with transaction.atomic():
+            _raw_delete(Attendance.objects.filter(student_id__gt=after, student_id__lte=upto))
+            _raw_delete(MonthlyPresence.objects.filter(student_id__gt=after, student_id__lte=upto))
+            deleted += _raw_delete(registrations.filter(pk__gt=after, pk__lte=upto))
+            versioning.bump(versioning.REGISTRATION)
+            lrn_cache.clear()
+            transaction.on_commit(lrn_cache.clear)
+        if progress is not None:
+            progress(50 + min(49, deleted * 50 // total), f'Deleted {deleted} of {total} registrations')
+    return deleted
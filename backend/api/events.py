@@ -0,0 +1,179 @@
+"""In-process event bus behind the live dashboard feed (GET /api/events/, Server-Sent Events).
+
+Writers publish small events once their transaction commits: 'attendance' for every
+inserted scan (in the attendance_today row shape plus the section id), 'dropped' and
+'restored' for roster moves, and 'attendance_cleared' after a clear, telling dashboards to
+refetch. Events are kept in a bounded ring buffer so a reconnecting client can resume
+from its Last-Event-ID; ids carry a per-process boot token, so after a restart, or when
+the client fell further behind than the buffer holds, the stream starts with a 'reset'
+event instead and the client reloads the lists once.
+
+Scan events are built from the saved row and the LRN cache, and skipped entirely while no
+stream is open, so the scan path pays nothing for the feed. A skip is remembered: a
+stream resuming from before it gets a 'reset' rather than a silent gap.
+
+Subscribers are asyncio queues of the ASGI event loop that serves the stream, fed from
+the (sync) request threads with call_soon_threadsafe. The bus lives in one process: run
+the ASGI server with a single worker process for the feed to see every write.
+"""
+import asyncio
+import itertools
+import json
+import threading
+import uuid
+from collections import deque
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from .lrn_cache import lrn_cache
+from .models import Attendance, Registration
+from .serializers import render_attendance_rows
+
+ATTENDANCE = 'attendance'
+DROPPED = 'dropped'
+RESTORED = 'restored'
+ATTENDANCE_CLEARED = 'attendance_cleared'
+# sent first when the requested Last-Event-ID can't be resumed from
+RESET = 'reset'
+
+
+class Subscription:
+    """One open stream: an asyncio queue on the loop that serves it."""
+
+    def __init__(self, loop, max_size: int):
+        self.loop = loop
+        self.queue = asyncio.Queue(max_size)
+        self.cursor = 0
+        # set when the client fell behind by a full queue; the stream then ends with a reset
+        self.overflowed = False
+
+    def _deliver(self, event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'id': event['id'], 'type': RESET, 'data': {}})
+
+
+class EventBus:
+    def __init__(self, max_events: int = 1000):
+        self.max_events = max_events
+        self.boot = uuid.uuid4().hex[:8]
+        self._seq = itertools.count(1)
+        self._events = deque(maxlen=max_events)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        # seq of the last event before events were skipped for want of subscribers
+        self._skipped_after = None
+
+    def publish(self, type: str, data: dict) -> dict:
+        """Append an event to the buffer and hand it to every open stream."""
+        with self._lock:
+            seq = next(self._seq)
+            event = {'id': f'{self.boot}-{seq}', 'type': type, 'data': data}
+            self._events.append((seq, event))
+            self.published = seq
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub._deliver, event)
+            except RuntimeError:  # the serving loop is gone; its stream unsubscribes itself
+                pass
+        return event
+
+    def since(self, last_event_id: Optional[str]) -> Optional[List[dict]]:
+        """Buffered events after `last_event_id` (none without one); None if some of the
+        events after it are no longer buffered or it comes from another process."""
+        if not last_event_id:
+            return []
+        boot, _, seq = last_event_id.partition('-')
+        if boot != self.boot or not seq.isdigit():
+            return None
+        seq = int(seq)
+        with self._lock:
+            if self._skipped_after is not None and seq <= self._skipped_after:
+                return None
+            if seq >= self.published:
+                return []
+            if seq < self._events[0][0] - 1:
+                return None
+            return [event for n, event in self._events if n > seq]
+
+    def listening(self) -> bool:
+        """Whether any stream is open; if not, the caller skips its event and the gap is noted."""
+        with self._lock:
+            if self._subscribers:
+                return True
+            self._skipped_after = self.published
+            return False
+
+    def subscribe(self, loop, max_size: Optional[int] = None) -> Subscription:
+        """Open a subscription; events after sub.cursor arrive on its queue, earlier ones
+        only through since()."""
+        sub = Subscription(loop, max_size or self.max_events)
+        with self._lock:
+            self._subscribers.add(sub)
+            sub.cursor = self.published
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'boot': self.boot, 'published': self.published, 'buffered': len(self._events),
+                    'subscribers': len(self._subscribers)}
+
+
+event_bus = EventBus(max_events=getattr(settings, 'EVENT_STREAM_BUFFER', 1000))
+
+
+def publish_on_commit(type: str, data: dict):
+    """Publish once the surrounding transaction commits (right away in autocommit)."""
+    transaction.on_commit(lambda: event_bus.publish(type, data))
+
+
+def _publish_attendance(objs):
+    students = {}
+    for obj in objs:
+        if Attendance.student.is_cached(obj):
+            students[obj.student_id] = (obj.student.student, obj.student.section_id)
+        else:
+            cached = lrn_cache.registration(obj.student_id)
+            if cached is not None:
+                students[obj.student_id] = cached
+    missing = {obj.student_id for obj in objs} - students.keys()
+    if missing:
+        students.update(
+            (pk, (student, section)) for pk, student, section in
+            Registration.objects.filter(pk__in=missing).values_list('id', 'student', 'section_id')
+        )
+    rows = []
+    for obj in sorted(objs, key=lambda o: (o.time, o.pk)):
+        student_name, section = students.get(obj.student_id, (None, None))
+        rows.append({
+            'id': obj.pk, 'student': obj.student_id, 'time': obj.time, 'local_date': obj.local_date,
+            'session': obj.session, 'student_name': student_name, 'section': section,
+        })
+    for row in render_attendance_rows(rows):
+        event_bus.publish(ATTENDANCE, row)
+
+
+def attendance_recorded(objs):
+    """Announce newly inserted (saved) scans after commit, if a stream is open."""
+    objs = list(objs)
+    if objs and event_bus.listening():
+        transaction.on_commit(lambda: _publish_attendance(objs))
+
+
+def format_event(event: dict) -> str:
+    """One Server-Sent Events frame."""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
@@ -0,0 +1,61 @@
+"""Size-bounded LRU cache of generated export files.
+
+Keys combine the export type and its parameters with the template's mtime and the current
+data version (api/versioning.py), so a hit means the saved file under exports/ would be
+rebuilt byte-for-byte the same and can be handed out again instead.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import versioning
+
+
+class ExportCache:
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> filename
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(kind: str, *params, template_path=None) -> tuple:
+        try:
+            mtime = os.path.getmtime(template_path) if template_path else None
+        except OSError:
+            mtime = None
+        return (kind,) + tuple(params) + (mtime, versioning.data_version())
+
+    def get(self, key):
+        """Filename for `key` if cached and still on disk, else None."""
+        with self._lock:
+            filename = self._entries.get(key)
+            if filename is not None and os.path.exists(os.path.join(str(settings.BASE_DIR), 'exports', filename)):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return filename
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, key, filename: str):
+        with self._lock:
+            self._entries[key] = filename
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                # evicted files stay in exports/ like any other saved export
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'size': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits, 'misses': self.misses}
+
+
+export_cache = ExportCache(max_entries=getattr(settings, 'EXPORT_CACHE_MAX_ENTRIES', 32))
@@ -0,0 +1,150 @@
+"""Group commit for single-scan POSTs.
+
+With settings.SCAN_GROUP_COMMIT on, record_attendance hands its row to a writer thread
+instead of committing it itself. The writer waits at most SCAN_GROUP_COMMIT_MAX_WAIT_MS
+after the first pending scan (or until SCAN_GROUP_COMMIT_MAX_BATCH are queued), inserts
+everything collected in one transaction and resolves each request's future with its own
+outcome. A burst of kiosk scans then takes SQLite's write lock and fsyncs once instead of
+once per scan, and no request waits much longer than the window plus one commit.
+
+insert_scans() is the shared insert-or-ignore step, also used by record_attendance_batch.
+"""
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Max
+
+from . import events, presence
+from .models import Attendance
+
+
+def insert_scans(objs: Sequence[Attendance]) -> List[Tuple[bool, Optional[int]]]:
+    """Insert stamped Attendance objects in one transaction, ignoring repeat scans.
+
+    Returns (created, id) per object, in order. The first object per (student, date,
+    session) wins, like the DB constraint; later ones, and ones whose slot was already
+    taken by a stored scan, come back as (False, id of the stored scan). Re-sending a
+    stored scan with its original time counts as created, so kiosk retries are safe.
+    """
+    first = {}  # (student, date, session) -> index of the first object
+    for idx, obj in enumerate(objs):
+        first.setdefault((obj.student_id, obj.local_date, obj.session), idx)
+    if not first:
+        return []
+
+    # only rows this call inserts are announced, so look for them only with a stream open
+    announce = events.event_bus.listening()
+    with transaction.atomic():
+        # bulk_create sends no signals; a conflicting row already set the same bit. Marking
+        # first also takes the write lock before the read below.
+        presence.mark_many(first.keys())
+        # ids only grow and no other writer can commit now, so stored ids above this are ours
+        before = (Attendance.objects.aggregate(m=Max('id'))['m'] or 0) if announce else None
+        Attendance.objects.bulk_create([objs[idx] for idx in first.values()], ignore_conflicts=True)
+        # ignore_conflicts doesn't report which rows landed, so read back the winners
+        stored = Attendance.objects.filter(
+            student_id__in={k[0] for k in first},
+            local_date__in={k[1] for k in first},
+        ).values_list('student_id', 'local_date', 'session', 'id', 'time')
+        winners = {(sid, d, sess): (pk, t) for sid, d, sess, pk, t in stored}
+
+    results = []
+    inserted = []
+    for idx, obj in enumerate(objs):
+        key = (obj.student_id, obj.local_date, obj.session)
+        pk, stored_time = winners.get(key, (None, None))
+        created = first[key] == idx and pk is not None and stored_time == obj.time
+        results.append((created, pk))
+        if created and announce and pk > before:
+            obj.pk = pk
+            inserted.append(obj)
+    if inserted:
+        events.attendance_recorded(inserted)
+    return results
+
+
+class GroupCommitWriter:
+    """Collects scans from request threads and commits them in groups on one writer thread."""
+
+    def __init__(self, max_wait: float = 0.005, max_batch: int = 200):
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self._pending = []  # [(Attendance, Future)]
+        self._cond = threading.Condition()
+        self._thread = None
+        self.batches = 0
+        self.scans = 0
+        self.retried = 0
+
+    def submit(self, obj: Attendance) -> Future:
+        """Queue one stamped, unsaved scan; the future resolves to insert_scans' (created, id) for it."""
+        future = Future()
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='scan-group-commit', daemon=True)
+                self._thread.start()
+            self._pending.append((obj, future))
+            self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # the window opens with the oldest pending scan, which bounds its latency
+                deadline = time.monotonic() + self.max_wait
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            self._commit(batch)
+
+    def _commit(self, batch):
+        try:
+            try:
+                results = insert_scans([obj for obj, _ in batch])
+            except Exception:
+                # the group rolled back; retry each scan alone so only a bad one (e.g. for a
+                # registration deleted since it was cached) fails its request
+                self.retried += 1
+                for obj, future in batch:
+                    try:
+                        future.set_result(insert_scans([obj])[0])
+                    except Exception as e:
+                        future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            self.batches += 1
+            self.scans += len(batch)
+        finally:
+            # the writer thread keeps its connection between groups, within CONN_MAX_AGE
+            close_old_connections()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {'batches': self.batches, 'scans': self.scans, 'retried': self.retried,
+                    'pending': len(self._pending)}
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def writer() -> GroupCommitWriter:
+    """The process-wide writer, configured from settings on first use."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = GroupCommitWriter(
+                max_wait=getattr(settings, 'SCAN_GROUP_COMMIT_MAX_WAIT_MS', 5) / 1000,
+                max_batch=getattr(settings, 'SCAN_GROUP_COMMIT_MAX_BATCH', 200),
+            )
+        return _writer
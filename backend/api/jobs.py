@@ -0,0 +1,151 @@
+"""Background execution of ExportJob rows (exports and chunked clears).
+
+Jobs run on a small in-process thread pool (settings.EXPORT_JOB_WORKERS; 0 runs them inline,
+which tests use). Every state change is written to the ExportJob row, so a restarted worker
+picks up queued jobs, and jobs stuck 'running' past EXPORT_JOB_STALE_SECONDS, on its first
+job request.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import archive, bulk_delete
+from .models import ArchivedSchoolYear, ExportJob
+from .utils_export import generate_all_sections_export, generate_month_export, generate_school_year_export
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_resumed = False
+
+
+def _run_month(params, progress):
+    month = None
+    if params.get('month'):
+        year, month_num = (int(p) for p in params['month'].split('-'))
+        month = date(year, month_num, 1)
+    return generate_month_export(month=month, progress=progress, section_id=params.get('section'))
+
+
+def _run_school_year(params, progress):
+    school_year = params.get('school_year')
+    if school_year is not None and ArchivedSchoolYear.objects.filter(school_year=school_year).exists():
+        # the year's rows left the database; rebuild it from the archive file instead
+        progress(10, 'Reading archive')
+        return archive.export_school_year(
+            school_year, include_names=bool(params.get('include_names')), section_id=params.get('section'),
+        )
+    return generate_school_year_export(
+        include_names=bool(params.get('include_names')),
+        school_year=params.get('school_year'),
+        progress=progress,
+        section_id=params.get('section'),
+    )
+
+
+def _run_all_sections(params, progress):
+    return generate_all_sections_export(
+        include_names=bool(params.get('include_names')),
+        school_year=params.get('school_year'),
+        progress=progress,
+    )
+
+
+def _run_clear_attendance(params, progress):
+    # the day is fixed when the job is queued, not when a worker gets to it
+    today = date.fromisoformat(params['today']) if params.get('today') else None
+    bulk_delete.clear_attendance(params.get('scope', 'today'), progress=progress, today=today)
+    return ''
+
+
+def _run_clear_registrations(params, progress):
+    bulk_delete.clear_registrations(progress=progress)
+    return ''
+
+
+RUNNERS = {
+    ExportJob.KIND_MONTH: _run_month,
+    ExportJob.KIND_SCHOOL_YEAR: _run_school_year,
+    ExportJob.KIND_ALL_SECTIONS: _run_all_sections,
+    ExportJob.KIND_CLEAR_ATTENDANCE: _run_clear_attendance,
+    ExportJob.KIND_CLEAR_REGISTRATIONS: _run_clear_registrations,
+}
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.EXPORT_JOB_WORKERS, thread_name_prefix='export-job',
+            )
+        return _executor
+
+
+def enqueue(kind: str, params: dict) -> ExportJob:
+    """Persist a new job and hand it to the pool once the creating transaction commits."""
+    job = ExportJob.objects.create(kind=kind, params=params)
+    transaction.on_commit(lambda: _dispatch(job.pk))
+    return job
+
+
+def _dispatch(job_id):
+    if getattr(settings, 'EXPORT_JOB_WORKERS', 0) <= 0:
+        run_job(job_id)
+    else:
+        _get_executor().submit(_run_in_thread, job_id)
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        # pool threads hold their own DB connection
+        connection.close()
+
+
+def run_job(job_id):
+    """Claim a queued job and execute it, recording progress and the outcome."""
+    claimed = ExportJob.objects.filter(pk=job_id, status=ExportJob.QUEUED).update(
+        status=ExportJob.RUNNING, started_at=timezone.now(), progress=0, attempts=F('attempts') + 1,
+    )
+    if not claimed:
+        return  # already taken by another worker, or finished
+    job = ExportJob.objects.get(pk=job_id)
+    rows = ExportJob.objects.filter(pk=job_id)
+
+    def progress(pct: int, message: str):
+        rows.update(progress=pct, message=message[:200])
+
+    try:
+        filename = RUNNERS[job.kind](job.params, progress)
+    except Exception as e:
+        logger.exception('Export job %s failed', job_id)
+        rows.update(status=ExportJob.FAILED, error=str(e), finished_at=timezone.now())
+        return
+    rows.update(
+        status=ExportJob.DONE, progress=100, message='Done', filename=filename, finished_at=timezone.now(),
+    )
+
+
+def resume_pending():
+    """Once per process: requeue jobs orphaned by a dead worker and dispatch queued ones."""
+    global _resumed
+    with _lock:
+        if _resumed:
+            return
+        _resumed = True
+
+    stale_after = getattr(settings, 'EXPORT_JOB_STALE_SECONDS', 900)
+    ExportJob.objects.filter(
+        status=ExportJob.RUNNING, started_at__lt=timezone.now() - timedelta(seconds=stale_after),
+    ).update(status=ExportJob.QUEUED)
+    for job_id in ExportJob.objects.filter(status=ExportJob.QUEUED).order_by('created_at').values_list('pk', flat=True):
+        _dispatch(job_id)
@@ -0,0 +1,126 @@
+"""Bounded in-process LRN -> (registration id, student name) cache for the scan path.
+
+The roster rarely changes during a school day, so resolving an LRN on every QR scan is a
+wasted round-trip. Entries are invalidated from Registration model signals (see
+api/signals.py), so writes through the viewset, drop/restore and clear_all all keep the
+cache consistent within this process.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .models import Registration
+
+
+class LRNCache:
+    def __init__(self, max_size: int = 5000):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # lrn -> (id, student)
+        self._lrn_by_id = {}  # id -> lrn, so an LRN edit can drop the stale key
+        self._section_by_id = {}  # id -> section id, for payloads built without a query
+        self._lock = threading.Lock()
+        # bumped on every invalidation so a fill racing with a roster write is discarded
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, lrn: str):
+        """Return (id, student) for an LRN, or None if no such registration exists."""
+        with self._lock:
+            entry = self._entries.get(lrn)
+            if entry is not None:
+                self._entries.move_to_end(lrn)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            generation = self._generation
+
+        row = Registration.objects.filter(lrn=lrn).values_list('id', 'student', 'section_id').first()
+        if row is None:
+            return None
+        self.put(lrn, row[0], row[1], generation, section_id=row[2])
+        return row[:2]
+
+    def get_many(self, lrns):
+        """Resolve several LRNs, querying the database once for all cache misses."""
+        found = {}
+        missing = []
+        with self._lock:
+            for lrn in lrns:
+                entry = self._entries.get(lrn)
+                if entry is not None:
+                    self._entries.move_to_end(lrn)
+                    self.hits += 1
+                    found[lrn] = entry
+                else:
+                    self.misses += 1
+                    missing.append(lrn)
+            generation = self._generation
+
+        if missing:
+            rows = Registration.objects.filter(lrn__in=missing).values_list('lrn', 'id', 'student', 'section_id')
+            for lrn, pk, student, section_id in rows:
+                self.put(lrn, pk, student, generation, section_id=section_id)
+                found[lrn] = (pk, student)
+        return found
+
+    def put(self, lrn: str, pk: int, student: str, generation: int = None, section_id: int = None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[lrn] = (pk, student)
+            self._entries.move_to_end(lrn)
+            self._lrn_by_id[pk] = lrn
+            self._section_by_id[pk] = section_id
+            while len(self._entries) > self.max_size:
+                old_lrn, (old_pk, _) = self._entries.popitem(last=False)
+                self._lrn_by_id.pop(old_pk, None)
+                self._section_by_id.pop(old_pk, None)
+
+    def registration(self, pk: int):
+        """(student, section id) of a cached registration id, or None; never queries."""
+        with self._lock:
+            lrn = self._lrn_by_id.get(pk)
+            if lrn is None:
+                return None
+            return self._entries[lrn][1], self._section_by_id.get(pk)
+
+    def invalidate(self, lrn: str = None, pk: int = None):
+        with self._lock:
+            if pk is not None:
+                old_lrn = self._lrn_by_id.pop(pk, None)
+                self._section_by_id.pop(pk, None)
+                if old_lrn is not None:
+                    self._entries.pop(old_lrn, None)
+            if lrn is not None:
+                entry = self._entries.pop(lrn, None)
+                if entry is not None:
+                    self._lrn_by_id.pop(entry[0], None)
+                    self._section_by_id.pop(entry[0], None)
+            self._generation += 1
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._lrn_by_id.clear()
+            self._section_by_id.clear()
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations,
+            }
+
+
+lrn_cache = LRNCache(max_size=getattr(settings, 'LRN_CACHE_SIZE', 5000))
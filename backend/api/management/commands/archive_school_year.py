@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api import archive
+
+
+class Command(BaseCommand):
+    help = (
+        'Move closed school years out of the database into compressed archive files under '
+        'ARCHIVE_DIR, recorded in the ArchivedSchoolYear index. Archived years stay available '
+        'read-only through /api/archives/.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('school_years', type=int, nargs='*',
+                            help='Start years to archive, e.g. 2024 for SY 2024-2025.')
+        parser.add_argument('--all-closed', action='store_true',
+                            help='Archive every ended school year that still has data.')
+        parser.add_argument('--keep', action='store_true',
+                            help='Write and index the archive but leave the rows in the database.')
+        parser.add_argument('--purge-registrations', action='store_true',
+                            help='Also delete learners without a section who have no scans after the year.')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Rows per delete transaction (default BULK_DELETE_CHUNK_SIZE).')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='VACUUM the SQLite database afterwards to give the space back.')
+
+    def handle(self, *args, **options):
+        years = sorted(set(options['school_years']) | set(archive.closed_school_years() if options['all_closed'] else []))
+        if not years:
+            raise CommandError('Nothing to archive: name school years or pass --all-closed.')
+        for school_year in years:
+            try:
+                entry = archive.archive_school_year(school_year, purge=not options['keep'],
+                                                    chunk_size=options['chunk_size'],
+                                                    purge_registrations=options['purge_registrations'])
+            except archive.ArchiveError as e:
+                raise CommandError(str(e))
+            counts = ', '.join(f'{n} {name}' for name, n in entry.counts.items())
+            self.stdout.write(self.style.SUCCESS(
+                f'Archived SY {school_year}-{school_year + 1} to {entry.filename} ({entry.size_bytes} bytes): {counts}'
+            ))
+        if options['vacuum'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
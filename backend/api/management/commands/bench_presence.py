@@ -0,0 +1,92 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api import presence, presence_matrix, sf2_grid
+from api.models import MonthlyPresence, Registration
+
+YEAR, MONTH = 2025, 9  # September 2025: 30 days, 22 weekdays
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _loop_stats(student_ids):
+    """The dict/set path: month_flags, then per-student loops for marks, absences and rate."""
+    flags = presence.month_flags(YEAR, MONTH)
+    weekdays = [d for d in range(1, 31) if d % 7 not in (6, 0)]  # 2025-09-01 is a Monday
+    date_cols = [(7 + i, d) for i, d in enumerate(weekdays)]
+    present_days = {sid: set(days) for sid, days in flags.items()}
+    absent = sf2_grid.absent_columns(date_cols, present_days)
+    absences = {sid: sum(1 for d in weekdays if d not in present_days.get(sid, ())) for sid in student_ids}
+    rate = sum(len(weekdays) - a for a in absences.values()) * 100.0 / (len(student_ids) * len(weekdays))
+    return absent, absences, rate
+
+
+def _matrix_stats(student_ids):
+    """The NumPy path: one PresenceMatrix, then array operations."""
+    matrix = presence_matrix.PresenceMatrix.load(YEAR, MONTH, student_ids)
+    school_days = matrix.school_days()
+    weekdays = [d + 1 for d in range(matrix.days) if school_days[d]]
+    date_cols = [(7 + i, d) for i, d in enumerate(weekdays)]
+    absent = matrix.absent_columns(date_cols)
+    absences = dict(zip(matrix.student_ids, matrix.absences(school_days).tolist()))
+    return absent, absences, matrix.attendance_percentage(school_days)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the NumPy presence matrix against the dict/set loops for one month of marks, '
+        'absence counts and attendance rate. Synthetic data is created in a transaction and rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, nargs='+', default=[50, 500, 5000],
+                            help='Roster sizes to measure (default 50 500 5000).')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per size; best is reported.')
+
+    def handle(self, *args, **options):
+        if not presence_matrix.available():
+            raise CommandError('NumPy is not installed (pip install numpy).')
+        repeat = max(1, options['repeat'])
+        self.stdout.write(f"{'students':>8}  {'loops ms':>9}  {'numpy ms':>9}  {'speedup':>7}")
+        for size in options['students']:
+            try:
+                with transaction.atomic():
+                    loops, matrix = self._measure(size, repeat)
+                    raise _Rollback
+            except _Rollback:
+                pass
+            self.stdout.write(f"{size:>8}  {loops * 1000:>9.1f}  {matrix * 1000:>9.1f}  {loops / matrix:>6.1f}x")
+
+    def _measure(self, size, repeat):
+        rng = random.Random(size)
+        regs = Registration.objects.bulk_create([
+            Registration(lrn=f'BENCH{i:07d}', student=f'Student {i:05d}', sex='Male' if i % 2 else 'Female')
+            for i in range(size)
+        ])
+        student_ids = [r.pk for r in regs]
+        full = (1 << 30) - 1
+        MonthlyPresence.objects.bulk_create([
+            MonthlyPresence(student_id=sid, year=YEAR, month=MONTH,
+                            am_mask=rng.getrandbits(30) | rng.getrandbits(30), pm_mask=rng.getrandbits(30) & full)
+            for sid in student_ids
+        ], batch_size=1000)
+
+        loop_result = _loop_stats(student_ids)
+        matrix_result = _matrix_stats(student_ids)
+        if loop_result[1] != matrix_result[1]:
+            raise CommandError('NumPy and loop absence counts disagree')
+
+        def best(fn):
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn(student_ids)
+                times.append(time.perf_counter() - start)
+            return min(times)
+
+        return best(_loop_stats), best(_matrix_stats)
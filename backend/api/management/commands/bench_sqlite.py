@@ -0,0 +1,168 @@
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# the columns and constraint of api_attendance that the scan path touches
+SCHEMA = """
+CREATE TABLE attendance (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id INTEGER NOT NULL,
+    time TEXT NOT NULL,
+    local_date TEXT NOT NULL,
+    session TEXT NOT NULL,
+    UNIQUE (student_id, local_date, session)
+);
+CREATE INDEX attendance_date_student_idx ON attendance (local_date, student_id);
+"""
+INSERT_SCAN = 'INSERT OR IGNORE INTO attendance (student_id, time, local_date, session) VALUES (?, ?, ?, ?)'
+# the shape of utils_export.school_year_presence: one grouped pass over a school year
+EXPORT_QUERY = """
+SELECT DISTINCT student_id, CAST(strftime('%m', local_date) AS INTEGER), CAST(strftime('%d', local_date) AS INTEGER)
+FROM attendance WHERE local_date BETWEEN ? AND ?
+"""
+FIRST_DAY = date(2025, 6, 2)
+
+
+class Profile:
+    """How a request gets its connection and runs a write under one DB profile."""
+
+    def __init__(self, name, pragmas, persistent, begin):
+        self.name = name
+        self.pragmas = pragmas
+        self.persistent = persistent
+        self.begin = begin
+        self._local = threading.local()
+
+    def connect(self, path):
+        # Django opens connections with isolation_level=None and issues BEGIN itself
+        conn = sqlite3.connect(path, timeout=self.pragmas.get('busy_timeout', 5000) / 1000,
+                               isolation_level=None, check_same_thread=False)
+        for pragma, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {pragma}={value}')
+        return conn
+
+    def connection(self, path):
+        """A connection for one request: reused per thread when persistent (CONN_MAX_AGE)."""
+        if not self.persistent:
+            return self.connect(path)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self.connect(path)
+        return conn
+
+    def done(self, conn):
+        if not self.persistent:
+            conn.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark scan inserts while exports read, on a scratch SQLite file, under the default '
+        'Django SQLite settings and the production profile (settings.SQLITE_PRODUCTION_PRAGMAS).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Concurrent scanning threads (default 8).')
+        parser.add_argument('--scans', type=int, default=200, help='Scans per writer (default 200).')
+        parser.add_argument('--rows', type=int, default=200000,
+                            help='Attendance rows preloaded so exports take a while (default 200000).')
+        parser.add_argument('--readers', type=int, default=1, help='Concurrent export loops (default 1).')
+
+    def handle(self, *args, **options):
+        profiles = [
+            # Django's stock SQLite settings: rollback journal, FULL sync, a connection per
+            # request, deferred transactions and sqlite3's default 5 s timeout
+            Profile('default', {'busy_timeout': 5000}, persistent=False, begin='BEGIN'),
+            Profile('production', dict(settings.SQLITE_PRODUCTION_PRAGMAS), persistent=True, begin='BEGIN IMMEDIATE'),
+        ]
+        self.stdout.write(
+            f"{'profile':>10}  {'scans/s':>8}  {'p50 ms':>7}  {'p99 ms':>7}  {'max ms':>7}  "
+            f"{'locked':>6}  {'exports':>7}"
+        )
+        for profile in profiles:
+            tmp = tempfile.mkdtemp(prefix='bench_sqlite_')
+            try:
+                result = self._run(profile, os.path.join(tmp, 'bench.sqlite3'), options)
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+            latencies = sorted(result['latencies']) or [0.0]
+            pct = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000  # noqa: E731
+            self.stdout.write(
+                f"{profile.name:>10}  {result['throughput']:>8.0f}  {pct(0.5):>7.1f}  {pct(0.99):>7.1f}  "
+                f"{latencies[-1] * 1000:>7.1f}  {result['errors']:>6}  {result['exports']:>7}"
+            )
+
+    def _run(self, profile, path, options):
+        setup = profile.connect(path)
+        setup.executescript(SCHEMA)
+        rng = random.Random(0)
+        students = max(1, options['rows'] // 300)
+        setup.execute('BEGIN')
+        setup.executemany(INSERT_SCAN, (
+            (rng.randrange(students), '2025-06-02T08:00:00', (FIRST_DAY + timedelta(days=i % 300)).isoformat(),
+             'AM' if i % 2 else 'PM')
+            for i in range(options['rows'])
+        ))
+        setup.execute('COMMIT')
+        setup.close()
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        result = {'latencies': [], 'errors': 0, 'exports': 0}
+
+        def export_loop():
+            while not stop.is_set():
+                conn = profile.connection(path)
+                try:
+                    conn.execute(EXPORT_QUERY, ('2025-06-01', '2026-05-31')).fetchall()
+                    with lock:
+                        result['exports'] += 1
+                except sqlite3.OperationalError:
+                    pass
+                finally:
+                    profile.done(conn)
+
+        def scan_loop(writer):
+            today = date(2026, 6, 1) + timedelta(days=writer)
+            for n in range(options['scans']):
+                start = time.perf_counter()
+                conn = profile.connection(path)
+                try:
+                    conn.execute(profile.begin)
+                    conn.execute(INSERT_SCAN, (writer * 100000 + n, f'{today}T08:00:00', today.isoformat(), 'AM'))
+                    conn.execute('COMMIT')
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        result['latencies'].append(elapsed)
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    with lock:
+                        result['errors'] += 1
+                finally:
+                    profile.done(conn)
+
+        readers = [threading.Thread(target=export_loop) for _ in range(options['readers'])]
+        writers = [threading.Thread(target=scan_loop, args=(w,)) for w in range(options['writers'])]
+        for t in readers:
+            t.start()
+        time.sleep(0.05)  # let the first export get going
+        started = time.perf_counter()
+        for t in writers:
+            t.start()
+        for t in writers:
+            t.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for t in readers:
+            t.join()
+        result['throughput'] = len(result['latencies']) / elapsed if elapsed else 0.0
+        return result
@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Max, Min
+
+from api import presence
+from api.models import Registration
+
+
+def _rebuild_chunk(bounds):
+    try:
+        return presence.rebuild(*bounds)
+    finally:
+        # worker threads get their own connection; don't leak it
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the MonthlyPresence rollup from raw Attendance rows in parallel student-id chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Students per chunk (default 500).')
+        parser.add_argument('--workers', type=int, default=4, help='Parallel worker threads (default 4).')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        bounds = Registration.objects.aggregate(lo=Min('id'), hi=Max('id'))
+        if bounds['lo'] is None:
+            presence.clear_all()
+            self.stdout.write('No registrations; rollup cleared.')
+            return
+
+        # first and last chunks are open-ended so ids created mid-run aren't missed
+        edges = list(range(bounds['lo'], bounds['hi'] + 1, chunk_size)) + [None]
+        edges[0] = None
+        chunks = list(zip(edges[:-1], edges[1:]))
+
+        workers = max(1, options['workers'])
+        if workers == 1:
+            written = sum(presence.rebuild(*c) for c in chunks)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                written = sum(pool.map(_rebuild_chunk, chunks))
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} presence rows in {len(chunks)} chunks.'
+        ))
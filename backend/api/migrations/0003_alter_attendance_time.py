@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 03:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_droppedregistration'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendance',
+            name='time',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django - denormalized local_date/session on Attendance, backfilled in chunks
+from django.db import migrations, models
+from django.utils import timezone
+
+BACKFILL_CHUNK = 2000
+
+
+def backfill_local_fields(apps, schema_editor):
+    Attendance = apps.get_model('api', 'Attendance')
+    last_id = 0
+    while True:
+        chunk = list(
+            Attendance.objects.filter(pk__gt=last_id).order_by('pk').only('pk', 'time')[:BACKFILL_CHUNK]
+        )
+        if not chunk:
+            break
+        for row in chunk:
+            local = timezone.localtime(row.time)
+            row.local_date = local.date()
+            row.session = 'AM' if local.hour < 12 else 'PM'
+        Attendance.objects.bulk_update(chunk, ['local_date', 'session'])
+        last_id = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_alter_attendance_time'),
+    ]
+
+    operations = [
+        # added nullable first so existing rows can be backfilled before the NOT NULL switch
+        migrations.AddField(
+            model_name='attendance',
+            name='local_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='session',
+            field=models.CharField(choices=[('AM', 'AM'), ('PM', 'PM')], editable=False, max_length=2, null=True),
+        ),
+        migrations.RunPython(backfill_local_fields, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='attendance',
+            name='local_date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='attendance',
+            name='session',
+            field=models.CharField(choices=[('AM', 'AM'), ('PM', 'PM')], editable=False, max_length=2),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['local_date', 'student'], name='attendance_date_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['student', 'local_date'], name='attendance_student_date_idx'),
+        ),
+    ]
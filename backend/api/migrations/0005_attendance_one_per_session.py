@@ -0,0 +1,39 @@
+# Generated by Django - one attendance row per student per local date and session
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_scans(apps, schema_editor):
+    """Keep the earliest scan of each (student, local_date, session) so the constraint applies."""
+    Attendance = apps.get_model('api', 'Attendance')
+    # materialized first: SQLite doesn't like deleting under an open cursor on the same table
+    groups = list(
+        Attendance.objects.values('student_id', 'local_date', 'session')
+        .annotate(n=Count('id'), keep=Min('id'))
+        .filter(n__gt=1)
+        .order_by()
+    )
+    for g in groups:
+        Attendance.objects.filter(
+            student_id=g['student_id'], local_date=g['local_date'], session=g['session'],
+        ).exclude(pk=g['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_attendance_local_date_session'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_scans, migrations.RunPython.noop),
+        # the unique constraint's index leads with (student, local_date)
+        migrations.RemoveIndex(
+            model_name='attendance',
+            name='attendance_student_date_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('student', 'local_date', 'session'), name='attendance_one_per_session'),
+        ),
+    ]
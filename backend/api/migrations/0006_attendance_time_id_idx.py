@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_attendance_one_per_session'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['time', 'id'], name='attendance_time_id_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-18 03:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_presence(apps, schema_editor):
+    Attendance = apps.get_model('api', 'Attendance')
+    MonthlyPresence = apps.get_model('api', 'MonthlyPresence')
+    masks = {}
+    rows = Attendance.objects.values_list('student_id', 'local_date', 'session').order_by()
+    for student_id, local_date, session in rows.iterator(chunk_size=5000):
+        entry = masks.setdefault((student_id, local_date.year, local_date.month), [0, 0])
+        entry[0 if session == 'AM' else 1] |= 1 << (local_date.day - 1)
+    MonthlyPresence.objects.bulk_create([
+        MonthlyPresence(student_id=sid, year=year, month=month, am_mask=am, pm_mask=pm)
+        for (sid, year, month), (am, pm) in masks.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_attendance_time_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyPresence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('am_mask', models.IntegerField(default=0)),
+                ('pm_mask', models.IntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.registration')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['year', 'month'], name='presence_year_month_idx')],
+                'constraints': [models.UniqueConstraint(fields=('student', 'year', 'month'), name='presence_one_per_month')],
+            },
+        ),
+        migrations.RunPython(populate_presence, migrations.RunPython.noop),
+    ]
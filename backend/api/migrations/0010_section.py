@@ -0,0 +1,47 @@
+# Generated by Django 5.1.6 on 2026-10-18 03:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_dataversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='kind',
+            field=models.CharField(choices=[('month', 'Month sheet'), ('school_year', 'School year SF2'), ('all_sections', 'School year SF2, every section (zip)')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='Section',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grade', models.CharField(max_length=20)),
+                ('name', models.CharField(max_length=50)),
+                ('adviser', models.CharField(blank=True, max_length=100)),
+                ('school_year', models.PositiveSmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('school_year', 'grade', 'name'), name='section_unique_per_year')],
+            },
+        ),
+        migrations.AddField(
+            model_name='droppedregistration',
+            name='section',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.section'),
+        ),
+        migrations.AddField(
+            model_name='registration',
+            name='section',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='registrations', to='api.section'),
+        ),
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['section', 'student'], name='registration_section_idx'),
+        ),
+    ]
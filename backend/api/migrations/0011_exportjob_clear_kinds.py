@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_section'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='kind',
+            field=models.CharField(choices=[('month', 'Month sheet'), ('school_year', 'School year SF2'), ('all_sections', 'School year SF2, every section (zip)'), ('clear_attendance', 'Clear attendance'), ('clear_registrations', 'Clear all registrations')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-18 04:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_exportjob_clear_kinds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSchoolYear',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('school_year', models.PositiveSmallIntegerField(unique=True)),
+                ('filename', models.CharField(max_length=255)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('sha256', models.CharField(max_length=64)),
+                ('counts', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -1,4 +1,25 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
+
+class Section(models.Model):
+    """A class section (e.g. Grade 7 - Rizal) for one school year; rosters and exports are scoped by it."""
+    grade = models.CharField(max_length=20)
+    name = models.CharField(max_length=50)
+    adviser = models.CharField(max_length=100, blank=True)
+    # start year of the school year, e.g. 2025 for SY 2025-2026
+    school_year = models.PositiveSmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['school_year', 'grade', 'name'], name='section_unique_per_year'),
+        ]
+
+    def __str__(self):
+        return f"{self.grade} - {self.name} ({self.school_year}-{self.school_year + 1})"
+
 
 class Registration(models.Model):
     lrn = models.CharField(max_length=20, unique=True)
@@ -7,14 +28,70 @@ class Registration(models.Model):
     parent = models.CharField(max_length=100)
     guardian = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
+    section = models.ForeignKey(
+        Section, null=True, blank=True, on_delete=models.SET_NULL, related_name='registrations',
+    )
+
+    class Meta:
+        indexes = [
+            # section rosters are always listed by name
+            models.Index(fields=['section', 'student'], name='registration_section_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student} ({self.lrn})"
 
 
+def local_date_and_session(dt):
+    """Return (local date, 'AM'/'PM') for an aware datetime in the project TIME_ZONE."""
+    local = timezone.localtime(dt)
+    return local.date(), (Attendance.AM if local.hour < 12 else Attendance.PM)
+
+
+class AttendanceQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips Model.save(), so stamp the denormalized columns here too
+        objs = list(objs)
+        for obj in objs:
+            obj.stamp_local_fields()
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Attendance(models.Model):
+    AM = 'AM'
+    PM = 'PM'
+    SESSION_CHOICES = [(AM, 'AM'), (PM, 'PM')]
+
     student = models.ForeignKey(Registration, on_delete=models.CASCADE)
-    time = models.DateTimeField(auto_now_add=True)
+    # default (not auto_now_add) so batched kiosk scans can keep their own scan time
+    time = models.DateTimeField(default=timezone.now)
+    # Denormalized from `time` (local timezone) at insert so date-scoped queries and
+    # exports can use an index instead of converting every row's timestamp
+    local_date = models.DateField(editable=False)
+    session = models.CharField(max_length=2, choices=SESSION_CHOICES, editable=False)
+
+    objects = AttendanceQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['local_date', 'student'], name='attendance_date_student_idx'),
+            # keyset pagination order for attendance lists
+            models.Index(fields=['time', 'id'], name='attendance_time_id_idx'),
+        ]
+        constraints = [
+            # One scan per student per session; its index also serves (student, local_date)
+            # lookups. Scan endpoints rely on it for insert-or-ignore deduplication.
+            models.UniqueConstraint(
+                fields=['student', 'local_date', 'session'], name='attendance_one_per_session',
+            ),
+        ]
+
+    def stamp_local_fields(self):
+        self.local_date, self.session = local_date_and_session(self.time)
+
+    def save(self, *args, **kwargs):
+        self.stamp_local_fields()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.student.student} - {self.time.strftime('%Y-%m-%d %H:%M:%S')}"
@@ -32,6 +109,111 @@ class DroppedRegistration(models.Model):
     guardian = models.CharField(max_length=100, blank=True)
     dropped_at = models.DateTimeField(auto_now_add=True)
     original_id = models.IntegerField(null=True, blank=True)
+    section = models.ForeignKey(Section, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
 
     def __str__(self):
         return f"Dropped: {self.student} ({self.lrn})"
+
+
+class MonthlyPresence(models.Model):
+    """Per-student monthly attendance rollup, maintained incrementally (see api/presence.py).
+
+    Bit (day - 1) of am_mask / pm_mask is set when the student has an AM / PM scan on that
+    day of the month, so a month report reads one small row per student instead of
+    scanning raw Attendance history.
+    """
+    student = models.ForeignKey(Registration, on_delete=models.CASCADE)
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    am_mask = models.IntegerField(default=0)
+    pm_mask = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'year', 'month'], name='presence_one_per_month'),
+        ]
+        indexes = [
+            models.Index(fields=['year', 'month'], name='presence_year_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} {self.year}-{self.month:02d} AM={self.am_mask:#x} PM={self.pm_mask:#x}"
+
+
+class ExportJob(models.Model):
+    """A queued/background export, or a long-running clear (see api/bulk_delete.py) that
+    reuses the same queue and progress reporting. State lives in the DB so it survives
+    worker restarts; execution is handled by api/jobs.py.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    KIND_MONTH = 'month'
+    KIND_SCHOOL_YEAR = 'school_year'
+    KIND_ALL_SECTIONS = 'all_sections'
+    KIND_CLEAR_ATTENDANCE = 'clear_attendance'
+    KIND_CLEAR_REGISTRATIONS = 'clear_registrations'
+    KIND_CHOICES = [
+        (KIND_MONTH, 'Month sheet'), (KIND_SCHOOL_YEAR, 'School year SF2'),
+        (KIND_ALL_SECTIONS, 'School year SF2, every section (zip)'),
+        (KIND_CLEAR_ATTENDANCE, 'Clear attendance'), (KIND_CLEAR_REGISTRATIONS, 'Clear all registrations'),
+    ]
+    # kinds that produce no file; they are queued by the clear endpoints, not export_jobs
+    MAINTENANCE_KINDS = (KIND_CLEAR_ATTENDANCE, KIND_CLEAR_REGISTRATIONS)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0)
+    message = models.CharField(max_length=200, blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='exportjob_status_idx'),
+        ]
+
+    @property
+    def url(self):
+        return f"/exports/{self.filename}" if self.filename else None
+
+    def __str__(self):
+        return f"{self.kind} export {self.pk} ({self.status})"
+
+
+class DataVersion(models.Model):
+    """Named change counters bumped on writes (see api/versioning.py).
+
+    Together with the Attendance id high-water mark they give a cheap "has anything
+    changed?" version for caches without hashing or rescanning data.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+
+class ArchivedSchoolYear(models.Model):
+    """Index of school years moved out of the database into archive files (see api/archive.py)."""
+    # start year of the school year, e.g. 2024 for SY 2024-2025
+    school_year = models.PositiveSmallIntegerField(unique=True)
+    filename = models.CharField(max_length=255)
+    size_bytes = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64)
+    # rows archived per table, e.g. {"attendance": 51234, "registrations": 410}
+    counts = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"SY {self.school_year}-{self.school_year + 1} archive ({self.filename})"
@@ -0,0 +1,143 @@
+"""AM/PM triangle overlays for exported attendance sheets, drawn once and shared.
+
+Every present cell of a month sheet carries a small PNG of one or two green triangles.
+Cells of the same size and flags look identical, so TriangleOverlays draws each
+(width, height, flags) combination once and hands out lightweight SharedImage anchors
+pointing at those bytes. openpyxl's writer stores one media file per image anchor;
+save_workbook() below then rewrites the saved package so each distinct PNG is stored
+once and every drawing relationship points at that copy.
+"""
+import datetime
+import io
+import posixpath
+import re
+from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
+
+from openpyxl.drawing.image import Image as OpenpyxlImage
+from openpyxl.writer.excel import ExcelWriter
+
+AM_FLAG = 1
+PM_FLAG = 2
+
+MEDIA_DIR = 'xl/media/'
+# relationship targets and content-type overrides that name a media part
+_MEDIA_TARGET = re.compile(rb'Target="([^"]*/media/[^"/]+)"')
+_MEDIA_OVERRIDE = re.compile(rb'<Override PartName="/xl/media/([^"/]+)"[^>]*/>')
+
+FILL = (67, 160, 71, 255)
+OUTLINE = (0, 0, 0, 255)
+
+
+class SharedImage(OpenpyxlImage):
+    """An image anchor whose PNG bytes are shared with other anchors."""
+
+    def __init__(self, data: bytes, width: int, height: int):
+        # skip Image.__init__: the bytes are already a PNG of known size
+        self.ref = None
+        self.data = data
+        self.format = 'png'
+        self.width = width
+        self.height = height
+
+    def _data(self):
+        return self.data
+
+
+class TriangleOverlays:
+    """Memoized triangle PNGs keyed by (width, height, flags)."""
+
+    def __init__(self):
+        self._png = {}
+
+    def png(self, width: int, height: int, flags: int) -> bytes:
+        key = (width, height, flags)
+        data = self._png.get(key)
+        if data is None:
+            data = self._png[key] = self._draw(width, height, flags)
+        return data
+
+    def image(self, width: int, height: int, flags: int) -> SharedImage:
+        return SharedImage(self.png(width, height, flags), width, height)
+
+    @staticmethod
+    def _draw(img_w: int, img_h: int, flags: int) -> bytes:
+        from PIL import Image as PILImage, ImageDraw
+
+        pil_img = PILImage.new('RGBA', (img_w, img_h), (255, 255, 255, 0))
+        draw = ImageDraw.Draw(pil_img)
+        triangles = []
+        # AM triangle -> top-right, PM triangle -> bottom-left
+        if flags & AM_FLAG:
+            triangles.append([(img_w, 0), (img_w, img_h), (0, 0)])
+        if flags & PM_FLAG:
+            triangles.append([(0, img_h), (img_w, img_h), (0, 0)])
+        for pts in triangles:
+            draw.polygon(pts, fill=FILL)
+            draw.line([pts[0], pts[1]], fill=OUTLINE, width=1)
+            draw.line([pts[1], pts[2]], fill=OUTLINE, width=1)
+            draw.line([pts[2], pts[0]], fill=OUTLINE, width=1)
+        out = io.BytesIO()
+        pil_img.save(out, format='PNG')
+        return out.getvalue()
+
+    def __len__(self):
+        return len(self._png)
+
+
+def share_media(source: ZipFile, dest: ZipFile, date_time=None):
+    """Copy a saved workbook package from `source` to `dest`, storing identical media once.
+
+    Later copies of a media part are dropped and the relationships and content-type
+    overrides naming them are pointed at (or folded into) the first copy. With
+    `date_time` every member is stamped with it instead of keeping its own date.
+    """
+    names = source.namelist()
+    first = {}  # media bytes -> name of the first part holding them
+    alias = {}  # media file name -> file name of the part kept for it
+    for name in names:
+        if name.startswith(MEDIA_DIR):
+            kept = first.setdefault(source.read(name), name)
+            if kept != name:
+                alias[posixpath.basename(name)] = posixpath.basename(kept)
+
+    def retarget(match):
+        target = match.group(1)
+        head, _, tail = target.rpartition(b'/')
+        kept = alias.get(tail.decode())
+        return match.group(0) if kept is None else b'Target="' + head + b'/' + kept.encode() + b'"'
+
+    def drop_override(match):
+        return b'' if match.group(1).decode() in alias else match.group(0)
+
+    for info in source.infolist():
+        name = info.filename
+        if name.startswith(MEDIA_DIR) and posixpath.basename(name) in alias:
+            continue
+        data = source.read(name)
+        if alias and name.endswith('.rels'):
+            data = _MEDIA_TARGET.sub(retarget, data)
+        elif alias and name == '[Content_Types].xml':
+            data = _MEDIA_OVERRIDE.sub(drop_override, data)
+        member = ZipInfo(name, date_time=date_time or info.date_time)
+        member.external_attr = info.external_attr if date_time is None else 0o600 << 16
+        dest.writestr(member, data, compress_type=ZIP_DEFLATED)
+
+
+def save_workbook(wb, dest, fixed_time=None):
+    """Save `wb` to a path or file-like object, sharing identical overlay images.
+
+    With `fixed_time` (a naive UTC datetime) the workbook's modified date and every zip
+    member are stamped with it, so the same content always saves to the same bytes.
+    """
+    if fixed_time is None:
+        wb.properties.modified = datetime.datetime.now(tz=datetime.timezone.utc).replace(tzinfo=None)
+        date_time = None
+    else:
+        wb.properties.modified = fixed_time
+        # zip dates can't predate 1980
+        date_time = max(fixed_time, datetime.datetime(1980, 1, 1)).timetuple()[:6]
+    package = io.BytesIO()
+    with ZipFile(package, 'w', ZIP_DEFLATED, allowZip64=True) as archive:
+        ExcelWriter(wb, archive).save()
+    with ZipFile(package) as source, ZipFile(dest, 'w', ZIP_DEFLATED, allowZip64=True) as out:
+        share_media(source, out, date_time)
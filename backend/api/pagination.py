@@ -0,0 +1,84 @@
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class AttendanceKeysetPagination(BasePagination):
+    """Keyset (cursor) pagination over Attendance ordered by (time, id).
+
+    Opt-in so existing clients keep getting a plain list: pagination only applies when the
+    request carries `cursor` or `page_size`. Each page is a single indexed range scan
+    (`(time, id) > cursor`) no matter how deep the client pages, unlike OFFSET.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'ATTENDANCE_PAGE_SIZE', 200)
+        self.max_page_size = getattr(settings, 'ATTENDANCE_MAX_PAGE_SIZE', 1000)
+        self.next_cursor = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        self.request = request
+        page_size = self.get_page_size(params)
+
+        queryset = queryset.order_by('time', 'id')
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            after_time, after_id = self.decode_cursor(cursor)
+            queryset = queryset.filter(Q(time__gt=after_time) | Q(time=after_time, id__gt=after_id))
+
+        # fetch one extra row to learn whether another page exists
+        rows = list(queryset[:page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            # rows are model instances or attendance_values() dicts
+            if isinstance(last, dict):
+                self.next_cursor = self.encode_cursor(last['time'], last['id'])
+            else:
+                self.next_cursor = self.encode_cursor(last.time, last.id)
+        return rows
+
+    def get_paginated_response(self, data):
+        next_url = None
+        if self.next_cursor:
+            next_url = replace_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor,
+            )
+        return Response({'next': next_url, 'cursor': self.next_cursor, 'results': data})
+
+    def get_page_size(self, params):
+        raw = params.get(self.page_size_query_param)
+        if not raw:
+            return self.page_size
+        try:
+            size = int(raw)
+        except ValueError:
+            raise ValidationError({'page_size': 'Must be an integer'})
+        if size < 1:
+            raise ValidationError({'page_size': 'Must be at least 1'})
+        return min(size, self.max_page_size)
+
+    @staticmethod
+    def encode_cursor(time, pk) -> str:
+        raw = f"{time.isoformat()}|{pk}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            time_str, pk = base64.urlsafe_b64decode(padded).decode().rsplit('|', 1)
+            return datetime.fromisoformat(time_str), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise ValidationError({'cursor': 'Invalid cursor'})
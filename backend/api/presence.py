@@ -0,0 +1,122 @@
+"""Incremental maintenance of the MonthlyPresence bitmask rollup.
+
+Single inserts and deletes are applied from Attendance signals (api/signals.py). Bulk
+paths that bypass signals (batch scans, clears) call mark_many / clear_day / clear_all
+directly. `rebuild` recomputes rows from raw Attendance and backs the rebuild_presence
+management command.
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Attendance, MonthlyPresence
+
+# (student_id, year, month) -> [am_mask, pm_mask]
+MaskMap = Dict[Tuple[int, int, int], list]
+
+
+def day_bit(day: date) -> int:
+    return 1 << (day.day - 1)
+
+
+def _mask_field(session: str) -> str:
+    return 'am_mask' if session == Attendance.AM else 'pm_mask'
+
+
+def collect_masks(rows: Iterable[Tuple[int, date, str]]) -> MaskMap:
+    """Fold (student_id, local_date, session) rows into per-month AM/PM masks."""
+    masks: MaskMap = defaultdict(lambda: [0, 0])
+    for student_id, local_date, session in rows:
+        entry = masks[(student_id, local_date.year, local_date.month)]
+        entry[0 if session == Attendance.AM else 1] |= day_bit(local_date)
+    return masks
+
+
+def _or_masks(student_id: int, year: int, month: int, am: int, pm: int):
+    rollup = MonthlyPresence.objects.filter(student_id=student_id, year=year, month=month)
+    if rollup.update(am_mask=F('am_mask').bitor(am), pm_mask=F('pm_mask').bitor(pm)):
+        return
+    try:
+        with transaction.atomic():
+            MonthlyPresence.objects.create(student_id=student_id, year=year, month=month, am_mask=am, pm_mask=pm)
+    except IntegrityError:
+        # another writer created the month row first; fold our bits into it
+        rollup.update(am_mask=F('am_mask').bitor(am), pm_mask=F('pm_mask').bitor(pm))
+
+
+def mark(student_id: int, local_date: date, session: str):
+    bit = day_bit(local_date)
+    am, pm = (bit, 0) if session == Attendance.AM else (0, bit)
+    _or_masks(student_id, local_date.year, local_date.month, am, pm)
+
+
+def mark_many(rows: Iterable[Tuple[int, date, str]]):
+    """Set bits for many scans with one upsert per (student, month)."""
+    for (student_id, year, month), (am, pm) in collect_masks(rows).items():
+        _or_masks(student_id, year, month, am, pm)
+
+
+def unmark(student_id: int, local_date: date, session: str):
+    # one row per (student, date, session) is guaranteed by the Attendance constraint,
+    # so deleting it always clears the bit
+    field = _mask_field(session)
+    MonthlyPresence.objects.filter(
+        student_id=student_id, year=local_date.year, month=local_date.month,
+    ).update(**{field: F(field).bitand(~day_bit(local_date))})
+
+
+def clear_day(local_date: date):
+    """Clear one calendar day for every student, e.g. after clearing today's attendance."""
+    keep = ~day_bit(local_date)
+    MonthlyPresence.objects.filter(year=local_date.year, month=local_date.month).update(
+        am_mask=F('am_mask').bitand(keep), pm_mask=F('pm_mask').bitand(keep),
+    )
+
+
+def clear_all():
+    MonthlyPresence.objects.all().delete()
+
+
+def rebuild(student_id_from: int = None, student_id_to: int = None) -> int:
+    """Recompute rollup rows from Attendance for students in [from, to); returns rows written."""
+    attendance = Attendance.objects.all()
+    rollups = MonthlyPresence.objects.all()
+    if student_id_from is not None:
+        attendance = attendance.filter(student_id__gte=student_id_from)
+        rollups = rollups.filter(student_id__gte=student_id_from)
+    if student_id_to is not None:
+        attendance = attendance.filter(student_id__lt=student_id_to)
+        rollups = rollups.filter(student_id__lt=student_id_to)
+
+    with transaction.atomic():
+        # the delete takes the write lock first, so no scan lands between the read and the write
+        rollups.delete()
+        masks = collect_masks(
+            attendance.values_list('student_id', 'local_date', 'session').order_by().iterator(chunk_size=5000)
+        )
+        MonthlyPresence.objects.bulk_create([
+            MonthlyPresence(student_id=sid, year=year, month=month, am_mask=am, pm_mask=pm)
+            for (sid, year, month), (am, pm) in masks.items()
+        ], batch_size=1000)
+    return len(masks)
+
+
+def month_flags(year: int, month: int, section_id: Optional[int] = None) -> Dict[int, Dict[int, int]]:
+    """student_id -> day -> flags (1 = AM, 2 = PM) for one month, read from the rollup."""
+    flags: Dict[int, Dict[int, int]] = {}
+    rows = MonthlyPresence.objects.filter(year=year, month=month)
+    if section_id is not None:
+        rows = rows.filter(student__section_id=section_id)
+    rows = rows.values_list('student_id', 'am_mask', 'pm_mask')
+    for student_id, am, pm in rows:
+        days = {}
+        for day in range(1, 32):
+            bit = 1 << (day - 1)
+            f = (1 if am & bit else 0) | (2 if pm & bit else 0)
+            if f:
+                days[day] = f
+        flags[student_id] = days
+    return flags
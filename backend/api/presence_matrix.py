@@ -0,0 +1,239 @@
+"""NumPy presence matrices: a roster's attendance as a (students x days x sessions) bool array.
+
+Matrices are loaded from the MonthlyPresence rollup with one query, and the AM/PM bitmasks
+are unpacked for every student at once with array shifts. Export marks, absence counts
+and attendance percentages are then array operations instead of per-student loops.
+
+NumPy is optional. available() reports whether it is installed; when it isn't, callers
+keep using the dict/set code in presence.py and utils_export.py.
+"""
+import calendar
+import hashlib
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.db.models import Q
+
+from .models import MonthlyPresence
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+AM = 0
+PM = 1
+MAX_DAYS = 31
+
+
+def available() -> bool:
+    return np is not None
+
+
+class PresenceMatrix:
+    """One month of presence for an ordered roster.
+
+    `data[i, d, s]` is True when student_ids[i] has a scan on day d + 1 in session s (AM/PM).
+    """
+
+    def __init__(self, year: int, month: int, student_ids: Sequence[int], data):
+        self.year = year
+        self.month = month
+        self.student_ids = list(student_ids)
+        self.data = data
+
+    @classmethod
+    def empty(cls, year: int, month: int, student_ids: Sequence[int]) -> 'PresenceMatrix':
+        days = calendar.monthrange(year, month)[1]
+        return cls(year, month, student_ids, np.zeros((len(student_ids), days, 2), dtype=bool))
+
+    @classmethod
+    def load(cls, year: int, month: int, student_ids: Sequence[int],
+             section_id: Optional[int] = None) -> 'PresenceMatrix':
+        return load_months([(year, month)], student_ids, section_id)[(year, month)]
+
+    @property
+    def days(self) -> int:
+        return self.data.shape[1]
+
+    def present(self):
+        """(students, days) bool: any scan that day."""
+        return self.data.any(axis=2)
+
+    def flags(self):
+        """(students, days) uint8: 1 = AM, 2 = PM, 3 = both, as in presence.month_flags."""
+        return self.data[:, :, AM].astype(np.uint8) | (self.data[:, :, PM].astype(np.uint8) << 1)
+
+    def school_days(self, until: Optional[int] = None):
+        """(days,) bool: Monday to Friday, optionally only up to day `until`."""
+        first_weekday = date(self.year, self.month, 1).weekday()
+        weekdays = (np.arange(self.days) + first_weekday) % 7
+        mask = weekdays < 5
+        if until is not None:
+            mask &= np.arange(1, self.days + 1) <= until
+        return mask
+
+    def absences(self, school_days=None):
+        """(students,) int: school days without any scan."""
+        if school_days is None:
+            school_days = self.school_days()
+        return (~self.present() & school_days).sum(axis=1)
+
+    def daily_present(self):
+        """(days,) int: students present each day."""
+        return self.present().sum(axis=0)
+
+    def attendance_percentage(self, school_days=None) -> float:
+        """Present student-days over possible student-days on school days, in percent."""
+        if school_days is None:
+            school_days = self.school_days()
+        possible = len(self.student_ids) * int(school_days.sum())
+        if not possible:
+            return 0.0
+        return float(self.present()[:, school_days].sum()) * 100.0 / possible
+
+    def absent_columns(self, date_cols: Sequence[Tuple[int, int]]) -> Dict[int, List[bool]]:
+        """student_id -> absent flag per template date column, as sf2_grid.month_grid expects.
+
+        Day 1 and days past the end of the month always count as absent, like the
+        dict-based path.
+        """
+        col_days = np.array([day for _, day in date_cols], dtype=np.int64)
+        in_month = (col_days >= 1) & (col_days <= self.days) & (col_days != 1)
+        present = self.present()[:, np.clip(col_days - 1, 0, self.days - 1)] & in_month
+        return dict(zip(self.student_ids, (~present).tolist()))
+
+    def sf2_totals(self, males: int, school_days=None) -> dict:
+        """sf2_totals over `school_days` for a roster ordered males first."""
+        if school_days is None:
+            school_days = self.school_days()
+        return sf2_totals(self.present()[:, school_days], males, (np.flatnonzero(school_days) + 1).tolist())
+
+    def signature(self) -> Optional[str]:
+        """Digest of who was present when; None for a month without any scan."""
+        present = self.present()
+        if not present.any():
+            return None
+        h = hashlib.sha1(np.asarray(self.student_ids, dtype=np.int64).tobytes())
+        h.update(np.packbits(present).tobytes())
+        return h.hexdigest()
+
+
+def load_months(months: Iterable[Tuple[int, int]], student_ids: Sequence[int],
+                section_id: Optional[int] = None) -> Dict[Tuple[int, int], PresenceMatrix]:
+    """Matrices for several (year, month) pairs with a single rollup query.
+
+    Rows for students outside `student_ids` are ignored; students without a rollup row
+    are all False. `section_id` narrows the query to one section's students.
+    """
+    months = list(dict.fromkeys(months))
+    if not months or not len(student_ids):
+        return matrices_from_rows(months, student_ids, [])
+
+    period = Q()
+    for y, m in months:
+        period |= Q(year=y, month=m)
+    rows = MonthlyPresence.objects.filter(period)
+    if section_id is not None:
+        rows = rows.filter(student__section_id=section_id)
+    return matrices_from_rows(
+        months, student_ids, rows.values_list('student_id', 'year', 'month', 'am_mask', 'pm_mask').order_by(),
+    )
+
+
+def matrices_from_rows(months: Iterable[Tuple[int, int]], student_ids: Sequence[int],
+                       rows: Iterable[Tuple[int, int, int, int, int]]) -> Dict[Tuple[int, int], PresenceMatrix]:
+    """Matrices for (year, month) pairs from (student_id, year, month, am_mask, pm_mask) rows,
+    e.g. a rollup query or an archived school year."""
+    months = list(dict.fromkeys(months))
+    result = {(y, m): PresenceMatrix.empty(y, m, student_ids) for y, m in months}
+    table = np.array(list(rows), dtype=np.int64).reshape(-1, 5)
+    if not len(table) or not len(student_ids):
+        return result
+
+    # map student ids to matrix rows; drop students outside the roster
+    ids = np.asarray(student_ids, dtype=np.int64)
+    order = np.argsort(ids, kind='stable')
+    pos = np.searchsorted(ids, table[:, 0], sorter=order)
+    pos = np.clip(pos, 0, len(ids) - 1)
+    known = ids[order[pos]] == table[:, 0]
+    table, student_rows = table[known], order[pos[known]]
+
+    # unpack both bitmasks of every row at once: bit d is day d + 1
+    shifts = np.arange(MAX_DAYS, dtype=np.int64)
+    am_bits = ((table[:, 3, None] >> shifts) & 1).astype(bool)
+    pm_bits = ((table[:, 4, None] >> shifts) & 1).astype(bool)
+    for (y, m), matrix in result.items():
+        sel = (table[:, 1] == y) & (table[:, 2] == m)
+        if not sel.any():
+            continue
+        days = matrix.days
+        matrix.data[student_rows[sel], :, AM] = am_bits[sel, :days]
+        matrix.data[student_rows[sel], :, PM] = pm_bits[sel, :days]
+    return result
+
+
+CONSECUTIVE_ABSENCES = 5
+
+
+def sf2_totals(present, males: int, days: Sequence[int]) -> dict:
+    """SF2 footer figures for one month from a (students, school days) bool array.
+
+    Rows are the male roster followed by the female one (`males` is the number of male
+    rows) and columns are the school days in `days`. Every figure is computed with array
+    reductions over the whole roster; the result only holds plain ints and floats.
+    """
+    days = [int(d) for d in days]
+    present = np.asarray(present, dtype=bool).reshape(-1, len(days))
+    absent = ~present
+    groups = {'male': slice(0, males), 'female': slice(males, None)}
+
+    daily = {sex: present[rows].sum(axis=0) for sex, rows in groups.items()}
+    daily['total'] = daily['male'] + daily['female']
+    registered = {sex: int(present[rows].shape[0]) for sex, rows in groups.items()}
+    registered['total'] = registered['male'] + registered['female']
+
+    # a learner is flagged when any window of CONSECUTIVE_ABSENCES school days is all absent
+    if len(days) >= CONSECUTIVE_ABSENCES:
+        windows = np.lib.stride_tricks.sliding_window_view(absent, CONSECUTIVE_ABSENCES, axis=1)
+        flagged = windows.all(axis=2).any(axis=1)
+    else:
+        flagged = np.zeros(len(present), dtype=bool)
+    consecutive = {sex: int(flagged[rows].sum()) for sex, rows in groups.items()}
+    consecutive['total'] = consecutive['male'] + consecutive['female']
+
+    learner_present = present.sum(axis=1)
+    present_days, average, percentage = {}, {}, {}
+    for sex in ('male', 'female', 'total'):
+        present_days[sex] = int(daily[sex].sum())
+        average[sex] = present_days[sex] / len(days) if days else 0.0
+        percentage[sex] = average[sex] * 100.0 / registered[sex] if registered[sex] else 0.0
+
+    return {
+        'school_days': days,
+        'registered': registered,
+        'daily': [
+            {
+                'day': day,
+                'present': {sex: int(daily[sex][i]) for sex in ('male', 'female', 'total')},
+                'absent': {sex: registered[sex] - int(daily[sex][i]) for sex in ('male', 'female', 'total')},
+            }
+            for i, day in enumerate(days)
+        ],
+        'present_days': present_days,
+        'absent_days': {sex: registered[sex] * len(days) - present_days[sex] for sex in present_days},
+        'average_daily_attendance': average,
+        'percentage_of_attendance': percentage,
+        'consecutive_absences': consecutive,
+        'learners': {
+            'present': learner_present.tolist(),
+            'absent': (len(days) - learner_present).tolist(),
+            'consecutive_absences': flagged.tolist(),
+        },
+    }
+
+
+def marks_totals(absent_rows, males: int, days: Sequence[int]) -> dict:
+    """sf2_totals from per-learner absent flags, e.g. the marks of a rendered month sheet."""
+    absent = np.array(absent_rows, dtype=bool).reshape(len(absent_rows), len(days))
+    return sf2_totals(~absent, males, days)
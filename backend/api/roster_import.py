@@ -0,0 +1,223 @@
+"""Bulk roster import: stream rows from an uploaded file and upsert Registrations by LRN.
+
+Rows are read lazily (openpyxl read_only mode for Excel), validated one at a time and
+written in chunks with a single INSERT ... ON CONFLICT (lrn) DO UPDATE per chunk, so a
+whole grade level goes in with a handful of queries instead of one request per learner.
+Each chunk commits in its own short transaction. bulk_create skips model signals, so the
+roster version and the LRN cache are updated per chunk here.
+
+Sources: excel_rows (.xlsx uploads), csv_rows and jsonl_rows (request bodies, decoded
+line by line as they arrive).
+"""
+import csv
+import json
+from contextlib import nullcontext
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+
+from . import versioning
+from .lrn_cache import lrn_cache
+from .models import Registration
+
+# header text (lower-cased) -> Registration field
+HEADER_ALIASES = {
+    'lrn': 'lrn',
+    'learner reference number': 'lrn',
+    'student': 'student',
+    'name': 'student',
+    "learner's name": 'student',
+    'sex': 'sex',
+    'gender': 'sex',
+    'parent': 'parent',
+    'guardian': 'guardian',
+}
+# key a row source uses to reject a row it couldn't parse
+ROW_ERROR = 'error'
+REQUIRED_FIELDS = ('lrn', 'student', 'sex')
+UPDATE_FIELDS = ['student', 'sex', 'parent', 'guardian']
+SEX_VALUES = {'m': 'Male', 'male': 'Male', 'f': 'Female', 'female': 'Female'}
+# header row must appear within the first rows of the sheet
+HEADER_SEARCH_ROWS = 20
+# largest batch a client may ask for
+MAX_CHUNK_SIZE = 5000
+# at most this many row errors / conflicts are reported back; the *_count keys have totals
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportFileError(ValueError):
+    """The file can't be imported at all (unreadable, no header row)."""
+
+
+def _text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # numeric LRN cells come back as floats
+    return str(value).strip()
+
+
+def _header_map(cells) -> Dict[int, str]:
+    """column position -> field for a header row, or {} when `cells` isn't one."""
+    columns = {}
+    for pos, value in enumerate(cells):
+        field = HEADER_ALIASES.get(_text(value).lower())
+        if field is not None and field not in columns.values():
+            columns[pos] = field
+    return columns if all(f in columns.values() for f in REQUIRED_FIELDS) else {}
+
+
+def mapped_rows(rows: Iterable[Tuple[int, tuple]]) -> Iterator[Tuple[int, dict]]:
+    """(row number, {field: text}) for the data rows below the first header row.
+
+    `rows` are (row number, cell values) pairs; fully blank rows are skipped.
+    """
+    columns = {}
+    for number, cells in rows:
+        if not columns:
+            columns = _header_map(cells)
+            if not columns and number >= HEADER_SEARCH_ROWS:
+                break
+            continue
+        if all(_text(v) == '' for v in cells):
+            continue
+        yield number, {field: _text(cells[pos]) if pos < len(cells) else '' for pos, field in columns.items()}
+    if not columns:
+        raise ImportFileError('No header row with LRN, student and sex columns found')
+
+
+def excel_rows(fileobj, sheet: Optional[str] = None) -> Iterator[Tuple[int, dict]]:
+    """Stream mapped rows from an .xlsx upload without loading the whole workbook."""
+    from openpyxl import load_workbook
+
+    try:
+        wb = load_workbook(fileobj, read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFileError(f'Not a readable Excel file: {e}')
+    try:
+        if sheet:
+            if sheet not in wb.sheetnames:
+                raise ImportFileError(f'Sheet not found: {sheet}')
+            ws = wb[sheet]
+        else:
+            ws = wb.worksheets[0]
+        yield from mapped_rows(enumerate(ws.iter_rows(values_only=True), start=1))
+    finally:
+        wb.close()
+
+
+def csv_rows(lines: Iterable[str]) -> Iterator[Tuple[int, dict]]:
+    """Mapped rows from CSV text lines (header row first, as in LIS exports)."""
+    reader = csv.reader(lines)
+    yield from mapped_rows((reader.line_num, cells) for cells in reader)
+
+
+def jsonl_rows(lines: Iterable[str]) -> Iterator[Tuple[int, dict]]:
+    """Mapped rows from JSON Lines: one object per line, keyed like the header row."""
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            obj = None
+        if not isinstance(obj, dict):
+            yield number, {ROW_ERROR: 'Not a JSON object'}
+            continue
+        values = {}
+        for key, value in obj.items():
+            field = HEADER_ALIASES.get(str(key).strip().lower())
+            if field is not None:
+                values[field] = _text(value)
+        yield number, values
+
+
+def validate_row(values: dict) -> Tuple[Optional[dict], Optional[str]]:
+    """(Registration field values, None) or (None, error message) for one mapped row."""
+    if ROW_ERROR in values:
+        return None, values[ROW_ERROR]
+    lrn = values.get('lrn', '')
+    if not lrn:
+        return None, 'LRN is required'
+    fields = {'lrn': lrn, 'student': values.get('student', '')}
+    if not fields['student']:
+        return None, 'Student name is required'
+    sex = SEX_VALUES.get(values.get('sex', '').lower())
+    if sex is None:
+        return None, f"Sex must be Male or Female, got {values.get('sex', '')!r}"
+    fields['sex'] = sex
+    fields['parent'] = values.get('parent', '')
+    fields['guardian'] = values.get('guardian', '')
+    for name, value in fields.items():
+        limit = Registration._meta.get_field(name).max_length
+        if len(value) > limit:
+            return None, f'{name} is longer than {limit} characters'
+    return fields, None
+
+
+def import_rows(rows: Iterable[Tuple[int, dict]], section_id: Optional[int] = None,
+                chunk_size: Optional[int] = None, dry_run: bool = False) -> dict:
+    """Validate and upsert mapped rows by LRN; returns counts, conflicts and rejected rows.
+
+    Valid rows are written in chunks of `chunk_size` (settings.ROSTER_IMPORT_CHUNK_SIZE),
+    each in its own short transaction, so a large file never holds the database write
+    lock for long. Invalid rows and repeated LRNs are skipped and reported. Rows whose LRN
+    is already registered with different details are reported as conflicts (and
+    overwritten unless `dry_run`, which writes nothing). `section_id` puts every imported
+    learner in that section.
+    """
+    if chunk_size is None:
+        chunk_size = getattr(settings, 'ROSTER_IMPORT_CHUNK_SIZE', 500)
+    compared = UPDATE_FIELDS + (['section_id'] if section_id is not None else [])
+    update_fields = UPDATE_FIELDS + (['section'] if section_id is not None else [])
+    summary = {
+        'dry_run': dry_run, 'rows': 0, 'inserted': 0, 'updated': 0,
+        'conflict_count': 0, 'conflicts': [], 'error_count': 0, 'errors': [],
+    }
+    seen = set()
+    chunk = []  # [(row number, Registration)]
+
+    def report(kind, entry):
+        summary[kind[:-1] + '_count'] += 1
+        if len(summary[kind]) < MAX_REPORTED_ERRORS:
+            summary[kind].append(entry)
+
+    def flush():
+        by_lrn = {obj.lrn: (number, obj) for number, obj in chunk}
+        with nullcontext() if dry_run else transaction.atomic():
+            existing = list(Registration.objects.filter(lrn__in=list(by_lrn)).values('lrn', *compared))
+            for current in existing:
+                number, obj = by_lrn[current['lrn']]
+                changed = {f: [current[f], getattr(obj, f)] for f in compared if current[f] != getattr(obj, f)}
+                if changed:
+                    report('conflicts', {'row': number, 'lrn': obj.lrn, 'fields': changed})
+            summary['updated'] += len(existing)
+            summary['inserted'] += len(chunk) - len(existing)
+            if not dry_run:
+                Registration.objects.bulk_create(
+                    [obj for _, obj in chunk], update_conflicts=True, unique_fields=['lrn'],
+                    update_fields=update_fields,
+                )
+                versioning.bump(versioning.REGISTRATION)
+                # names and ids of any LRN may have changed; drop the whole cache now and on commit
+                lrn_cache.clear()
+                transaction.on_commit(lrn_cache.clear)
+        chunk.clear()
+
+    for number, values in rows:
+        summary['rows'] += 1
+        fields, error = validate_row(values)
+        if error:
+            report('errors', {'row': number, 'lrn': values.get('lrn', ''), 'error': error})
+            continue
+        if fields['lrn'] in seen:
+            report('errors', {'row': number, 'lrn': fields['lrn'], 'error': 'LRN appears more than once in the file'})
+            continue
+        seen.add(fields['lrn'])
+        chunk.append((number, Registration(section_id=section_id, **fields)))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return summary
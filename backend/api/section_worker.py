@@ -0,0 +1,21 @@
+"""Process-pool entry points for rendering one section's SF2 workbook.
+
+Kept free of model imports at module level: spawned workers unpickle these functions
+before Django is set up, so init() configures Django first and render() imports the
+export code lazily.
+"""
+
+
+def init():
+    import django
+    django.setup()
+
+
+def render(args) -> bytes:
+    """One section's school-year SF2 workbook as xlsx bytes."""
+    from .utils_export import build_attendance_workbook
+
+    section_id, school_year, include_names, incremental = args
+    return build_attendance_workbook(
+        include_names=include_names, school_year=school_year, incremental=incremental, section_id=section_id,
+    ).getvalue()
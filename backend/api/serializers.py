@@ -1,5 +1,15 @@
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Registration, Attendance, DroppedRegistration
+from .models import Registration, Attendance, DroppedRegistration, ExportJob, Section, ArchivedSchoolYear
+from .models import local_date_and_session
+
+
+class SectionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Section
+        fields = '__all__'
+
 
 class RegistrationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -12,10 +22,67 @@ class AttendanceSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Attendance
-        fields = ['id', 'student', 'student_name', 'time']
+        fields = ['id', 'student', 'student_name', 'time', 'local_date', 'session']
+
+    def validate(self, attrs):
+        # local_date and session aren't editable, so DRF builds no validator for the
+        # one-scan-per-session constraint; check the slot the save will derive
+        instance = self.instance
+        student = attrs.get('student', instance.student if instance else None)
+        time = attrs.get('time', instance.time if instance else timezone.now())
+        local_date, session = local_date_and_session(time)
+        taken = Attendance.objects.filter(student=student, local_date=local_date, session=session)
+        if instance is not None:
+            taken = taken.exclude(pk=instance.pk)
+        if taken.exists():
+            raise serializers.ValidationError(
+                f'{student.student} already has a {session} scan on {local_date.isoformat()}')
+        return attrs
+
+
+# Shared field instances so the fast path formats values exactly like AttendanceSerializer
+_time_field = serializers.DateTimeField()
+_date_field = serializers.DateField()
+
+
+def attendance_values(queryset):
+    """Read-only fast path for attendance list endpoints.
+
+    Returns flat dict rows (one joined query, no per-row serializer machinery) in the
+    AttendanceSerializer shape; pass the fetched rows through render_attendance_rows.
+    """
+    return queryset.values(
+        'id', 'student', 'time', 'local_date', 'session', student_name=F('student__student'),
+    )
+
+
+def render_attendance_rows(rows):
+    to_time = _time_field.to_representation
+    to_date = _date_field.to_representation
+    rendered = []
+    for row in rows:
+        row['time'] = to_time(row['time'])
+        row['local_date'] = to_date(row['local_date'])
+        rendered.append(row)
+    return rendered
 
 
 class DroppedRegistrationSerializer(serializers.ModelSerializer):
     class Meta:
         model = DroppedRegistration
         fields = '__all__'
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    url = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'kind', 'params', 'status', 'progress', 'message', 'filename', 'url', 'error',
+                  'created_at', 'started_at', 'finished_at']
+
+
+class ArchivedSchoolYearSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedSchoolYear
+        fields = ['school_year', 'filename', 'size_bytes', 'sha256', 'counts', 'created_at']
@@ -0,0 +1,91 @@
+"""Cell values for one SF2 month sheet, computed from plain Python data.
+
+Nothing here touches Django or openpyxl objects: the grids are [(row, column, value)]
+lists that utils_export.write_grid applies to a worksheet.
+"""
+
+# Male rows start 13, female at 64 as front-end expects
+MALE_FIRST_ROW = 13
+FEMALE_FIRST_ROW = 64
+NAME_COLUMN = 2
+
+
+def absent_columns(date_cols, present_days):
+    """student_id -> absent flag per date column, from student_id -> set of present days.
+
+    Present days are left blank, everything else is marked 'X'; day 1 is always 'X' as in
+    the front-end template. presence_matrix.PresenceMatrix.absent_columns is the NumPy
+    equivalent.
+    """
+    return {
+        student_id: [not (day in present and day != 1) for _, day in date_cols]
+        for student_id, present in present_days.items()
+    }
+
+
+def month_grid(date_cols, males, females, absent, include_names=False):
+    """[(row, column, value)] writes for one month sheet, in the order they should be applied.
+
+    `males`/`females` are [(student_id, visible name)] in sheet order and `absent` maps
+    student_id -> absent flag per entry of `date_cols` (see absent_columns); students
+    missing from it are absent every day.
+    """
+    all_absent = [True] * len(date_cols)
+    cells = []
+    for start_row, roster in ((MALE_FIRST_ROW, males), (FEMALE_FIRST_ROW, females)):
+        for row, (student_id, visible) in enumerate(roster, start=start_row):
+            if include_names:
+                cells.append((row, NAME_COLUMN, visible))
+            for (col_idx, _), is_absent in zip(date_cols, absent.get(student_id, all_absent)):
+                # marked present in attendance -> leave blank, else X
+                cells.append((row, col_idx, 'X' if is_absent else ''))
+    return cells
+
+
+# Footer layout: per-day totals below each roster, per-learner counts in AF/AG and the
+# summary block (M / F / TOTAL in AK / AL / AM)
+SCHOOL_DAYS_CELL = (9, 43)  # AQ9
+MALE_TOTAL_ROW = 63
+FEMALE_TOTAL_ROW = 114
+COMBINED_TOTAL_ROW = 115
+ABSENT_COLUMN = 32  # AF
+PRESENT_COLUMN = 33  # AG
+SUMMARY_COLUMNS = {'male': 37, 'female': 38, 'total': 39}  # AK, AL, AM
+REGISTERED_ROW = 123
+AVERAGE_ROW = 127
+PERCENTAGE_ROW = 128
+CONSECUTIVE_ROW = 130
+
+
+def summary_grid(date_cols, summary):
+    """[(row, column, value)] writes putting a presence_matrix.sf2_totals summary in the footer.
+
+    The computed values replace the template's COUNTIF/COUNTA formulas, which only work
+    when learner names are filled in. Date columns for days outside the summary are blanked.
+    """
+    totals_rows = {'male': MALE_TOTAL_ROW, 'female': FEMALE_TOTAL_ROW, 'total': COMBINED_TOTAL_ROW}
+    daily = {entry['day']: entry['present'] for entry in summary['daily']}
+    cells = [SCHOOL_DAYS_CELL + (len(summary['school_days']),)]
+    for col_idx, day in date_cols:
+        present = daily.get(day)
+        for sex, row in totals_rows.items():
+            cells.append((row, col_idx, present[sex] if present is not None else ''))
+    for sex, row in totals_rows.items():
+        cells.append((row, ABSENT_COLUMN, summary['absent_days'][sex]))
+        cells.append((row, PRESENT_COLUMN, summary['present_days'][sex]))
+
+    learners = summary['learners']
+    males = summary['registered']['male']
+    rows = [MALE_FIRST_ROW + i for i in range(males)]
+    rows += [FEMALE_FIRST_ROW + i for i in range(summary['registered']['female'])]
+    for row, absent, present in zip(rows, learners['absent'], learners['present']):
+        cells.append((row, ABSENT_COLUMN, absent))
+        cells.append((row, PRESENT_COLUMN, present))
+
+    for sex, col in SUMMARY_COLUMNS.items():
+        cells.append((REGISTERED_ROW, col, summary['registered'][sex]))
+        cells.append((AVERAGE_ROW, col, summary['average_daily_attendance'][sex]))
+        # the template formats this row as a percentage
+        cells.append((PERCENTAGE_ROW, col, summary['percentage_of_attendance'][sex] / 100.0))
+        cells.append((CONSECUTIVE_ROW, col, summary['consecutive_absences'][sex]))
+    return cells
@@ -0,0 +1,81 @@
+"""Model signal receivers, connected in ApiConfig.ready()."""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import events, presence, versioning
+from .lrn_cache import lrn_cache
+from .models import Attendance, DroppedRegistration, Registration, Section
+
+
+def _invalidate_lrn(instance):
+    # drop by id as well so an edited LRN doesn't leave the old key resolvable; repeat on
+    # commit so a concurrent scan can't re-cache the pre-write row in between
+    lrn, pk = instance.lrn, instance.pk
+    lrn_cache.invalidate(lrn=lrn, pk=pk)
+    transaction.on_commit(lambda: lrn_cache.invalidate(lrn=lrn, pk=pk))
+
+
+@receiver(post_save, sender=Registration)
+def registration_saved(sender, instance, **kwargs):
+    _invalidate_lrn(instance)
+    versioning.bump(versioning.REGISTRATION)
+
+
+@receiver(post_delete, sender=Registration)
+def registration_deleted(sender, instance, **kwargs):
+    _invalidate_lrn(instance)
+    versioning.bump(versioning.REGISTRATION)
+
+
+@receiver(pre_save, sender=Attendance)
+def attendance_saving(sender, instance, raw=False, **kwargs):
+    # an edit can move the scan to another day or session; remember the slot it leaves
+    if instance.pk is not None and not raw:
+        instance._presence_slot = Attendance.objects.filter(pk=instance.pk).values_list(
+            'student_id', 'local_date', 'session').first()
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_saved(sender, instance, created, **kwargs):
+    if created:
+        # inserts move the max-id high-water mark, so no version bump is needed
+        presence.mark(instance.student_id, instance.local_date, instance.session)
+        events.attendance_recorded([instance])
+        return
+    previous = getattr(instance, '_presence_slot', None)
+    current = (instance.student_id, instance.local_date, instance.session)
+    if previous != current:
+        if previous is not None:
+            presence.unmark(*previous)
+        presence.mark(*current)
+    versioning.bump(versioning.ATTENDANCE_CHANGE)
+
+
+@receiver(post_delete, sender=Attendance)
+def attendance_deleted(sender, instance, origin=None, **kwargs):
+    # rollup rows cascade with their registration and the registration bump covers the
+    # version, so skip per-scan work on a drop
+    if isinstance(origin, Registration) or getattr(origin, 'model', None) is Registration:
+        return
+    presence.unmark(instance.student_id, instance.local_date, instance.session)
+    versioning.bump(versioning.ATTENDANCE_CHANGE)
+
+
+@receiver(post_save, sender=DroppedRegistration)
+@receiver(post_delete, sender=DroppedRegistration)
+def dropped_changed(sender, **kwargs):
+    versioning.bump(versioning.DROPPED)
+
+
+@receiver(post_save, sender=Section)
+def section_saved(sender, instance, **kwargs):
+    versioning.bump(versioning.SECTION)
+
+
+@receiver(post_delete, sender=Section)
+def section_deleted(sender, instance, **kwargs):
+    # the SET_NULL on registrations and dropped copies is a bulk update without signals
+    versioning.bump(versioning.REGISTRATION)
+    versioning.bump(versioning.DROPPED)
+    versioning.bump(versioning.SECTION)
@@ -0,0 +1,98 @@
+"""Process-wide registry of parsed Excel templates.
+
+openpyxl.load_workbook on the SF2 template takes seconds, and the result is the same on
+every export. The registry parses each template file once, keeps a pickled snapshot of
+the workbook together with per-sheet date-column maps (row 10 of the SF2 layout), and
+hands out fresh copies by unpickling the snapshot, which is several times faster than
+re-parsing. A template whose mtime changed on disk is parsed again on the next request.
+"""
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from django.conf import settings
+from openpyxl import load_workbook
+
+DATE_HEADER_ROW = 10
+
+
+def get_cell_day(cell):
+    """Day number in a template date-header cell (similar to front-end getCellDay)."""
+    v = cell.value
+    if v is None:
+        return None
+    if isinstance(v, int):
+        return v
+    if isinstance(v, str) and v.strip().isdigit():
+        return int(v.strip())
+    if isinstance(v, datetime):
+        return v.day
+    return None
+
+
+def read_date_columns(ws):
+    """[(column index, day number)] read from the date header row of a sheet."""
+    cols = []
+    for idx, cell in enumerate(ws[DATE_HEADER_ROW], start=1):
+        d = get_cell_day(cell)
+        if d is not None:
+            cols.append((idx, d))
+    return cols
+
+
+class ParsedTemplate:
+    def __init__(self, path: str, mtime: float):
+        wb = load_workbook(path)
+        self.path = path
+        self.mtime = mtime
+        self.sheetnames = list(wb.sheetnames)
+        self.date_columns = {name: read_date_columns(wb[name]) for name in wb.sheetnames}
+        self._snapshot = pickle.dumps(wb, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def workbook(self):
+        """A private, writable copy of the parsed workbook."""
+        return pickle.loads(self._snapshot)
+
+
+class TemplateRegistry:
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # path -> ParsedTemplate
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.hits = 0
+
+    def get(self, path) -> ParsedTemplate:
+        """Parsed template for `path`, re-parsed if the file changed since it was loaded."""
+        path = str(path)
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.mtime == mtime:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+            # parse under the lock so concurrent exports don't all pay for the same load
+            entry = ParsedTemplate(path, mtime)
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.loads += 1
+            return entry
+
+    def workbook(self, path):
+        return self.get(path).workbook()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'size': len(self._entries), 'loads': self.loads, 'hits': self.hits}
+
+
+template_registry = TemplateRegistry(max_entries=getattr(settings, 'TEMPLATE_REGISTRY_MAX_ENTRIES', 4))
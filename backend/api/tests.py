@@ -1,13 +1,45 @@
-from django.test import TestCase
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import Future
+from pathlib import Path
+from unittest import mock
+
+import openpyxl
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
 from rest_framework.test import APIClient
 from django.urls import reverse
-from .models import Registration, Attendance
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from .models import ArchivedSchoolYear, Registration, Attendance, MonthlyPresence, Section
+from .serializers import AttendanceSerializer
+from .sf2_grid import absent_columns
+from . import archive, bulk_delete, events, group_commit, presence, presence_matrix, utils_export, versioning
+from .utils_export import (
+	build_attendance_workbook, find_sf2_template, generate_all_sections_export, generate_month_export,
+	generate_school_year_export,
+)
+from .export_cache import export_cache
+from .lrn_cache import lrn_cache
+from .template_registry import template_registry
+from unittest import skipUnless
 from django.utils import timezone
+from datetime import date, datetime, timezone as dt_timezone
 
 
 class AttendanceAPITestCase(TestCase):
 	def setUp(self):
 		self.client = APIClient()
+		# the roster cache is process-wide and doesn't see test rollbacks
+		lrn_cache.clear()
 		# create a registration to reference
 		self.reg = Registration.objects.create(lrn='TESTLRN001', student='Test Student', sex='Male')
 
@@ -36,3 +68,813 @@ class AttendanceAPITestCase(TestCase):
 		self.assertEqual(res.status_code, 200)
 		data = res.json()
 		self.assertTrue(isinstance(data, list))
+
+	def test_batch_record_attendance(self):
+		scanned_at = '2025-10-20T07:15:00+08:00'
+		payload = [
+			{'lrn': self.reg.lrn, 'scanned_at': scanned_at},
+			{'lrn': 'UNKNOWN', 'scanned_at': scanned_at},
+			{'lrn': self.reg.lrn, 'scanned_at': scanned_at},
+			{'scanned_at': scanned_at},
+		]
+		res = self.client.post('/api/attendance/batch/', payload, format='json')
+		self.assertEqual(res.status_code, 200)
+		statuses = [r['status'] for r in res.json()['results']]
+		self.assertEqual(statuses, ['created', 'unknown_lrn', 'duplicate', 'invalid'])
+		self.assertEqual(Attendance.objects.count(), 1)
+		self.assertEqual(Attendance.objects.get().time.isoformat(), '2025-10-19T23:15:00+00:00')
+
+		# a retried flush of the same buffer must not insert twice
+		first_id = res.json()['results'][0]['id']
+		res = self.client.post('/api/attendance/batch/', {'scans': payload[:1]}, format='json')
+		self.assertEqual(res.json()['results'][0], {'lrn': self.reg.lrn, 'status': 'created', 'id': first_id})
+		self.assertEqual(Attendance.objects.count(), 1)
+
+		# a later scan in the same session is a duplicate; the afternoon one is new
+		res = self.client.post('/api/attendance/batch/', [
+			{'lrn': self.reg.lrn, 'scanned_at': '2025-10-20T07:45:00+08:00'},
+			{'lrn': self.reg.lrn, 'scanned_at': '2025-10-20T13:00:00+08:00'},
+		], format='json')
+		self.assertEqual([r['status'] for r in res.json()['results']], ['duplicate', 'created'])
+		self.assertEqual(Attendance.objects.count(), 2)
+
+	def test_lrn_cache_hits_and_invalidation(self):
+		before = self.client.get('/api/attendance/lrn_cache/').json()
+		self.client.post('/api/attendance/', {'lrn': self.reg.lrn}, format='json')
+		with CaptureQueriesContext(connection) as ctx:
+			self.client.post('/api/attendance/', {'lrn': self.reg.lrn}, format='json')
+		self.assertFalse([q for q in ctx.captured_queries if 'api_registration' in q['sql']])
+		after = self.client.get('/api/attendance/lrn_cache/').json()
+		self.assertEqual(after['hits'] - before['hits'], 1)
+		self.assertEqual(after['misses'] - before['misses'], 1)
+
+		# dropping the student must evict the cached LRN
+		self.client.post(f'/api/registrations/{self.reg.id}/drop/')
+		res = self.client.post('/api/attendance/', {'lrn': self.reg.lrn}, format='json')
+		self.assertEqual(res.status_code, 404)
+
+	def test_local_date_and_session_stamped(self):
+		# 16:30 UTC is 00:30 the next day in Asia/Manila
+		a = Attendance.objects.create(student=self.reg, time=datetime(2025, 10, 20, 16, 30, tzinfo=dt_timezone.utc))
+		self.assertEqual((str(a.local_date), a.session), ('2025-10-21', Attendance.AM))
+		res = self.client.post('/api/attendance/batch/', [{'lrn': self.reg.lrn, 'scanned_at': '2025-10-21T13:05:00+08:00'}], format='json')
+		b = Attendance.objects.get(pk=res.json()['results'][0]['id'])
+		self.assertEqual((str(b.local_date), b.session), ('2025-10-21', Attendance.PM))
+
+		today = Attendance.objects.create(student=self.reg)
+		data = self.client.get('/api/attendance/today/').json()
+		self.assertEqual([r['id'] for r in data], [today.id])
+
+	def test_repeat_scan_is_ignored(self):
+		first = self.client.post('/api/attendance/', {'lrn': self.reg.lrn}, format='json')
+		self.assertEqual(first.status_code, 201)
+		again = self.client.post('/api/attendance/', {'lrn': self.reg.lrn}, format='json')
+		self.assertEqual(again.status_code, 200)
+		self.assertTrue(again.json()['already_recorded'])
+		self.assertEqual(Attendance.objects.count(), 1)
+
+	def test_attendance_list_filters_and_cursor(self):
+		other = Registration.objects.create(lrn='TESTLRN002', student='Other Student', sex='Female')
+		for day in (20, 21, 22):
+			for reg in (self.reg, other):
+				Attendance.objects.create(student=reg, time=datetime(2025, 10, day, 0, 30, tzinfo=dt_timezone.utc))
+
+		data = self.client.get('/api/attendance/?date=2025-10-21').json()
+		self.assertEqual(len(data), 2)
+		data = self.client.get(f'/api/attendances/?from=2025-10-21&to=2025-10-22&lrn={other.lrn}').json()
+		self.assertEqual([r['local_date'] for r in data], ['2025-10-21', '2025-10-22'])
+		self.assertEqual(self.client.get('/api/attendance/?date=not-a-date').status_code, 400)
+
+		# walk every page; ordering is (time, id) and pages don't overlap
+		seen = []
+		url = '/api/attendance/?page_size=4'
+		while url:
+			page = self.client.get(url).json()
+			seen.extend(r['id'] for r in page['results'])
+			url = page['next']
+		self.assertEqual(seen, list(Attendance.objects.order_by('time', 'id').values_list('id', flat=True)))
+		page = self.client.get('/api/attendances/?page_size=5').json()
+		self.assertEqual(len(page['results']), 5)
+		self.assertIsNotNone(page['cursor'])
+
+	def test_attendance_lists_constant_queries(self):
+		for i in range(5):
+			reg = Registration.objects.create(lrn=f'QLRN{i}', student=f'Student {i}', sex='Male')
+			Attendance.objects.create(student=reg)
+			Attendance.objects.create(student=reg, time=datetime(2025, 10, 20, 1, 0, tzinfo=dt_timezone.utc))
+
+		for url in ('/api/attendance/', '/api/attendances/', '/api/attendance/today/', '/api/attendances/today/'):
+			with self.assertNumQueries(1):
+				res = self.client.get(url)
+			self.assertEqual(res.status_code, 200)
+		with self.assertNumQueries(1):
+			self.client.get('/api/attendance/?page_size=3')
+
+		# the fast path emits exactly what AttendanceSerializer would
+		fast = self.client.get('/api/attendances/').json()
+		slow = AttendanceSerializer(Attendance.objects.order_by('time', 'id'), many=True).data
+		self.assertEqual(fast, [dict(r) for r in slow])
+
+	def test_monthly_presence_rollup(self):
+		def masks():
+			return set(MonthlyPresence.objects.values_list('student_id', 'year', 'month', 'am_mask', 'pm_mask'))
+
+		today = timezone.localdate()
+		self.client.post('/api/attendance/', {'lrn': self.reg.lrn}, format='json')
+		self.client.post('/api/attendance/batch/', [
+			{'lrn': self.reg.lrn, 'scanned_at': '2025-10-03T07:00:00+08:00'},
+			{'lrn': self.reg.lrn, 'scanned_at': '2025-10-03T13:00:00+08:00'},
+			{'lrn': self.reg.lrn, 'scanned_at': '2025-10-05T13:00:00+08:00'},
+		], format='json')
+		self.assertIn((self.reg.id, 2025, 10, 0b100, 0b10100), masks())
+
+		# per-row delete clears its bit; rebuild from raw rows agrees with the incremental rollup
+		Attendance.objects.get(local_date='2025-10-05').delete()
+		self.assertIn((self.reg.id, 2025, 10, 0b100, 0b100), masks())
+		incremental = masks()
+		call_command('rebuild_presence', workers=1, chunk_size=1, stdout=io.StringIO())
+		self.assertEqual(masks(), incremental)
+
+		self.client.delete('/api/attendance/clear/?scope=today')
+		self.assertFalse(Attendance.objects.filter(local_date=today).exists())
+		self.assertTrue(all(
+			not (am | pm) & (1 << (today.day - 1))
+			for _, y, m, am, pm in masks() if (y, m) == (today.year, today.month)
+		))
+		self.client.delete('/api/attendance/clear/?scope=all')
+		self.assertEqual(masks(), set())
+
+	def test_chunked_clears_and_background_job(self):
+		regs = [self.reg] + [
+			Registration.objects.create(lrn=f'CLR{i}', student=f'Clear {i}', sex='Female') for i in range(4)
+		]
+		Attendance.objects.bulk_create([
+			Attendance(student=reg, time=datetime(2025, 10, day, 0, 30, tzinfo=dt_timezone.utc))
+			for reg in regs for day in (1, 2)
+		])
+		presence.rebuild()
+		self.client.post('/api/attendance/', {'lrn': self.reg.lrn}, format='json')
+
+		steps = []
+		with override_settings(BULK_DELETE_CHUNK_SIZE=3), CaptureQueriesContext(connection) as ctx:
+			deleted = bulk_delete.clear_attendance('all', progress=lambda pct, message: steps.append(pct))
+		self.assertEqual(deleted, 11)
+		# 11 scans go in four bounded deletes, after two for the 6 rollup rows
+		deletes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('DELETE')]
+		self.assertEqual([sql.split('"')[1] for sql in deletes], ['api_monthlypresence'] * 2 + ['api_attendance'] * 4)
+		self.assertEqual(steps, [27, 54, 81, 99])
+		self.assertFalse(MonthlyPresence.objects.exists())
+
+		Attendance.objects.create(student=self.reg)
+		with override_settings(EXPORT_JOB_WORKERS=0, BULK_DELETE_CHUNK_SIZE=2):
+			with self.captureOnCommitCallbacks(execute=True):
+				res = self.client.delete('/api/registrations/clear_all/?background=1')
+			self.assertEqual(res.status_code, 202)
+			job = self.client.get(res.json()['status_url']).json()
+		self.assertEqual((job['kind'], job['status'], job['progress']), ('clear_registrations', 'done', 100))
+		self.assertFalse(Registration.objects.exists() or Attendance.objects.exists())
+		res = self.client.post('/api/attendance/', {'lrn': self.reg.lrn}, format='json')
+		self.assertEqual(res.status_code, 404)
+		res = self.client.post('/api/attendance/export_jobs/', {'kind': 'clear_registrations'}, format='json')
+		self.assertEqual(res.status_code, 400)
+
+	def test_clear_settles_presence_to_the_scans_left(self):
+		early = Registration.objects.create(lrn='CLR8', student='Early Scan', sex='Female')
+		late = Registration.objects.create(lrn='CLR9', student='Late Scan', sex='Female')
+		self.client.post('/api/attendance/', {'lrn': self.reg.lrn}, format='json')
+		today = timezone.localdate()
+		bit = 1 << (today.day - 1)
+		pk_ranges, raw_delete = bulk_delete._pk_ranges, bulk_delete._raw_delete
+
+		def scan_before_ranges(queryset, chunk_size):
+			# saved after the clear started but before its rows were bounded: deleted with them
+			self.client.post('/api/attendance/', {'lrn': early.lrn}, format='json')
+			return pk_ranges(queryset, chunk_size)
+
+		def scan_while_deleting(queryset):
+			# saved while the chunks run: kept, with its bit
+			if not Attendance.objects.filter(student=late).exists():
+				self.client.post('/api/attendance/', {'lrn': late.lrn}, format='json')
+			return raw_delete(queryset)
+
+		with mock.patch.object(bulk_delete, '_pk_ranges', scan_before_ranges), \
+				mock.patch.object(bulk_delete, '_raw_delete', scan_while_deleting):
+			self.assertEqual(bulk_delete.clear_attendance('today'), 2)
+		self.assertEqual(list(Attendance.objects.values_list('student_id', flat=True)), [late.id])
+		rollup = {sid: (am | pm) & bit for sid, am, pm in MonthlyPresence.objects.filter(
+			year=today.year, month=today.month).values_list('student_id', 'am_mask', 'pm_mask')}
+		self.assertEqual(rollup, {self.reg.id: 0, early.id: 0, late.id: bit})
+
+	def test_section_scoped_lists(self):
+		rizal = Section.objects.create(grade='Grade 7', name='Rizal', school_year=2025)
+		mabini = Section.objects.create(grade='Grade 7', name='Mabini', school_year=2025)
+		a = Registration.objects.create(lrn='SEC001', student='A', sex='Male', section=rizal)
+		b = Registration.objects.create(lrn='SEC002', student='B', sex='Female', section=mabini)
+		Attendance.objects.create(student=a)
+		Attendance.objects.create(student=b)
+
+		res = self.client.get(f'/api/registrations/grouped/?section={rizal.pk}')
+		self.assertEqual(([r['lrn'] for r in res.data['male']], res.data['female']), (['SEC001'], []))
+		res = self.client.get(f'/api/registrations/?section={mabini.pk}')
+		self.assertEqual([r['lrn'] for r in res.data], ['SEC002'])
+		for url in ('/api/attendance/today/', '/api/attendances/today/', '/api/attendance/'):
+			res = self.client.get(f'{url}?section={rizal.pk}')
+			self.assertEqual([r['student'] for r in res.data], [a.pk], url)
+		self.assertEqual(self.client.get('/api/attendance/today/?section=x').status_code, 400)
+
+	def test_roster_import_upserts_in_chunks(self):
+		wb = openpyxl.Workbook()
+		ws = wb.active
+		ws.append(['Grade 7 roster'])
+		ws.append(['LRN', 'Name', 'Sex', 'Parent', 'Guardian'])
+		ws.append([self.reg.lrn, 'Renamed Student', 'M', 'P', 'G'])
+		ws.append([123456789012, 'New, Girl', 'female', '', ''])
+		ws.append(['NEWLRN2', 'New, Boy', 'Male'])
+		ws.append(['NEWLRN2', 'Again, Boy', 'Male'])
+		ws.append(['', 'No LRN', 'Male'])
+		ws.append(['BADSEX', 'Who', 'x'])
+		upload = io.BytesIO()
+		wb.save(upload)
+		upload.name = 'roster.xlsx'
+		upload.seek(0)
+		section = Section.objects.create(grade='7', name='Rizal', school_year=2025)
+
+		with override_settings(ROSTER_IMPORT_CHUNK_SIZE=2):
+			res = self.client.post(f'/api/attendance/upload_excel/?mode=import&section={section.pk}', {'file': upload})
+		self.assertEqual(res.status_code, 200)
+		summary = res.json()
+		self.assertEqual((summary['rows'], summary['inserted'], summary['updated'], summary['error_count']), (6, 2, 1, 3))
+		self.assertEqual([e['row'] for e in summary['errors']], [6, 7, 8])
+		self.reg.refresh_from_db()
+		self.assertEqual((self.reg.student, self.reg.section_id), ('Renamed Student', section.pk))
+		self.assertEqual(Registration.objects.get(lrn='123456789012').sex, 'Female')
+		self.assertEqual(section.registrations.count(), 3)
+
+		res = self.client.post('/api/attendance/upload_excel/?mode=import', {'file': io.BytesIO(b'not excel')})
+		self.assertEqual(res.status_code, 400)
+
+	def test_bulk_upsert_csv_dry_run_and_jsonl(self):
+		body = (
+			'\ufeffLRN,Student,Sex,Parent,Guardian\n'
+			f'{self.reg.lrn},"Student, Test",Male,,\n'
+			'CSV001,"Line\nBreak, Ann",F,Mom,\n'
+			'CSV002,Boy,M,,\n'
+		).encode('utf-8')
+		url = '/api/registrations/bulk_upsert/'
+		res = self.client.post(url + '?dry_run=1', body, content_type='text/csv')
+		self.assertEqual(res.status_code, 200)
+		summary = res.json()
+		self.assertEqual((summary['inserted'], summary['updated'], summary['conflict_count']), (2, 1, 1))
+		self.assertEqual(summary['conflicts'][0]['fields'], {'student': ['Test Student', 'Student, Test']})
+		self.assertEqual(Registration.objects.count(), 1)
+
+		with CaptureQueriesContext(connection) as ctx:
+			res = self.client.post(url + '?batch_size=2', body, content_type='text/csv')
+		self.assertEqual(res.json()['error_count'], 0)
+		# one transaction per batch of two rows
+		self.assertEqual(sum(1 for q in ctx.captured_queries if q['sql'].startswith('SAVEPOINT')), 2)
+		self.assertEqual(Registration.objects.get(lrn='CSV001').student, 'Line\nBreak, Ann')
+
+		lines = '{"lrn": "JSON001", "name": "Jay", "gender": "male"}\nnot json\n\n{"lrn": "JSON002", "sex": "F"}\n'
+		res = self.client.post(url, lines.encode(), content_type='application/x-ndjson')
+		summary = res.json()
+		self.assertEqual((summary['inserted'], summary['error_count']), (1, 2))
+		self.assertEqual([e['row'] for e in summary['errors']], [2, 4])
+		self.assertEqual(self.client.post(url, b'{}', content_type='application/json').status_code, 415)
+
+	@skipUnless(presence_matrix.available(), 'NumPy not installed')
+	def test_presence_matrix_matches_dict_path(self):
+		other = Registration.objects.create(lrn='TESTLRN002', student='Other Student', sex='Female')
+		scans = [
+			(self.reg, datetime(2025, 6, 3, 0, 30, tzinfo=dt_timezone.utc)),  # Tue 3 AM
+			(self.reg, datetime(2025, 6, 3, 6, 30, tzinfo=dt_timezone.utc)),  # Tue 3 PM
+			(other, datetime(2025, 6, 30, 6, 30, tzinfo=dt_timezone.utc)),  # Mon 30 PM
+			(other, datetime(2025, 7, 1, 0, 30, tzinfo=dt_timezone.utc)),  # next month
+		]
+		for student, when in scans:
+			Attendance.objects.create(student=student, time=when)
+		ids = [self.reg.pk, other.pk, 999999]
+
+		with self.assertNumQueries(1):
+			matrix = presence_matrix.PresenceMatrix.load(2025, 6, ids)
+		self.assertEqual(matrix.data.shape, (3, 30, 2))
+		self.assertEqual(utils_export.month_flag_rows(2025, 6, ids), dict(zip(ids, matrix.flags().tolist())))
+		self.assertEqual(matrix.flags()[0, 2], 3)
+		# June 2025 has 21 weekdays
+		self.assertEqual(matrix.absences().tolist(), [20, 20, 21])
+		self.assertEqual(matrix.daily_present()[[2, 29]].tolist(), [1, 1])
+		self.assertAlmostEqual(matrix.attendance_percentage(), 2 * 100 / 63)
+
+		# same sheet marks as the pure-Python path
+		date_cols = [(7, 1), (8, 2), (9, 3), (10, 30), (11, 31)]
+		expected = absent_columns(date_cols, {self.reg.pk: {3}, other.pk: {30}})
+		expected[999999] = [True] * len(date_cols)
+		self.assertEqual(matrix.absent_columns(date_cols), expected)
+
+	@skipUnless(presence_matrix.available(), 'NumPy not installed')
+	def test_sf2_summary_endpoint(self):
+		other = Registration.objects.create(lrn='TESTLRN002', student='Other Student', sex='Female')
+		weekdays = [d for d in range(1, 31) if datetime(2025, 6, d).weekday() < 5]
+		# the boy only comes on Jun 2-3; the girl misses Jun 9-12, four school days in a row
+		MonthlyPresence.objects.create(student=self.reg, year=2025, month=6, am_mask=0b110, pm_mask=0b100)
+		girl_days = sum(1 << (d - 1) for d in weekdays if not 9 <= d <= 12)
+		MonthlyPresence.objects.create(student=other, year=2025, month=6, am_mask=girl_days, pm_mask=0)
+
+		res = self.client.get('/api/attendance/sf2_summary/?month=2025-06')
+		self.assertEqual(res.status_code, 200)
+		summary = res.json()
+		self.assertEqual(summary['school_days'], weekdays)
+		self.assertEqual(summary['registered'], {'male': 1, 'female': 1, 'total': 2})
+		self.assertEqual(summary['daily'][0], {
+			'day': 2, 'present': {'male': 1, 'female': 1, 'total': 2}, 'absent': {'male': 0, 'female': 0, 'total': 0},
+		})
+		self.assertEqual(summary['present_days'], {'male': 2, 'female': 17, 'total': 19})
+		self.assertAlmostEqual(summary['average_daily_attendance']['total'], 19 / 21)
+		self.assertAlmostEqual(summary['percentage_of_attendance']['female'], 17 / 21 * 100)
+		self.assertEqual(summary['consecutive_absences'], {'male': 1, 'female': 0, 'total': 1})
+		self.assertEqual(summary['learners']['id'], [self.reg.pk, other.pk])
+
+		section = Section.objects.create(grade='7', name='Rizal', school_year=2025)
+		res = self.client.get(f'/api/attendance/sf2_summary/?month=2025-06&section={section.pk}')
+		self.assertEqual(res.json()['registered']['total'], 0)
+		self.assertEqual(self.client.get('/api/attendance/sf2_summary/?month=June').status_code, 400)
+
+	async def _read_events(self, frames, path='/api/events/', publish=(), last_event_id=None):
+		"""The first `frames` SSE frames of a stream, publishing `publish` once it's open."""
+		headers = {'Last-Event-ID': last_event_id} if last_event_id else {}
+		response = await AsyncClient().get(path, headers=headers)
+		self.assertEqual(response['Content-Type'], 'text/event-stream')
+		stream = response.streaming_content
+		read = []
+		try:
+			async for chunk in stream:
+				read.append(chunk.decode())
+				if len(read) == 1:
+					for type, data in publish:
+						events.event_bus.publish(type, data)
+				if len(read) == frames:
+					break
+		finally:
+			await stream.aclose()
+		return read
+
+	def test_event_stream_resumes_and_filters(self):
+		bus = events.EventBus(max_events=3)
+		with mock.patch.object(events, 'event_bus', bus):
+			# with no stream open a scan publishes nothing, and resuming from before it resets
+			before = f'{bus.boot}-{bus.published}'
+			with self.captureOnCommitCallbacks() as callbacks:
+				self.client.post('/api/attendance/', {'lrn': self.reg.lrn}, format='json')
+			self.assertEqual(callbacks, [])
+			self.assertIsNone(bus.since(before))
+			Attendance.objects.all().delete()
+
+			listener = bus.subscribe(asyncio.new_event_loop())
+			with self.captureOnCommitCallbacks() as callbacks:
+				self.client.post('/api/attendance/', {'lrn': self.reg.lrn}, format='json')
+			# the payload comes from the saved row and the LRN cache
+			with self.assertNumQueries(0):
+				for callback in callbacks:
+					callback()
+			listener.loop.run_until_complete(asyncio.sleep(0))  # deliver to the listener's queue
+			first = listener.queue.get_nowait()
+			self.assertEqual(first['type'], events.ATTENDANCE)
+			self.assertEqual(first['data']['student_name'], 'Test Student')
+			self.assertIsNone(first['data']['section'])
+			self.assertEqual(first['data']['id'], Attendance.objects.get().id)
+
+			# a replayed scan is reported as created but isn't announced again
+			stored = Attendance.objects.get()
+			replay = Attendance(student_id=stored.student_id, time=stored.time)
+			replay.stamp_local_fields()
+			with self.captureOnCommitCallbacks() as callbacks:
+				self.assertEqual(group_commit.insert_scans([replay]), [(True, stored.id)])
+			self.assertEqual(callbacks, [])
+			bus.unsubscribe(listener)
+			listener.loop.close()
+			with self.captureOnCommitCallbacks(execute=True):
+				dropped = self.client.post(f'/api/registrations/{self.reg.id}/drop/').json()
+			with self.captureOnCommitCallbacks(execute=True):
+				self.client.post(f"/api/dropped/{dropped['id']}/restore/")
+			self.assertEqual([e['type'] for e in bus.since(first['id'])], [events.DROPPED, events.RESTORED])
+
+			# resume after the scan: the missed drop and restore, then a live event
+			frames = async_to_sync(self._read_events)(
+				4, last_event_id=first['id'], publish=[(events.ATTENDANCE_CLEARED, {'scope': 'today'})])
+			self.assertEqual(frames[0], 'retry: 3000\n\n')
+			self.assertEqual([f.split('\n')[1] for f in frames[1:]],
+							 ['event: dropped', 'event: restored', 'event: attendance_cleared'])
+			self.assertIn(f'"registration": {self.reg.id}', frames[1])
+
+			# a section filter skips other sections' events but not clears
+			frames = async_to_sync(self._read_events)(2, '/api/events/?section=7', publish=[
+				(events.ATTENDANCE, {'id': 1, 'section': 8}),
+				(events.ATTENDANCE, {'id': 2, 'section': 7}),
+			])
+			self.assertIn('"section": 7', frames[1])
+
+			# ids older than the ring buffer, or from another process, can't be resumed
+			for last in (first['id'], 'other-1'):
+				frames = async_to_sync(self._read_events)(2, last_event_id=last)
+				self.assertTrue(frames[1].startswith(f'id: {bus.boot}-{bus.published}\nevent: reset\n'))
+			self.assertEqual(bus.stats()['subscribers'], 0)
+
+		# the stream needs the ASGI handler
+		self.assertEqual(self.client.get('/api/events/').status_code, 501)
+
+	def test_conditional_get_on_polled_lists(self):
+		def poll(path, etag):
+			return self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+
+		paths = ['/api/registrations/', '/api/registrations/grouped/', '/api/dropped/', '/api/attendance/today/']
+		etags = {}
+		for path in paths:
+			res = self.client.get(path)
+			self.assertEqual(res.status_code, 200)
+			# nothing was ever dropped, so that list has no modification date yet
+			self.assertEqual('Last-Modified' in res, path != '/api/dropped/')
+			self.assertIn('no-cache', res['Cache-Control'])
+			etags[path] = res['ETag']
+			# an unchanged poll is answered from the version lookup alone
+			with self.assertNumQueries(2 if path.endswith('today/') else 1):
+				res = poll(path, etags[path])
+			self.assertEqual(res.status_code, 304)
+			self.assertEqual(res['ETag'], etags[path])
+			self.assertEqual(res.content, b'')
+		self.assertEqual(len(set(etags.values())), len(paths))
+
+		# a scan only changes today's attendance
+		self.client.post('/api/attendance/', {'lrn': self.reg.lrn}, format='json')
+		self.assertEqual(poll('/api/registrations/', etags['/api/registrations/']).status_code, 304)
+		res = poll('/api/attendance/today/', etags['/api/attendance/today/'])
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(len(res.json()), 1)
+		etags['/api/attendance/today/'] = res['ETag']
+		# the version read along with the rows matches the one looked up for a poll
+		self.assertEqual(self.client.get('/api/attendance/today/')['ETag'], res['ETag'])
+		self.assertEqual(poll('/api/attendance/today/', res['ETag']).status_code, 304)
+
+		# a drop moves the roster and dropped versions, and today's list loses the scan
+		self.client.post(f'/api/registrations/{self.reg.id}/drop/')
+		for path in paths:
+			self.assertEqual(poll(path, etags[path]).status_code, 200, path)
+		res = poll('/api/dropped/', etags['/api/dropped/'])
+		self.assertEqual(res.json()[0]['lrn'], self.reg.lrn)
+		# clients that only send the date get a 304 too
+		res = self.client.get('/api/dropped/', HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+		self.assertEqual(res.status_code, 304)
+
+	def test_editing_a_scan_moves_its_presence_bit(self):
+		def masks():
+			return set(MonthlyPresence.objects.values_list('year', 'month', 'am_mask', 'pm_mask'))
+
+		scan = Attendance.objects.create(student=self.reg, time=datetime(2025, 10, 2, 23, 0, tzinfo=dt_timezone.utc))
+		self.assertEqual(masks(), {(2025, 10, 0b100, 0)})  # 3 Oct, 07:00 local: AM
+		# corrected to the afternoon of 6 Oct through the viewset
+		res = self.client.patch(f'/api/attendances/{scan.id}/', {'time': '2025-10-06T13:30:00+08:00'}, format='json')
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(masks(), {(2025, 10, 0, 0b100000)})
+		# and into the next month, as an admin save would
+		scan.refresh_from_db()
+		scan.time = datetime(2025, 11, 1, 0, 0, tzinfo=dt_timezone.utc)
+		scan.save()
+		self.assertEqual(masks(), {(2025, 10, 0, 0), (2025, 11, 0b1, 0)})
+
+	def test_viewset_rejects_a_second_scan_in_a_slot(self):
+		morning = Attendance.objects.create(student=self.reg, time=datetime(2025, 10, 2, 23, 0, tzinfo=dt_timezone.utc))
+		res = self.client.post('/api/attendances/', {'student': self.reg.id, 'time': '2025-10-03T07:30:00+08:00'}, format='json')
+		self.assertEqual(res.status_code, 400)
+		self.assertIn('non_field_errors', res.json())
+		res = self.client.post('/api/attendances/', {'student': self.reg.id, 'time': '2025-10-03T13:00:00+08:00'}, format='json')
+		self.assertEqual(res.status_code, 201)
+		afternoon = res.json()['id']
+
+		# moving the afternoon scan onto the taken morning slot is rejected too
+		res = self.client.patch(f'/api/attendances/{afternoon}/', {'time': '2025-10-03T07:45:00+08:00'}, format='json')
+		self.assertEqual(res.status_code, 400)
+		self.assertEqual(Attendance.objects.get(pk=afternoon).session, 'PM')
+		# while re-saving a scan within its own slot is fine
+		res = self.client.patch(f'/api/attendances/{morning.id}/', {'time': '2025-10-03T07:10:00+08:00'}, format='json')
+		self.assertEqual(res.status_code, 200)
+
+
+class AttendanceExportTestCase(TestCase):
+	def setUp(self):
+		lrn_cache.clear()
+		# data versions repeat across rolled-back tests, so cached files must not leak between them
+		export_cache.clear()
+		# build_attendance_workbook looks for the template under BASE_DIR
+		self.tmp = tempfile.mkdtemp()
+		shutil.copy(settings.BASE_DIR.parent / 'public' / 'attendance_template.xlsx', self.tmp)
+		self.addCleanup(shutil.rmtree, self.tmp, True)
+		self.boy = Registration.objects.create(lrn='EXP001', student='Boy, A', sex='Male')
+		self.girl = Registration.objects.create(lrn='EXP002', student='Girl, B', sex='Female')
+
+	def test_build_attendance_workbook_marks_presence(self):
+		# Tue 2025-06-03, in the 2025-2026 school year; plus a scan from the previous year
+		Attendance.objects.create(student=self.boy, time=datetime(2025, 6, 3, 0, 30, tzinfo=dt_timezone.utc))
+		Attendance.objects.create(student=self.boy, time=datetime(2025, 6, 3, 6, 30, tzinfo=dt_timezone.utc))
+		Attendance.objects.create(student=self.girl, time=datetime(2024, 6, 4, 0, 30, tzinfo=dt_timezone.utc))
+
+		with override_settings(BASE_DIR=Path(self.tmp)), self.assertNumQueries(2):
+			bio = build_attendance_workbook(include_names=True, school_year=2025)
+		ws = openpyxl.load_workbook(bio)['JUN']
+		# row 10 holds the day numbers: G10=2, H10=3, I10=4
+		self.assertEqual((ws['B13'].value, ws['B64'].value), ('Boy, A', 'Girl, B'))
+		self.assertEqual((ws['G13'].value, ws['H13'].value), ('X', None))
+		self.assertEqual(ws['I64'].value, 'X')
+		if presence_matrix.available():
+			# footer totals are written as values: 21 school days, the boy present on the 3rd
+			self.assertEqual((ws['AQ9'].value, ws['G63'].value, ws['H63'].value, ws['H115'].value), (21, 0, 1, 1))
+			self.assertEqual((ws['AF13'].value, ws['AG13'].value, ws['AK123'].value, ws['AL123'].value), (20, 1, 1, 1))
+			self.assertEqual((ws['AK130'].value, ws['AL130'].value), (1, 1))
+
+	def test_archive_closed_school_year(self):
+		old_section = Section.objects.create(grade='7', name='Rizal', school_year=2024)
+		self.boy.section = old_section
+		self.boy.save()
+		# SY 2024-2025 scans on Tue 2024-06-04; the girl also scans the next year, so she stays
+		Attendance.objects.create(student=self.boy, time=datetime(2024, 6, 4, 0, 30, tzinfo=dt_timezone.utc))
+		Attendance.objects.create(student=self.girl, time=datetime(2024, 6, 4, 6, 30, tzinfo=dt_timezone.utc))
+		Attendance.objects.create(student=self.girl, time=datetime(2025, 6, 3, 0, 30, tzinfo=dt_timezone.utc))
+
+		with override_settings(BASE_DIR=Path(self.tmp), ARCHIVE_DIR=Path(self.tmp) / 'archives'):
+			call_command('archive_school_year', '2024', stdout=io.StringIO())
+			self.assertFalse(Attendance.objects.filter(local_date__lt=date(2025, 6, 1)).exists())
+			self.assertEqual(list(Registration.objects.values_list('lrn', flat=True)), ['EXP002'])
+			self.assertFalse(Section.objects.exists())
+			index = APIClient().get('/api/archives/').json()
+			self.assertEqual([(e['school_year'], e['counts']['attendance']) for e in index], [(2024, 2)])
+
+			wb = openpyxl.load_workbook(os.path.join(self.tmp, 'exports', archive.export_school_year(2024, include_names=True)))
+			ws = wb['JUN']
+			# G10..I10 are days 2, 3, 4
+			self.assertEqual((ws['B13'].value, ws['G13'].value, ws['I13'].value), ('Boy, A', 'X', None))
+			self.assertEqual((ws['B64'].value, ws['I64'].value), ('Girl, B', None))
+			if presence_matrix.available():
+				res = APIClient().get('/api/archives/2024/summary/?month=2024-06')
+				daily = {entry['day']: entry['present'] for entry in res.json()['daily']}
+				self.assertEqual(daily[4], {'male': 1, 'female': 1, 'total': 2})
+				res = APIClient().get(f'/api/archives/2024/summary/?month=2024-06&section={old_section.pk}')
+				self.assertEqual(res.json()['registered'], {'male': 1, 'female': 0, 'total': 1})
+			self.assertEqual(APIClient().get('/api/archives/2023/summary/').status_code, 404)
+
+			with self.assertRaises(CommandError):
+				call_command('archive_school_year', '2024', stdout=io.StringIO())
+			with self.assertRaises(CommandError):
+				call_command('archive_school_year', str(utils_export.current_school_year()), stdout=io.StringIO())
+
+	def test_archive_keeps_continuing_unsectioned_learners(self):
+		# both registered during SY 2024-2025, both scanned then, neither scanned since
+		Registration.objects.update(created_at=datetime(2024, 6, 1, tzinfo=dt_timezone.utc))
+		Attendance.objects.create(student=self.boy, time=datetime(2024, 6, 4, 0, 30, tzinfo=dt_timezone.utc))
+		Attendance.objects.create(student=self.girl, time=datetime(2024, 6, 4, 0, 30, tzinfo=dt_timezone.utc))
+
+		with override_settings(BASE_DIR=Path(self.tmp), ARCHIVE_DIR=Path(self.tmp) / 'archives'):
+			archive.archive_school_year(2024)
+			self.assertFalse(Attendance.objects.exists())
+			# nothing says they left, so the new year's roster keeps them
+			self.assertEqual(Registration.objects.count(), 2)
+
+			# when asked to, those without scans since the year ended go
+			ArchivedSchoolYear.objects.all().delete()
+			Attendance.objects.create(student=self.boy, time=datetime(2024, 6, 5, 0, 30, tzinfo=dt_timezone.utc))
+			Attendance.objects.create(student=self.girl, time=datetime(2024, 6, 5, 0, 30, tzinfo=dt_timezone.utc))
+			Attendance.objects.create(student=self.girl, time=datetime(2025, 6, 3, 0, 30, tzinfo=dt_timezone.utc))
+			archive.archive_school_year(2024, purge_registrations=True)
+			self.assertEqual(list(Registration.objects.values_list('lrn', flat=True)), ['EXP002'])
+
+	def test_export_job_runs_and_reports_status(self):
+		client = APIClient()
+		with override_settings(BASE_DIR=Path(self.tmp), EXPORT_JOB_WORKERS=0):
+			with self.captureOnCommitCallbacks(execute=True):
+				res = client.post('/api/attendance/export_jobs/', {'kind': 'school_year', 'school_year': 2025}, format='json')
+			self.assertEqual(res.status_code, 202)
+			job = client.get(res.json()['status_url']).json()
+		self.assertEqual((job['status'], job['progress']), ('done', 100))
+		self.assertTrue(os.path.exists(os.path.join(self.tmp, 'exports', job['filename'])))
+
+		res = client.post('/api/attendance/export_jobs/', {'kind': 'month', 'month': 'June'}, format='json')
+		self.assertEqual(res.status_code, 400)
+
+	def test_export_cache_reuses_file_until_data_changes(self):
+		with override_settings(BASE_DIR=Path(self.tmp)):
+			first = generate_school_year_export(school_year=2025)
+			hits = export_cache.stats()['hits']
+			self.assertEqual(generate_school_year_export(school_year=2025), first)
+			self.assertEqual(export_cache.stats()['hits'], hits + 1)
+
+			# a new scan or a roster edit changes the data version
+			Attendance.objects.create(student=self.boy)
+			self.assertIsNone(export_cache.get(export_cache.make_key('school_year', 2025, False, None, template_path=find_sf2_template())))
+			generate_school_year_export(school_year=2025)
+			self.girl.student = 'Girl, C'
+			self.girl.save()
+			before = export_cache.stats()['misses']
+			generate_school_year_export(school_year=2025)
+			self.assertEqual(export_cache.stats()['misses'], before + 1)
+
+			# so does adding or renaming a section, whose name the exports show
+			versions = {versioning.data_version()}
+			section = Section.objects.create(grade='7', name='Rizal', school_year=2025)
+			versions.add(versioning.data_version())
+			section.name = 'Mabini'
+			section.save()
+			versions.add(versioning.data_version())
+			self.assertEqual(len(versions), 3)
+
+	def test_incremental_export_rerenders_changed_months_only(self):
+		render = mock.patch.object(utils_export, 'render_month_sheet', wraps=utils_export.render_month_sheet)
+		with override_settings(BASE_DIR=Path(self.tmp)):
+			with render as rendered:
+				build_attendance_workbook(school_year=2025, incremental=True)
+			self.assertEqual(rendered.call_count, 10)  # first export renders every template sheet
+
+			Attendance.objects.create(student=self.boy, time=datetime(2025, 7, 1, 0, 30, tzinfo=dt_timezone.utc))
+			with render as rendered:
+				bio = build_attendance_workbook(school_year=2025, incremental=True)
+			self.assertEqual([c.args[1] for c in rendered.call_args_list], [7])
+			wb = openpyxl.load_workbook(bio)
+			self.assertEqual(wb['JUN']['G13'].value, 'X')  # carried over from the previous workbook
+
+			# a roster change re-renders everything
+			Registration.objects.create(lrn='EXP003', student='Boy, C', sex='Male')
+			with render as rendered:
+				build_attendance_workbook(school_year=2025, incremental=True)
+			self.assertEqual(rendered.call_count, 10)
+
+	def test_template_registry_parses_once_until_file_changes(self):
+		path = os.path.join(self.tmp, 'attendance_template.xlsx')
+		loads = template_registry.stats()['loads']
+		first = template_registry.workbook(path)
+		second = template_registry.workbook(path)
+		self.assertEqual(template_registry.stats()['loads'], loads + 1)
+		# copies are independent of each other
+		first['JUN']['B13'] = 'changed'
+		self.assertIsNone(second['JUN']['B13'].value)
+		self.assertEqual(template_registry.get(path).date_columns['JUN'][:2], [(7, 2), (8, 3)])
+
+		mtime = os.path.getmtime(path)
+		os.utime(path, (mtime + 5, mtime + 5))
+		template_registry.workbook(path)
+		self.assertEqual(template_registry.stats()['loads'], loads + 2)
+
+	def test_month_export_shares_overlay_images(self):
+		def media_and_images(filename):
+			path = os.path.join(self.tmp, 'exports', filename)
+			with zipfile.ZipFile(path) as zf:
+				media = [n for n in zf.namelist() if n.startswith('xl/media/')]
+			ws = openpyxl.load_workbook(path)[timezone.localdate().strftime('%b').upper()]
+			return len(media), len(ws._images)
+
+		with override_settings(BASE_DIR=Path(self.tmp)):
+			base_media, base_images = media_and_images(generate_month_export())
+
+			morning = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()).replace(hour=8))
+			for student in (self.boy, self.girl):
+				Attendance.objects.create(student=student, time=morning)
+				Attendance.objects.create(student=student, time=morning.replace(hour=14))
+			media, images = media_and_images(generate_month_export())
+		# two AM+PM cells of the same size: two anchors, one stored PNG
+		self.assertEqual(images, base_images + 2)
+		self.assertEqual(media, base_media + 1)
+
+	def test_all_sections_export_zips_one_workbook_per_section(self):
+		rizal = Section.objects.create(grade='Grade 7', name='Rizal', school_year=2025)
+		mabini = Section.objects.create(grade='Grade 7', name='Mabini', school_year=2025)
+		Section.objects.create(grade='Grade 8', name='Luna', school_year=2024)
+		self.boy.section = rizal
+		self.boy.save()
+		self.girl.section = mabini
+		self.girl.save()
+
+		with override_settings(BASE_DIR=Path(self.tmp)):
+			filename = generate_all_sections_export(include_names=True, school_year=2025, workers=0)
+		with zipfile.ZipFile(os.path.join(self.tmp, 'exports', filename)) as bundle:
+			names = bundle.namelist()
+			self.assertEqual(names, [f'Grade_7-Mabini_{mabini.pk}.xlsx', f'Grade_7-Rizal_{rizal.pk}.xlsx'])
+			ws = openpyxl.load_workbook(io.BytesIO(bundle.read(names[1])))['JUN']
+		self.assertEqual((ws['B13'].value, ws['B64'].value), ('Boy, A', None))
+
+	def test_school_year_rendering_is_byte_identical(self):
+		Attendance.objects.create(student=self.boy, time=datetime(2025, 6, 3, 0, 30, tzinfo=dt_timezone.utc))
+		Attendance.objects.create(student=self.girl, time=datetime(2025, 9, 9, 0, 30, tzinfo=dt_timezone.utc))
+		with override_settings(BASE_DIR=Path(self.tmp)):
+			first = build_attendance_workbook(include_names=True, school_year=2025).getvalue()
+			again = build_attendance_workbook(include_names=True, school_year=2025).getvalue()
+		self.assertEqual(first, again)
+
+
+class GroupCommitTestCase(TransactionTestCase):
+	# the writer commits on its own thread and connection, so the rows must really be committed
+
+	def setUp(self):
+		lrn_cache.clear()
+		self.regs = [
+			Registration.objects.create(lrn=f'GC{i}', student=f'Group {i}', sex='Male') for i in range(3)
+		]
+
+	def _post_concurrently(self, lrns):
+		responses = [None] * len(lrns)
+
+		def post(i, lrn):
+			try:
+				responses[i] = APIClient().post('/api/attendance/', {'lrn': lrn}, format='json')
+			finally:
+				connection.close()
+
+		threads = [threading.Thread(target=post, args=(i, lrn)) for i, lrn in enumerate(lrns)]
+		for t in threads:
+			t.start()
+		for t in threads:
+			t.join()
+		return responses
+
+	@override_settings(SCAN_GROUP_COMMIT=True)
+	def test_concurrent_scans_commit_as_one_group(self):
+		# a long window that the batch limit cuts short: all four requests share one commit
+		writer = group_commit.GroupCommitWriter(max_wait=5, max_batch=4)
+		lrns = ['GC0', 'GC1', 'GC2', 'GC0']
+		with mock.patch.object(group_commit, '_writer', writer):
+			responses = self._post_concurrently(lrns)
+		self.assertEqual(writer.stats(), {'batches': 1, 'scans': 4, 'retried': 0, 'pending': 0})
+		codes = sorted(r.status_code for r in responses)
+		self.assertEqual(codes, [200, 201, 201, 201])
+		repeat = next(r for r in responses if r.status_code == 200).json()
+		self.assertTrue(repeat['already_recorded'])
+		self.assertTrue(repeat['message'].startswith('Attendance already recorded for Group 0 ('))
+		self.assertEqual(Attendance.objects.count(), 3)
+		# bulk inserts skip the post_save receiver, so the writer keeps the rollup itself
+		self.assertEqual(MonthlyPresence.objects.count(), 3)
+
+		# the window bounds a lone scan's wait; a stored slot comes back as already recorded
+		writer = group_commit.GroupCommitWriter(max_wait=0.01, max_batch=4)
+		with mock.patch.object(group_commit, '_writer', writer):
+			res = self.client.post('/api/attendance/', {'lrn': 'GC1'}, format='json')
+		self.assertEqual(res.status_code, 200)
+		self.assertTrue(res.json()['already_recorded'])
+		self.assertEqual(writer.stats()['batches'], 1)
+		self.assertEqual(Attendance.objects.count(), 3)
+
+	def test_failed_group_retries_scans_one_by_one(self):
+		writer = group_commit.GroupCommitWriter(max_wait=5, max_batch=2)
+		good = Attendance(student_id=self.regs[0].id, time=timezone.now())
+		# a registration deleted after its id was cached fails the group's foreign key check
+		gone = Attendance(student_id=self.regs[-1].id + 100, time=timezone.now())
+		for obj in (good, gone):
+			obj.stamp_local_fields()
+		futures = [writer.submit(good), writer.submit(gone)]
+		created, pk = futures[0].result(timeout=10)
+		self.assertTrue(created)
+		self.assertEqual(Attendance.objects.get().pk, pk)
+		with self.assertRaises(IntegrityError):
+			futures[1].result(timeout=10)
+		self.assertEqual(writer.stats()['retried'], 1)
+
+	@override_settings(SCAN_GROUP_COMMIT=True, SCAN_GROUP_COMMIT_TIMEOUT=0.01)
+	def test_scan_pending_past_timeout_is_accepted(self):
+		stuck = mock.Mock()
+		stuck.submit.return_value = Future()  # never resolved
+		with mock.patch.object(group_commit, '_writer', stuck):
+			res = self.client.post('/api/attendance/', {'lrn': 'GC0'}, format='json')
+		self.assertEqual(res.status_code, 202)
+		self.assertTrue(res.json()['pending'])
+
+
+class ScanIntegrityTestCase(TransactionTestCase):
+	# SQLite checks foreign keys at commit, which a TestCase's outer transaction defers
+
+	def setUp(self):
+		lrn_cache.clear()
+		self.reg = Registration.objects.create(lrn='INTEG1', student='Kept', sex='Female')
+
+	def test_scan_for_deleted_cached_registration_is_not_found(self):
+		# another process deleted the registration after this one cached its id
+		lrn_cache.put('GHOST1', self.reg.id + 100, 'Ghost')
+		res = self.client.post('/api/attendance/', {'lrn': 'GHOST1'}, content_type='application/json')
+		self.assertEqual(res.status_code, 404)
+		self.assertEqual(Attendance.objects.count(), 0)
+		self.assertIsNone(lrn_cache.registration(self.reg.id + 100))
+
+		# a real repeat scan still reports the stored one
+		self.assertEqual(self.client.post('/api/attendance/', {'lrn': 'INTEG1'}, content_type='application/json').status_code, 201)
+		res = self.client.post('/api/attendance/', {'lrn': 'INTEG1'}, content_type='application/json')
+		self.assertEqual(res.status_code, 200)
+		self.assertTrue(res.json()['already_recorded'])
+
+	def test_batch_scan_for_registration_deleted_behind_warm_cache(self):
+		gone = Registration.objects.create(lrn='GONE1', student='Gone', sex='Male')
+		self.assertIsNotNone(lrn_cache.get('GONE1'))
+		# deleted by another process: no signal reaches this one's cache
+		with connection.cursor() as cursor:
+			cursor.execute(f'DELETE FROM {Registration._meta.db_table} WHERE id = %s', [gone.id])
+
+		scanned_at = '2025-10-20T07:15:00+08:00'
+		res = self.client.post('/api/attendance/batch/', [
+			{'lrn': 'INTEG1', 'scanned_at': scanned_at},
+			{'lrn': 'GONE1', 'scanned_at': scanned_at},
+		], content_type='application/json')
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual([r['status'] for r in res.json()['results']], ['created', 'unknown_lrn'])
+		self.assertEqual(list(Attendance.objects.values_list('student_id', flat=True)), [self.reg.id])
+		self.assertIsNone(lrn_cache.registration(gone.id))
@@ -2,18 +2,29 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     RegistrationViewSet,
+    SectionViewSet,
     record_attendance,
+    record_attendance_batch,
+    lrn_cache_stats,
     attendance_today,
     clear_all_registrations,
     clear_attendance,
     upload_excel,
     generate_excel_export,
+    sf2_summary,
+    attendance_events,
+    archived_school_years,
+    archived_export,
+    archived_summary,
+    create_export_job,
+    export_job_status,
     AttendanceViewSet,
 )
-from .views import registrations_grouped
+from .views import registrations_grouped, bulk_upsert_registrations
 from .views import drop_registration, dropped_list, restore_dropped, delete_dropped
 
 router = DefaultRouter()
+router.register(r'sections', SectionViewSet, basename='section')
 router.register(r'registrations', RegistrationViewSet, basename='registration')
 router.register(r'attendances', AttendanceViewSet, basename='attendance')
 
@@ -21,6 +32,7 @@ urlpatterns = [
     # ✅ Place clear_all FIRST so it isn't mistaken for a registration ID
     path('registrations/clear_all/', clear_all_registrations),
     path('registrations/grouped/', registrations_grouped),
+    path('registrations/bulk_upsert/', bulk_upsert_registrations),
     # server-side dropped registrations
     path('registrations/<int:pk>/drop/', drop_registration),
     path('dropped/', dropped_list),
@@ -28,8 +40,17 @@ urlpatterns = [
     path('dropped/<int:pk>/', delete_dropped),
     path('attendance/clear/', clear_attendance),
     path('attendance/generate_excel/', generate_excel_export),
+    path('attendance/sf2_summary/', sf2_summary),
+    path('attendance/export_jobs/', create_export_job),
+    path('attendance/export_jobs/<uuid:pk>/', export_job_status),
     path('attendance/', record_attendance),
+    path('attendance/batch/', record_attendance_batch),
+    path('attendance/lrn_cache/', lrn_cache_stats),
     path('attendance/today/', attendance_today),
     path('attendance/upload_excel/', upload_excel),
+    path('events/', attendance_events),
+    path('archives/', archived_school_years),
+    path('archives/<int:school_year>/export/', archived_export),
+    path('archives/<int:school_year>/summary/', archived_summary),
     path('', include(router.urls)),  # router goes last
 ]
\ No newline at end of file
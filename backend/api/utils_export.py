@@ -1,11 +1,28 @@
+import calendar
+import hashlib
 import io
-from datetime import datetime
-from typing import Dict, Set
+import json
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Optional, Set, Tuple
 
+import openpyxl
 from django.conf import settings
+from django.db.models.functions import ExtractDay, ExtractMonth
+from django.utils import timezone
 from openpyxl import load_workbook
+from openpyxl.styles import Alignment, Font
 
-from .models import Registration, Attendance
+from . import presence, presence_matrix, section_worker, sf2_grid
+from .export_cache import export_cache
+from .overlays import TriangleOverlays, save_workbook
+from .template_registry import read_date_columns, template_registry
+from .models import Registration, Attendance, Section
 
 
 def parse_local_date_from_ymd(date_str: str) -> datetime:
@@ -19,118 +36,710 @@ def parse_local_date_from_ymd(date_str: str) -> datetime:
         return datetime.utcnow()
 
 
-def build_attendance_workbook(include_names: bool = False) -> io.BytesIO:
-    """Build an Excel workbook (in-memory) based on the stored registrations and attendance.
+def school_year_bounds(start_year: int) -> Tuple[date, date]:
+    """First and last calendar day of the school year starting in `start_year`.
 
-    This function expects an Excel template file named 'attendance_template.xlsx' located
-    in the Django static files or the project root (adjust path as necessary). It will
-    mark 'X' for absent days and leave cells empty for present days consistent with the
-    front-end logic.
+    The school year begins on the 1st of settings.SCHOOL_YEAR_START_MONTH (June by default,
+    matching the JUN..MAR sheets of the SF2 template) and runs for twelve months.
     """
-    # Load registrations and attendance records
-    registrations = list(Registration.objects.all().order_by('student'))
-    attendances = list(Attendance.objects.all())
-
-    # Map attendance by normalized key -> month -> set(days)
-    month_names = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
-
-    def normalize_name(s: str) -> str:
-        return (s or "").strip().lower().replace('\n', ' ').replace('\r', '').replace('\t', ' ')
-
-    # Build mapping from registration LRN or name to dates
-    attendance_by_key: Dict[str, Dict[str, Set[int]]] = {}
-    for a in attendances:
-        dt = a.time
-        month = month_names[dt.month - 1]
-        day = dt.day
-        # keys: lrn, normalized name
-        lrn = (a.student.lrn or '').strip()
-        name = (a.student.student or '').strip()
-        keys = [lrn, normalize_name(name)]
-        for k in keys:
-            if not k:
-                continue
-            attendance_by_key.setdefault(k, {}).setdefault(month, set()).add(day)
+    start_month = getattr(settings, 'SCHOOL_YEAR_START_MONTH', 6)
+    start = date(start_year, start_month, 1)
+    end = date(start_year + 1, start_month, 1) - timedelta(days=1)
+    return start, end
 
-    # Determine template path: prefer Django STATIC_ROOT or project root
-    # Try common locations
-    import os
 
+def current_school_year(today: Optional[date] = None) -> int:
+    """Start year of the school year containing `today` (defaults to the local date)."""
+    today = today or timezone.localdate()
+    start_month = getattr(settings, 'SCHOOL_YEAR_START_MONTH', 6)
+    return today.year if today.month >= start_month else today.year - 1
+
+
+def school_year_presence(school_year: int, section_id: Optional[int] = None) -> Dict[int, Dict[int, Set[int]]]:
+    """Map student id -> month number -> set of days with at least one scan.
+
+    Computed by a single grouped query of distinct (student, month, day) over the school
+    year and streamed with .iterator(), so memory scales with roster x school days rather
+    than with every scan ever recorded. `section_id` limits it to one section's students.
+    """
+    start, end = school_year_bounds(school_year)
+    rows = Attendance.objects.filter(local_date__gte=start, local_date__lte=end)
+    if section_id is not None:
+        rows = rows.filter(student__section_id=section_id)
+    rows = (
+        rows
+        .annotate(month=ExtractMonth('local_date'), day=ExtractDay('local_date'))
+        .values_list('student_id', 'month', 'day')
+        .distinct()
+        .order_by()
+    )
+    presence: Dict[int, Dict[int, Set[int]]] = {}
+    for student_id, month, day in rows.iterator(chunk_size=2000):
+        presence.setdefault(student_id, {}).setdefault(month, set()).add(day)
+    return presence
+
+
+def mask_presence(rows) -> Dict[int, Dict[int, Set[int]]]:
+    """school_year_presence's mapping from (student_id, year, month, am_mask, pm_mask) rollup rows."""
+    presence: Dict[int, Dict[int, Set[int]]] = {}
+    for student_id, _, month, am_mask, pm_mask in rows:
+        mask = am_mask | pm_mask
+        if mask:
+            days = {d for d in range(1, 32) if mask >> (d - 1) & 1}
+            presence.setdefault(student_id, {}).setdefault(month, set()).update(days)
+    return presence
+
+
+def export_path(filename: str) -> str:
+    """Absolute path for `filename` inside the exports/ folder (created if missing)."""
+    out_dir = os.path.join(str(settings.BASE_DIR), 'exports')
+    os.makedirs(out_dir, exist_ok=True)
+    return os.path.join(out_dir, filename)
+
+
+# BASE_DIR -> template path found there, so each export costs one stat instead of a probe
+_template_locations: Dict[str, str] = {}
+
+
+def find_sf2_template() -> str:
+    """Locate attendance_template.xlsx: prefer Django STATIC_ROOT or project root."""
+    known = _template_locations.get(str(settings.BASE_DIR))
+    if known and os.path.exists(known):
+        return known
+    # Try common locations
     possible = [
         os.path.join(settings.BASE_DIR, 'attendance_template.xlsx'),
         os.path.join(settings.BASE_DIR, 'static', 'attendance_template.xlsx'),
         os.path.join(settings.BASE_DIR, 'backend', 'static', 'attendance_template.xlsx'),
+        # the frontend's copy, also used by the month export
+        os.path.join(settings.BASE_DIR.parent, 'public', 'attendance_template.xlsx'),
     ]
-    template_path = None
     for p in possible:
         if os.path.exists(p):
-            template_path = p
-            break
-    if not template_path:
-        raise FileNotFoundError('attendance_template.xlsx not found in project; place it in project root or static folder')
-
-    wb = load_workbook(template_path)
-
-    for month in month_names:
-        if month not in wb.sheetnames:
-            continue
-        ws = wb[month]
-
-        # Helper to read header row for days (similar to front-end getCellDay)
-        def get_cell_day(cell):
-            v = cell.value
-            if v is None:
-                return None
-            if isinstance(v, int):
-                return v
-            if isinstance(v, str) and v.strip().isdigit():
-                return int(v.strip())
-            if isinstance(v, datetime):
-                return v.day
-            return None
-
-        # Read date columns from row 10 (1-based)
-        date_row = ws[10]
-        date_cols = []
-        for idx, cell in enumerate(date_row, start=1):
-            d = get_cell_day(cell)
-            if d is not None:
-                date_cols.append((idx, d))
-
-        # Male rows start 13, female at 64 as front-end expects
-        males = [r for r in registrations if (r.sex or '').lower() == 'male']
-        females = [r for r in registrations if (r.sex or '').lower() == 'female']
-
-        # Helper fill rows
-        def process_rows(start_row, regs):
-            row = start_row
-            for reg in regs:
-                visible = (reg.student and reg.student.strip()) or (reg.lrn and reg.lrn.strip()) or 'Unknown Student'
-                if include_names:
-                    ws.cell(row=row, column=2).value = visible
-                name_key = normalize_name(visible)
-                lrn_key = (reg.lrn or '').strip()
-                # collect present days
-                present = set()
-                if lrn_key in attendance_by_key and month in attendance_by_key[lrn_key]:
-                    present.update(attendance_by_key[lrn_key][month])
-                if name_key in attendance_by_key and month in attendance_by_key[name_key]:
-                    present.update(attendance_by_key[name_key][month])
-
-                for col_idx, day in date_cols:
-                    cell = ws.cell(row=row, column=col_idx)
-                    # marked present in attendance -> leave blank, else X
-                    if day in present and day != 1:
-                        cell.value = ''
-                    else:
-                        cell.value = 'X'
-                row += 1
-
-        process_rows(13, males)
-        process_rows(64, females)
-
-    # Save workbook to BytesIO
+            _template_locations[str(settings.BASE_DIR)] = p
+            return p
+    raise FileNotFoundError('attendance_template.xlsx not found in project; place it in project root or static folder')
+
+
+MONTH_NAMES = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+# Incremental SF2 exports keep their last workbook and per-month signatures here
+_incremental_lock = threading.Lock()
+
+
+def _roster_rows(regs):
+    """[(student id, visible name)] for month_grid, in sheet order."""
+    return [
+        (reg.id, (reg.student and reg.student.strip()) or (reg.lrn and reg.lrn.strip()) or 'Unknown Student')
+        for reg in regs
+    ]
+
+
+def _month_days(presence, month_num: int):
+    return {student_id: months[month_num] for student_id, months in presence.items() if month_num in months}
+
+
+class SetPresence:
+    """School-year presence as student id -> month -> set of days (the pure-Python path)."""
+
+    def __init__(self, presence):
+        self.presence = presence
+
+    def absent_columns(self, month_num: int, date_cols):
+        return sf2_grid.absent_columns(date_cols, _month_days(self.presence, month_num))
+
+    def month_signatures(self) -> Dict[str, str]:
+        return _month_signatures(self.presence)
+
+
+class MatrixPresence:
+    """School-year presence as one PresenceMatrix per month number (the NumPy path)."""
+
+    def __init__(self, matrices):
+        self.matrices = matrices
+
+    def absent_columns(self, month_num: int, date_cols):
+        matrix = self.matrices.get(month_num)
+        return matrix.absent_columns(date_cols) if matrix is not None else {}
+
+    def month_signatures(self) -> Dict[str, str]:
+        signatures = {str(month_num): matrix.signature() for month_num, matrix in self.matrices.items()}
+        return {key: sig for key, sig in signatures.items() if sig is not None}
+
+
+def school_year_months(school_year: int):
+    """The twelve (year, month) pairs of a school year, in order."""
+    start, _ = school_year_bounds(school_year)
+    return [
+        (start.year + (start.month - 1 + i) // 12, (start.month - 1 + i) % 12 + 1)
+        for i in range(12)
+    ]
+
+
+def load_school_year_presence(school_year: int, student_ids, section_id: Optional[int] = None):
+    """Presence for the SF2 renderers: PresenceMatrix-backed when NumPy is installed."""
+    if presence_matrix.available():
+        matrices = presence_matrix.load_months(school_year_months(school_year), student_ids, section_id)
+        return MatrixPresence({month: matrix for (_, month), matrix in matrices.items()})
+    return SetPresence(school_year_presence(school_year, section_id))
+
+
+def write_grid(ws, cells):
+    for row, col, value in cells:
+        ws.cell(row=row, column=col).value = value
+
+
+def render_month_sheet(ws, month_num: int, males, females, presence, include_names: bool = False,
+                       date_cols=None):
+    """Write one month sheet: 'X' for absent days, blank for present days.
+
+    `presence` is a SetPresence or MatrixPresence. `date_cols` is the sheet's [(column, day)]
+    map from the template registry; it is read from row 10 of `ws` when not given.
+    """
+    if date_cols is None:
+        date_cols = read_date_columns(ws)
+    male_rows, female_rows = _roster_rows(males), _roster_rows(females)
+    absent = presence.absent_columns(month_num, date_cols)
+    write_grid(ws, sf2_grid.month_grid(date_cols, male_rows, female_rows, absent, include_names))
+    _write_marks_summary(ws, date_cols, male_rows, female_rows, absent)
+
+
+def marks_summary(date_cols, male_rows, female_rows, absent) -> Optional[dict]:
+    """SF2 footer figures for a rendered month sheet, counted from its 'X' marks.
+
+    The school days are the sheet's date columns, so the totals agree with the marks a
+    reader sees. None when NumPy isn't installed; the template's formulas then stay.
+    """
+    if not presence_matrix.available():
+        return None
+    all_absent = [True] * len(date_cols)
+    marks = [absent.get(student_id, all_absent) for student_id, _ in male_rows + female_rows]
+    return presence_matrix.marks_totals(marks, len(male_rows), [day for _, day in date_cols])
+
+
+def _write_marks_summary(ws, date_cols, male_rows, female_rows, absent):
+    summary = marks_summary(date_cols, male_rows, female_rows, absent)
+    if summary is not None:
+        write_sf2_summary(ws, summary, date_cols)
+
+
+def write_sf2_summary(ws, summary: dict, date_cols=None):
+    """Write an sf2_totals summary into the footer rows of an SF2 month sheet."""
+    if date_cols is None:
+        date_cols = read_date_columns(ws)
+    write_grid(ws, sf2_grid.summary_grid(date_cols, summary))
+
+
+def sf2_month_summary(year: int, month: int, section_id: Optional[int] = None,
+                      until: Optional[date] = None) -> dict:
+    """All SF2 summary figures for one section-month, from a single PresenceMatrix.
+
+    School days are Monday to Friday up to `until` (today by default), so the current
+    month is summarised as far as it has gone and future months have no school days.
+    Learners are the registered males and females, as on the SF2 sheet. Requires NumPy.
+    """
+    if not presence_matrix.available():
+        raise RuntimeError('NumPy is required for SF2 summaries')
+    if until is None:
+        until = timezone.localdate()
+    registrations = Registration.objects.order_by('student').only('id', 'sex')
+    if section_id is not None:
+        registrations = registrations.filter(section_id=section_id)
+    males, females = _split_roster(registrations)
+    student_ids = [r.id for r in males + females]
+
+    matrix = presence_matrix.PresenceMatrix.load(year, month, student_ids, section_id)
+    summary = matrix_month_summary(matrix, len(males), until)
+    summary['section'] = section_id
+    return summary
+
+
+def matrix_month_summary(matrix, males: int, until: date) -> dict:
+    """sf2_totals for a PresenceMatrix whose roster lists `males` males first, over the
+    month's weekdays up to `until`."""
+    year, month = matrix.year, matrix.month
+    if (year, month) < (until.year, until.month):
+        school_days = matrix.school_days()
+    elif (year, month) == (until.year, until.month):
+        school_days = matrix.school_days(until.day)
+    else:
+        school_days = matrix.school_days(0)
+    summary = matrix.sf2_totals(males, school_days)
+    summary.update(year=year, month=month)
+    summary['learners']['id'] = list(matrix.student_ids)
+    return summary
+
+
+def _split_roster(registrations):
+    """(males, females) in roster order; other values of `sex` are not on the SF2."""
+    registrations = list(registrations)
+    males = [r for r in registrations if (r.sex or '').lower() == 'male']
+    females = [r for r in registrations if (r.sex or '').lower() == 'female']
+    return males, females
+
+
+def _render_months(wb, months, males, females, presence, include_names, date_columns):
+    """Render the (sheet name, month number) pairs in `months` into `wb`, in order.
+
+    Months are rendered in this process: writing a month's cells takes milliseconds, while
+    a worker process would first have to start and unpickle its own copy of the template,
+    which alone costs about as much as the whole serial build.
+    """
+    for name, month_num in months:
+        render_month_sheet(wb[name], month_num, males, females, presence, include_names,
+                           date_cols=date_columns.get(name))
+
+
+def _roster_signature(registrations, include_names: bool) -> str:
+    h = hashlib.sha1(b'names' if include_names else b'marks')
+    for reg in registrations:
+        h.update(f"{reg.id}\x1f{reg.lrn}\x1f{reg.student}\x1f{reg.sex}\x1e".encode())
+    return h.hexdigest()
+
+
+def _month_signatures(presence) -> Dict[str, str]:
+    """Per-month digest of who was present on which days; equal digests render equal sheets."""
+    per_month: Dict[int, list] = {}
+    for student_id, months in presence.items():
+        for month_num, days in months.items():
+            per_month.setdefault(month_num, []).append((student_id, sorted(days)))
+    return {
+        str(month_num): hashlib.sha1(repr(sorted(rows)).encode()).hexdigest()
+        for month_num, rows in per_month.items()
+    }
+
+
+def _incremental_paths(school_year: int, include_names: bool, section_id: Optional[int]) -> Tuple[str, str]:
+    base = os.path.join(str(settings.BASE_DIR), 'exports', 'incremental')
+    os.makedirs(base, exist_ok=True)
+    stem = f"sf2_{school_year}_{'names' if include_names else 'marks'}"
+    if section_id is not None:
+        stem += f"_sec{section_id}"
+    return os.path.join(base, stem + '.xlsx'), os.path.join(base, stem + '.json')
+
+
+def render_school_year_workbook(registrations, presence, include_names: bool = False) -> io.BytesIO:
+    """Render every month sheet of the SF2 template for a roster and its presence source.
+
+    `registrations` need id, lrn, student and sex (saved or not: archived rosters are
+    rendered from unsaved instances); `presence` is a SetPresence or MatrixPresence.
+    """
+    males, females = _split_roster(registrations)
+    template = template_registry.get(find_sf2_template())
+    wb = template.workbook()
+    months = [(name, MONTH_NAMES.index(name) + 1) for name in MONTH_NAMES if name in wb.sheetnames]
+    _render_months(wb, months, males, females, presence, include_names, template.date_columns)
     bio = io.BytesIO()
-    wb.save(bio)
+    save_workbook(wb, bio, fixed_time=wb.properties.created)
+    bio.seek(0)
+    return bio
+
+
+def build_attendance_workbook(include_names: bool = False, school_year: Optional[int] = None,
+                              incremental: bool = False, section_id: Optional[int] = None) -> io.BytesIO:
+    """Build an Excel workbook (in-memory) based on the stored registrations and attendance.
+
+    This function expects an Excel template file named 'attendance_template.xlsx' located
+    in the Django static files or the project root (adjust path as necessary). It will
+    mark 'X' for absent days and leave cells empty for present days consistent with the
+    front-end logic. `school_year` is the start year of the school year to export and
+    defaults to the current one.
+
+    With `incremental=True` the previous workbook for the same school year is reused and only
+    month sheets whose presence data changed are re-rendered; a roster or template change
+    re-renders everything. `section_id` limits the workbook to one section's roster.
+
+    The file is saved with fixed timestamps, so the same data always builds the same bytes.
+    """
+    if school_year is None:
+        school_year = current_school_year()
+
+    registrations = Registration.objects.order_by('student').only('id', 'lrn', 'student', 'sex')
+    if section_id is not None:
+        registrations = registrations.filter(section_id=section_id)
+    registrations = list(registrations)
+    presence = load_school_year_presence(school_year, [r.id for r in registrations], section_id)
+
+    if not incremental:
+        return render_school_year_workbook(registrations, presence, include_names)
+
+    males, females = _split_roster(registrations)
+    template = template_registry.get(find_sf2_template())
+    manifest = {
+        'template_mtime': template.mtime,
+        'roster': _roster_signature(registrations, include_names),
+        'months': presence.month_signatures(),
+    }
+    xlsx_path, manifest_path = _incremental_paths(school_year, include_names, section_id)
+    with _incremental_lock:
+        previous = None
+        try:
+            with open(manifest_path) as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            pass
+        reusable = (
+            previous is not None
+            and os.path.exists(xlsx_path)
+            and previous.get('template_mtime') == manifest['template_mtime']
+            and previous.get('roster') == manifest['roster']
+        )
+        wb = load_workbook(xlsx_path) if reusable else template.workbook()
+        months = []
+        for month in MONTH_NAMES:
+            if month not in wb.sheetnames:
+                continue
+            month_num = MONTH_NAMES.index(month) + 1
+            key = str(month_num)
+            if reusable and previous['months'].get(key) == manifest['months'].get(key):
+                continue  # unchanged month: keep the sheet from the last export as is
+            months.append((month, month_num))
+        _render_months(wb, months, males, females, presence, include_names, template.date_columns)
+
+        bio = io.BytesIO()
+        save_workbook(wb, bio, fixed_time=wb.properties.created)
+        # write-then-rename so a crash never leaves a half-written base workbook
+        for path, data in ((xlsx_path, bio.getvalue()), (manifest_path, json.dumps(manifest).encode())):
+            with open(path + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.tmp', path)
     bio.seek(0)
     return bio
+
+
+def month_flag_rows(year: int, month: int, student_ids, section_id: Optional[int] = None) -> Dict[int, list]:
+    """student id -> [flags for day 1..last day] (1 = AM, 2 = PM), for every id in `student_ids`."""
+    if presence_matrix.available():
+        matrix = presence_matrix.PresenceMatrix.load(year, month, student_ids, section_id)
+        return dict(zip(matrix.student_ids, matrix.flags().tolist()))
+    days = calendar.monthrange(year, month)[1]
+    flags = presence.month_flags(year, month, section_id)
+    return {sid: [flags.get(sid, {}).get(d, 0) for d in range(1, days + 1)] for sid in student_ids}
+
+
+def generate_month_export(month: Optional[date] = None, progress: Optional[Callable[[int, str], None]] = None,
+                          section_id: Optional[int] = None) -> str:
+    """Render the month attendance sheet (P/X marks, AM/PM triangle overlays, absent shading)
+    from the template and save it under exports/. Returns the saved filename.
+
+    `month` is any date in the month to export (defaults to the current month, rendered up to
+    today). `progress(percent, message)` is called between stages so background export jobs
+    can report status.
+    """
+    def report(pct: int, message: str):
+        if progress is not None:
+            progress(pct, message)
+
+    today = timezone.localdate()
+    if month is None or (month.year, month.month) == (today.year, today.month):
+        month_end = today
+    else:
+        month_end = date(month.year, month.month, calendar.monthrange(month.year, month.month)[1])
+
+    # The current month renders up to today, so the end date is part of the key.
+    cache_key = export_cache.make_key(
+        'month', month_end.isoformat(), section_id,
+        template_path=settings.BASE_DIR.parent / 'public' / 'attendance_template.xlsx',
+    )
+    cached = export_cache.get(cache_key)
+    if cached:
+        report(100, 'Unchanged since last export')
+        return cached
+
+    regs = Registration.objects.all().order_by('student')
+    if section_id is not None:
+        regs = regs.filter(section_id=section_id)
+
+    # Attempt to load an Excel template (if present in repo root `public/attendance_template.xlsx`)
+    month_name = month_end.strftime('%b').upper()
+    template_path = None
+    try:
+        # public folder is assumed to live one level above backend/ (project root)
+        template_path = settings.BASE_DIR.parent / 'public' / 'attendance_template.xlsx'
+        if template_path.exists():
+            wb = template_registry.workbook(template_path)
+            # use the month sheet if present, otherwise create/use active and set title
+            if month_name in wb.sheetnames:
+                ws = wb[month_name]
+            else:
+                ws = wb.active
+                try:
+                    ws.title = month_name
+                except Exception:
+                    # if title clashes, create a new sheet
+                    ws = wb.create_sheet(title=month_name)
+        else:
+            wb = openpyxl.Workbook()
+            ws = wb.active
+            ws.title = month_name
+    except Exception:
+        # fallback to a fresh workbook if loading template fails
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = month_name
+
+    # If the worksheet is newly created or template missing header, ensure header row exists
+    try:
+        # Header row: Day numbers 1..31 starting at column 3 if not already present
+        existing_header = [cell.value for cell in ws[1]] if ws.max_row >= 1 else []
+        if not existing_header or len(existing_header) < 3:
+            ws.cell(row=1, column=1, value='Student')
+            for d in range(1, 32):
+                ws.cell(row=1, column=2 + d, value=d)
+    except Exception:
+        # best-effort: ensure header
+        ws.cell(row=1, column=1, value='Student')
+        for d in range(1, 32):
+            ws.cell(row=1, column=2 + d, value=d)
+
+    report(10, 'Template loaded')
+
+    # Attendance flags per student id -> [day 1, day 2, ...], read from the MonthlyPresence
+    # rollup (one small row per student) instead of walking this month's raw scans.
+    # Flags: AM=1, PM=2 (bitmask, see overlays.AM_FLAG / PM_FLAG)
+    regs = list(regs)
+    att_flags = month_flag_rows(month_end.year, month_end.month, [reg.id for reg in regs], section_id)
+
+    # Render rows and remember mapping from row index -> student key for later overlays
+    row = 2
+    row_key_map = {}
+    for reg in regs:
+        name = reg.student or reg.lrn
+        key = reg.id
+        row_key_map[row] = key
+        ws.cell(row=row, column=1, value=name)
+        for d in range(1, month_end.day + 1):
+            cell = ws.cell(row=row, column=2 + d)
+            has_flag = bool(att_flags[key][d - 1])
+            if has_flag:
+                # mark present; we'll overlay triangles later for AM/PM
+                cell.value = 'P'
+                cell.font = Font(bold=True, color='FF00A050')
+                cell.alignment = Alignment(horizontal='center', vertical='center')
+            else:
+                cell.value = 'X'
+                cell.font = Font(color='FF000000')
+                cell.alignment = Alignment(horizontal='center', vertical='center')
+        row += 1
+
+    report(40, 'Rows rendered')
+
+    # Try to add triangular image overlays for present cells (P) to create a half-cell shading.
+    # This is optional: if Pillow isn't installed we'll skip image overlays and keep P/X markers.
+    try:
+        import PIL  # noqa: F401
+
+        def get_column_width_pixels(ws, col_letter: str) -> int:
+            default_width = getattr(ws.sheet_format, 'defaultColWidth', None) or 8.43
+            cd = ws.column_dimensions.get(col_letter)
+            width = getattr(cd, 'width', None) or default_width
+            try:
+                px = int(float(width) * 7 + 5)
+            except Exception:
+                px = int(default_width * 7 + 5)
+            return max(px, 20)
+
+        def get_row_height_pixels(ws, row_idx: int) -> int:
+            default_height = getattr(ws.sheet_format, 'defaultRowHeight', None) or 15
+            rd = ws.row_dimensions.get(row_idx)
+            height = getattr(rd, 'height', None) or default_height
+            try:
+                px = int(float(height) * 96.0 / 72.0)
+            except Exception:
+                px = int(default_height * 96.0 / 72.0)
+            return max(px, 12)
+
+        # Cells of equal size and flags share one PNG, so a sheet holds at most three
+        # distinct images per cell geometry no matter how many students were present.
+        triangles = TriangleOverlays()
+        col_letters = {d: openpyxl.utils.get_column_letter(2 + d) for d in range(1, month_end.day + 1)}
+        col_widths = {d: get_column_width_pixels(ws, letter) for d, letter in col_letters.items()}
+
+        max_row = row - 1
+        for r_idx in range(2, max_row + 1):
+            # Determine student key for this row (skip if not present)
+            key = row_key_map.get(r_idx)
+            if key is None:
+                continue
+            day_flags = att_flags.get(key)
+            if not day_flags or not any(day_flags):
+                continue
+            cell_h = get_row_height_pixels(ws, r_idx)
+            for d in range(1, month_end.day + 1):
+                flags = day_flags[d - 1]
+                if not flags:
+                    continue
+                try:
+                    img_w, img_h = max(4, col_widths[d]), max(4, cell_h)
+                    ws.add_image(triangles.image(img_w, img_h, flags), f"{col_letters[d]}{r_idx}")
+                except Exception:
+                    # If anything fails for a cell, continue — we still want the workbook to be returned
+                    continue
+    except Exception:
+        # Pillow not available or unexpected error — skip adding images
+        pass
+
+    report(70, 'Overlays added')
+
+    # ------ Server-side shading for absent 'X' cells ------
+    # Use openpyxl PatternFill to shade cells containing 'X' so shading works even if Pillow
+    # is not installed in the environment. This is faster and more reliable than image overlays
+    # for full-cell coloring.
+    try:
+        import re
+        # only match an exact single-character X-like glyph
+        x_re = re.compile(r"^[xX\u2715\u2716\u00D7\u2718\u2717]$")
+        from openpyxl.styles import PatternFill as _PatternFill
+
+        # determine fill color (ARGB) - use pale red
+        _fill_hex = 'FFD6D6'
+        if len(_fill_hex) == 6 and not _fill_hex.upper().startswith('FF'):
+            _fill_argb = 'FF' + _fill_hex
+        elif len(_fill_hex) == 8 and _fill_hex.upper().startswith('FF'):
+            _fill_argb = _fill_hex
+        else:
+            _fill_argb = 'FF' + _fill_hex
+
+        _fill = _PatternFill(fill_type='solid', start_color=_fill_argb, end_color=_fill_argb)
+
+        max_row = row - 1 if 'row' in locals() else wb.active.max_row
+        for r_idx in range(2, max_row + 1):
+            for d in range(1, month_end.day + 1):
+                try:
+                    col_idx = 2 + d
+                    cell = ws.cell(row=r_idx, column=col_idx)
+                    v = cell.value
+                    if v is None:
+                        continue
+
+                    # Skip formula cells entirely - we don't want to match "x" inside formulas
+                    if getattr(cell, 'data_type', None) == 'f':
+                        continue
+                    if isinstance(v, str) and v.startswith('='):
+                        continue
+
+                    s = str(v).strip()
+                    if not s:
+                        continue
+
+                    # require exact match (single glyph) rather than substring search
+                    if not x_re.fullmatch(s):
+                        continue
+
+                    # Apply a solid PatternFill so Excel will show the pale-red shading
+                    try:
+                        cell.fill = _fill
+                    except Exception:
+                        # best-effort: ignore if fill cannot be applied
+                        pass
+                except Exception:
+                    continue
+    except Exception:
+        # If anything unexpected happens, continue without blocking the export
+        pass
+
+    report(90, 'Saving workbook')
+
+    # Save workbook to exports
+    filename = f"attendance_server_export_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    save_workbook(wb, export_path(filename))
+    export_cache.put(cache_key, filename)
+    return filename
+
+
+def generate_school_year_export(include_names: bool = False, school_year: Optional[int] = None,
+                                progress: Optional[Callable[[int, str], None]] = None,
+                                section_id: Optional[int] = None) -> str:
+    """Build the full school-year SF2 workbook and save it under exports/. Returns the filename."""
+    if school_year is None:
+        school_year = current_school_year()
+    cache_key = export_cache.make_key(
+        'school_year', school_year, include_names, section_id, template_path=find_sf2_template(),
+    )
+    cached = export_cache.get(cache_key)
+    if cached:
+        if progress is not None:
+            progress(100, 'Unchanged since last export')
+        return cached
+    if progress is not None:
+        progress(10, 'Building workbook')
+    bio = build_attendance_workbook(
+        include_names=include_names, school_year=school_year,
+        incremental=getattr(settings, 'SF2_INCREMENTAL_EXPORT', True), section_id=section_id,
+    )
+    if progress is not None:
+        progress(90, 'Saving workbook')
+    label = f"_sec{section_id}" if section_id is not None else ''
+    filename = f"sf2_{school_year}-{school_year + 1}{label}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    with open(export_path(filename), 'wb') as dest:
+        dest.write(bio.getvalue())
+    export_cache.put(cache_key, filename)
+    return filename
+
+
+def _section_entry_name(section: Section) -> str:
+    label = re.sub(r'[^A-Za-z0-9._-]+', '_', f"{section.grade}-{section.name}").strip('_')
+    return f"{label or 'section'}_{section.pk}.xlsx"
+
+
+def generate_all_sections_export(include_names: bool = False, school_year: Optional[int] = None,
+                                 progress: Optional[Callable[[int, str], None]] = None,
+                                 workers: Optional[int] = None) -> str:
+    """Render every section's school-year SF2 workbook and bundle them into one zip under exports/.
+
+    Sections render in a pool of up to `workers` processes (settings.SECTION_EXPORT_WORKERS by
+    default, capped at the CPU count; 0 renders them one after another in this process). Each
+    section's workbook is identical whichever process renders it. Returns the zip filename.
+    """
+    if school_year is None:
+        school_year = current_school_year()
+    if workers is None:
+        workers = getattr(settings, 'SECTION_EXPORT_WORKERS', 4)
+    # each worker pays its own Django start-up and template parse, so more workers than
+    # cores only adds overhead; a single core renders inline
+    workers = min(workers, os.cpu_count() or 1)
+    if workers == 1:
+        workers = 0
+
+    cache_key = export_cache.make_key('all_sections', school_year, include_names, template_path=find_sf2_template())
+    cached = export_cache.get(cache_key)
+    if cached:
+        if progress is not None:
+            progress(100, 'Unchanged since last export')
+        return cached
+
+    sections = list(Section.objects.filter(school_year=school_year).order_by('grade', 'name'))
+    incremental = getattr(settings, 'SF2_INCREMENTAL_EXPORT', True)
+    tasks = [(section.pk, school_year, include_names, incremental) for section in sections]
+
+    filename = f"sf2_{school_year}-{school_year + 1}_sections_{timezone.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    try:
+        _write_sections_zip(export_path(filename), sections, tasks, workers, progress)
+    except Exception:
+        # don't leave a truncated bundle behind in exports/
+        if os.path.exists(export_path(filename)):
+            os.remove(export_path(filename))
+        raise
+    export_cache.put(cache_key, filename)
+    return filename
+
+
+def _write_sections_zip(path, sections, tasks, workers, progress):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as bundle:
+        # xlsx files are already deflated; storing them avoids compressing twice
+        def add(section, data, done):
+            bundle.writestr(_section_entry_name(section), data)
+            if progress is not None:
+                progress(5 + 90 * done // max(1, len(sections)), f"Rendered {done}/{len(sections)} sections")
+
+        if workers <= 0 or len(tasks) <= 1:
+            for done, (section, task) in enumerate(zip(sections, tasks), start=1):
+                add(section, section_worker.render(task), done)
+        else:
+            # spawn, not fork: forked children would inherit the parent's open DB connection
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(tasks)), mp_context=multiprocessing.get_context('spawn'),
+                initializer=section_worker.init,
+            ) as pool:
+                for done, (section, data) in enumerate(zip(sections, pool.map(section_worker.render, tasks)), start=1):
+                    add(section, data, done)
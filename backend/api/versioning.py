@@ -0,0 +1,72 @@
+"""Cheap data versions for caches: change counters bumped on writes plus id high-water marks.
+
+Counters are DataVersion rows bumped from model signals (api/signals.py) and explicitly by
+bulk paths that bypass signals. Attendance inserts don't bump anything: the max Attendance
+id already moves on every insert, so the scan path stays one write.
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Subquery
+from django.utils import timezone
+
+from .models import Attendance, DataVersion
+
+REGISTRATION = 'registration'
+# attendance updates and deletes, which the id high-water mark can't see
+ATTENDANCE_CHANGE = 'attendance_change'
+DROPPED = 'dropped'
+# section creates, renames and deletes: exports show section names and split by section
+SECTION = 'section'
+
+
+def bump(name: str):
+    now = timezone.now()
+    counter = DataVersion.objects.filter(name=name)
+    if counter.update(value=F('value') + 1, updated_at=now):
+        return
+    try:
+        with transaction.atomic():
+            DataVersion.objects.create(name=name, value=1, updated_at=now)
+    except IntegrityError:
+        counter.update(value=F('value') + 1, updated_at=now)
+
+
+def counters() -> dict:
+    return dict(DataVersion.objects.values_list('name', 'value'))
+
+
+def stamp(*names: str) -> Tuple[Tuple[int, ...], Optional[datetime]]:
+    """Values of the named counters (0 if never bumped) and when the latest of them moved."""
+    rows = {name: (value, at) for name, value, at in
+            DataVersion.objects.filter(name__in=names).values_list('name', 'value', 'updated_at')}
+    values = tuple(rows.get(name, (0, None))[0] for name in names)
+    return values, max((at for _, at in rows.values()), default=None)
+
+
+def counter_annotations(*names: str) -> dict:
+    """Scalar subqueries for the named counters, to read a version in the same query as
+    the rows it covers; take_counters() takes them back off the fetched rows."""
+    annotations = {}
+    for i, name in enumerate(names):
+        counter = DataVersion.objects.filter(name=name)
+        annotations[f'_version_{i}'] = Subquery(counter.values('value')[:1])
+        annotations[f'_version_at_{i}'] = Subquery(counter.values('updated_at')[:1])
+    return annotations
+
+
+def take_counters(rows: List[dict], *names: str) -> Tuple[Tuple[int, ...], Optional[datetime]]:
+    """stamp() from rows annotated with counter_annotations(), removing the extra keys."""
+    for row in rows:
+        found = [(row.pop(f'_version_{i}'), row.pop(f'_version_at_{i}')) for i in range(len(names))]
+    values = tuple(value or 0 for value, _ in found)
+    return values, max((at for _, at in found if at is not None), default=None)
+
+
+def data_version() -> str:
+    """Version string that changes whenever attendance, roster or section data changes."""
+    max_id = Attendance.objects.aggregate(m=Max('id'))['m'] or 0
+    values = counters()
+    return (f"a{max_id}.c{values.get(ATTENDANCE_CHANGE, 0)}.r{values.get(REGISTRATION, 0)}"
+            f".s{values.get(SECTION, 0)}")
@@ -1,39 +1,174 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.http import http_date
 import os
-from .models import Registration, Attendance, DroppedRegistration
-from .serializers import RegistrationSerializer, AttendanceSerializer, DroppedRegistrationSerializer
+from .models import Registration, Attendance, DroppedRegistration, ExportJob, Section, ArchivedSchoolYear
+from .serializers import RegistrationSerializer, AttendanceSerializer, DroppedRegistrationSerializer, SectionSerializer
+from .serializers import attendance_values, render_attendance_rows, ExportJobSerializer, ArchivedSchoolYearSerializer
+from . import archive, bulk_delete, events, group_commit, jobs, presence_matrix, roster_import, versioning
+from .lrn_cache import lrn_cache
+from .pagination import AttendanceKeysetPagination
+from .template_registry import template_registry
+from .utils_export import generate_month_export, school_year_months, sf2_month_summary
 from rest_framework.decorators import permission_classes
 from rest_framework.permissions import AllowAny
+import codecs
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import io
 try:
     import openpyxl
-    from openpyxl.styles import Font, Alignment, PatternFill
+    from openpyxl.styles import PatternFill
 except Exception:
     openpyxl = None
 
-from django.http import FileResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+import asyncio
+
+def _section_param(params):
+    """The optional ?section=<id> scope shared by list, today and export endpoints."""
+    value = params.get('section')
+    if value in (None, ''):
+        return None
+    if not str(value).isdigit():
+        raise ValidationError({'section': 'Expected a section id'})
+    return int(value)
+
+
+def _validators(parts, last_modified):
+    """(quoted ETag, Last-Modified timestamp) for a version made of change counters."""
+    etag = quote_etag('.'.join(str(p) for p in parts))
+    return etag, int(last_modified.timestamp()) if last_modified else None
+
+
+def _with_validators(response, etag, modified):
+    response['ETag'] = etag
+    if modified is not None:
+        response['Last-Modified'] = http_date(modified)
+    # cacheable, but revalidated on every poll
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _conditional(request, parts, last_modified, build):
+    """Answer a dashboard poll with 304 Not Modified when the client's ETag is current.
+
+    The ETag is made of change counters (api/versioning.py) rather than a hash of the body,
+    so an unchanged poll costs the version lookup and no query or serialization of the
+    list; build() renders the full response otherwise.
+    """
+    etag, modified = _validators(parts, last_modified)
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    return _with_validators(response if response is not None else build(), etag, modified)
+
+
+class SectionViewSet(viewsets.ModelViewSet):
+    queryset = Section.objects.all().order_by('-school_year', 'grade', 'name')
+    serializer_class = SectionSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        school_year = self.request.query_params.get('school_year')
+        if self.action == 'list' and school_year:
+            if not school_year.isdigit():
+                raise ValidationError({'school_year': 'Expected a year, e.g. 2025'})
+            queryset = queryset.filter(school_year=int(school_year))
+        return queryset
+
 
 class RegistrationViewSet(viewsets.ModelViewSet):
     queryset = Registration.objects.all().order_by('student')
     serializer_class = RegistrationSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        section = _section_param(self.request.query_params)
+        if self.action == 'list' and section is not None:
+            queryset = queryset.filter(section_id=section)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        (version,), modified = versioning.stamp(versioning.REGISTRATION)
+        return _conditional(request, ('r', version), modified,
+                            lambda: super(RegistrationViewSet, self).list(request, *args, **kwargs))
+
+
+def _parse_date_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    d = parse_date(value)
+    if d is None:
+        raise ValidationError({name: 'Expected YYYY-MM-DD'})
+    return d
+
+
+def filter_attendance(queryset, params):
+    """Apply the shared attendance list filters from query params.
+
+    date=YYYY-MM-DD, from/to=YYYY-MM-DD (inclusive, local dates), student=<registration id>,
+    lrn=<LRN>, section=<section id>. Dates match the indexed local_date column.
+    """
+    day = _parse_date_param(params, 'date')
+    if day:
+        queryset = queryset.filter(local_date=day)
+    start = _parse_date_param(params, 'from')
+    if start:
+        queryset = queryset.filter(local_date__gte=start)
+    end = _parse_date_param(params, 'to')
+    if end:
+        queryset = queryset.filter(local_date__lte=end)
+    student = params.get('student')
+    if student:
+        if not student.isdigit():
+            raise ValidationError({'student': 'Expected a registration id'})
+        queryset = queryset.filter(student_id=int(student))
+    lrn = params.get('lrn')
+    if lrn:
+        queryset = queryset.filter(student__lrn=lrn.strip())
+    section = _section_param(params)
+    if section is not None:
+        queryset = queryset.filter(student__section_id=section)
+    return queryset.order_by('time', 'id')
+
+
+def todays_records(params):
+    records = Attendance.objects.filter(local_date=timezone.localdate())
+    section = _section_param(params)
+    if section is not None:
+        records = records.filter(student__section_id=section)
+    return records
+
+
+def todays_attendance(params):
+    """Today's scans (optionally one section's) as a values() queryset for render_attendance_rows."""
+    return attendance_values(todays_records(params).order_by('time', 'id'))
+
 
 @api_view(['GET', 'POST'])
 def record_attendance(request):
     """Record attendance via QR scan (POST) or list attendances (GET).
 
-    GET: returns serialized list of Attendance records (same shape as the viewset list).
+    GET: returns serialized list of Attendance records (same shape as the viewset list),
+    filtered by date, from/to, student and lrn. Passing cursor or page_size switches to
+    keyset pagination ({next, cursor, results}).
     POST: existing behavior — create an Attendance from provided 'lrn'.
     """
     if request.method == 'GET':
-        # Return all attendance records (keeps compatibility with frontend fallback)
-        records = Attendance.objects.all()
-        serializer = AttendanceSerializer(records, many=True)
-        return Response(serializer.data)
+        records = attendance_values(filter_attendance(Attendance.objects.all(), request.query_params))
+        paginator = AttendanceKeysetPagination()
+        page = paginator.paginate_queryset(records, request)
+        if page is not None:
+            return paginator.get_paginated_response(render_attendance_rows(page))
+        return Response(render_attendance_rows(records))
 
     # POST: record a new attendance
     data = request.data
@@ -41,64 +176,404 @@ def record_attendance(request):
     if not lrn:
         return Response({'error': 'LRN is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        student = Registration.objects.get(lrn=lrn)
-    except Registration.DoesNotExist:
+    # resolved through the in-process roster cache; invalidated by Registration signals
+    student = lrn_cache.get(lrn)
+    if student is None:
         return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
+    student_id, student_name = student
+
+    # Insert-or-ignore: the (student, local_date, session) unique constraint rejects repeat
+    # scans of the same QR code, so no read-before-write is needed.
+    attendance = Attendance(student_id=student_id, time=timezone.now())
+    if getattr(settings, 'SCAN_GROUP_COMMIT', False):
+        # committed in one transaction with other requests' scans by the group-commit writer
+        attendance.stamp_local_fields()
+        try:
+            created, _ = group_commit.writer().submit(attendance).result(
+                timeout=getattr(settings, 'SCAN_GROUP_COMMIT_TIMEOUT', 10))
+        except FutureTimeoutError:
+            # still queued or committing; the writer may yet store it, so don't report a failure
+            return Response({
+                'message': f'Attendance for {student_name} is still being recorded',
+                'pending': True,
+            }, status=status.HTTP_202_ACCEPTED)
+        except IntegrityError:
+            created = None
+    else:
+        try:
+            with transaction.atomic():
+                attendance.save()
+            created = True
+        except IntegrityError:
+            created = None
+    if created is None:
+        # either the unique constraint (a repeat scan) or the foreign key: the cached id
+        # belongs to a registration another process has deleted since
+        if not Attendance.objects.filter(
+            student_id=student_id, local_date=attendance.local_date, session=attendance.session,
+        ).exists():
+            lrn_cache.invalidate(lrn=lrn, pk=student_id)
+            return Response({'error': 'Student not found'}, status=status.HTTP_404_NOT_FOUND)
+        created = False
+    if not created:
+        return Response({
+            'message': f'Attendance already recorded for {student_name} ({attendance.session})',
+            'already_recorded': True,
+        }, status=status.HTTP_200_OK)
+    return Response({'message': f'Attendance recorded for {student_name}'}, status=status.HTTP_201_CREATED)
+
+
+# Upper bound on scans accepted in one batch so a misbehaving kiosk can't hold the write lock
+MAX_BATCH_SCANS = 1000
+
+
+def _parse_scanned_at(value):
+    """Parse a kiosk-supplied scan time; missing means 'now', unparseable returns None."""
+    if not value:
+        return timezone.now()
+    try:
+        dt = parse_datetime(str(value))
+    except ValueError:
+        return None
+    if dt is None:
+        return None
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+@api_view(['POST'])
+def record_attendance_batch(request):
+    """Record a buffered batch of QR scans in one request.
+
+    Body: a list of {lrn, scanned_at} items (or {"scans": [...]}). All LRNs are resolved
+    through the roster cache with at most one query and the rows are inserted with a single
+    insert-or-ignore bulk_create inside one transaction. Returns one result per item, in
+    order, with status 'created', 'unknown_lrn', 'duplicate' (the student already has a
+    scan for that date and session, stored or earlier in the batch) or 'invalid'. Replaying
+    an already-stored scan reports it as created with the stored id, so a kiosk can safely
+    retry a flush.
+    """
+    items = request.data
+    if isinstance(items, dict):
+        items = items.get('scans')
+    if not isinstance(items, list):
+        return Response({'error': 'Expected a list of scans'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > MAX_BATCH_SCANS:
+        return Response({'error': f'At most {MAX_BATCH_SCANS} scans per batch'}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = []
+    parsed = []  # (index, lrn, scanned_at) for items that passed validation
+    for idx, item in enumerate(items):
+        lrn = str(item.get('lrn') or '').strip() if isinstance(item, dict) else ''
+        if not lrn:
+            results.append({'lrn': None, 'status': 'invalid', 'error': 'LRN is required'})
+            continue
+        scanned_at = _parse_scanned_at(item.get('scanned_at'))
+        if scanned_at is None:
+            results.append({'lrn': lrn, 'status': 'invalid', 'error': 'Invalid scanned_at'})
+            continue
+        results.append({'lrn': lrn, 'status': None})
+        parsed.append((idx, lrn, scanned_at))
+
+    students = {
+        lrn: pk for lrn, (pk, _) in lrn_cache.get_many({lrn for _, lrn, _ in parsed}).items()
+    }
+
+    # first scan per (student, date, session) in the batch wins, like the DB constraint
+    indexes, objs = [], []
+    for idx, lrn, when in parsed:
+        student_id = students.get(lrn)
+        if student_id is None:
+            results[idx]['status'] = 'unknown_lrn'
+            continue
+        obj = Attendance(student_id=student_id, time=when)
+        obj.stamp_local_fields()
+        indexes.append(idx)
+        objs.append(obj)
+
+    try:
+        outcomes = group_commit.insert_scans(objs)
+    except IntegrityError:
+        # a cached id whose registration another process has deleted since fails the foreign
+        # key at commit and rolls the whole batch back; retry each scan alone
+        outcomes = []
+        for idx, obj in zip(indexes, objs):
+            try:
+                outcomes.extend(group_commit.insert_scans([obj]))
+            except IntegrityError:
+                lrn_cache.invalidate(lrn=results[idx]['lrn'], pk=obj.student_id)
+                outcomes.append((None, None))
+
+    for idx, (created, pk) in zip(indexes, outcomes):
+        if created is None:
+            results[idx]['status'] = 'unknown_lrn'
+        elif created:
+            results[idx]['status'] = 'created'
+            results[idx]['id'] = pk
+        else:
+            results[idx]['status'] = 'duplicate'
+
+    summary = {}
+    for r in results:
+        summary[r['status']] = summary.get(r['status'], 0) + 1
+    return Response({'results': results, 'summary': summary}, status=status.HTTP_200_OK)
 
-    Attendance.objects.create(student=student, time=timezone.now())
-    return Response({'message': f'Attendance recorded for {student.student}'}, status=status.HTTP_201_CREATED)
+
+@api_view(['GET'])
+def lrn_cache_stats(request):
+    """Hit/miss counters for the in-process LRN lookup cache used by the scan endpoints."""
+    return Response(lrn_cache.stats())
+
+
+# counters in today's attendance version: edits/deletes, and roster edits (student names)
+TODAY_COUNTERS = (versioning.ATTENDANCE_CHANGE, versioning.REGISTRATION)
+
+
+def _today_version(today, latest_id, latest_time, counters, changed_at):
+    modified = changed_at
+    if latest_time is not None and (modified is None or latest_time > modified):
+        modified = latest_time
+    return ('t', today.isoformat(), latest_id or 0) + counters, modified
 
 
 @api_view(['GET'])
 def attendance_today(request):
-    """Fetch today’s attendance"""
+    """Fetch today’s attendance, optionally for one ?section=<id>
+
+    Versioned by the newest listed scan id plus the attendance-change and roster counters,
+    so polls answer 304 until someone scans. A poll with validators looks the version up
+    first; a full response reads it in the same query as the rows.
+    """
     today = timezone.localdate()
-    records = Attendance.objects.filter(time__date=today)
-    serializer = AttendanceSerializer(records, many=True)
-    return Response(serializer.data)
+    records = todays_records(request.query_params)
+    if 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META:
+        latest = records.aggregate(id=Max('id'), time=Max('time'))
+        parts, modified = _today_version(today, latest['id'], latest['time'], *versioning.stamp(*TODAY_COUNTERS))
+        etag, modified = _validators(parts, modified)
+        response = get_conditional_response(request, etag=etag, last_modified=modified)
+        if response is not None:
+            return _with_validators(response, etag, modified)
+
+    rows = list(attendance_values(records.order_by('time', 'id')).annotate(
+        **versioning.counter_annotations(*TODAY_COUNTERS)))
+    stamp = versioning.take_counters(rows, *TODAY_COUNTERS) if rows else versioning.stamp(*TODAY_COUNTERS)
+    parts, modified = _today_version(
+        today, max((r['id'] for r in rows), default=None), max((r['time'] for r in rows), default=None), *stamp)
+    etag, modified = _validators(parts, modified)
+    return _with_validators(Response(render_attendance_rows(rows)), etag, modified)
+
+
+async def _event_stream(sub, backlog, section):
+    """SSE frames: the resumed backlog (or a reset), then live events with keepalive comments."""
+    keepalive = getattr(settings, 'EVENT_STREAM_KEEPALIVE', 15)
+
+    def wanted(event):
+        data_section = event['data'].get('section', section)
+        return section is None or event['type'] == events.RESET or data_section == section
+
+    try:
+        yield 'retry: 3000\n\n'  # reconnect delay for EventSource, in ms
+        if backlog is None:
+            yield events.format_event({'id': f'{events.event_bus.boot}-{sub.cursor}', 'type': events.RESET, 'data': {}})
+        else:
+            for event in backlog:
+                if wanted(event):
+                    yield events.format_event(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event['type'] == events.RESET:
+                # the client fell a whole queue behind; it reconnects and reloads
+                yield events.format_event(event)
+                return
+            if int(event['id'].rsplit('-', 1)[1]) > sub.cursor and wanted(event):
+                yield events.format_event(event)
+    finally:
+        events.event_bus.unsubscribe(sub)
+
+
+async def attendance_events(request):
+    """Live feed of scans, drops, restores and clears as Server-Sent Events (GET /api/events/).
+
+    Resumes after the Last-Event-ID header (or ?last_event_id=) from the in-process buffer;
+    when that isn't possible the stream opens with a 'reset' event. ?section=<id> limits
+    attendance, drop and restore events to one section. Needs the ASGI application
+    (backend/asgi.py); under WSGI a stream would tie up a worker thread, so it's refused.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'The event stream needs the ASGI server (backend.asgi:application)'},
+                            status=501)
+    section = request.GET.get('section') or None
+    if section is not None:
+        if not section.isdigit():
+            return JsonResponse({'section': 'Expected a section id'}, status=400)
+        section = int(section)
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+
+    sub = events.event_bus.subscribe(asyncio.get_running_loop())
+    backlog = events.event_bus.since(last_event_id)
+    if backlog is not None:
+        # anything newer than the cursor also arrives on the queue
+        backlog = [e for e in backlog if int(e['id'].rsplit('-', 1)[1]) <= sub.cursor]
+    response = StreamingHttpResponse(_event_stream(sub, backlog, section), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # keep reverse proxies from buffering the stream
+    return response
+
+
+# request content type -> roster_import row source for bulk_upsert_registrations
+BULK_UPSERT_SOURCES = {
+    'text/csv': roster_import.csv_rows,
+    'application/x-ndjson': roster_import.jsonl_rows,
+    'application/jsonl': roster_import.jsonl_rows,
+    'application/x-jsonlines': roster_import.jsonl_rows,
+}
+
+
+@api_view(['POST'])
+def bulk_upsert_registrations(request):
+    """Upsert registrations by LRN from a CSV or JSON Lines request body.
+
+    The body is decoded and parsed line by line as it is read, never buffered whole, and
+    rows are written in batches of ?batch_size= (settings.ROSTER_IMPORT_CHUNK_SIZE), each
+    in its own transaction. ?dry_run=1 validates and reports would-be inserts, updates and
+    conflicts without writing; ?section=<id> assigns every row to that section.
+    """
+    source = BULK_UPSERT_SOURCES.get((request.content_type or '').split(';')[0].strip().lower())
+    if source is None:
+        return Response({'error': 'Send text/csv or application/x-ndjson'},
+                        status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+    params = request.query_params
+    section = _section_param(params)
+    if section is not None and not Section.objects.filter(pk=section).exists():
+        return Response({'error': 'Section not found'}, status=status.HTTP_400_BAD_REQUEST)
+    batch_size = params.get('batch_size')
+    if batch_size not in (None, ''):
+        if not batch_size.isdigit() or not 0 < int(batch_size) <= roster_import.MAX_CHUNK_SIZE:
+            return Response({'error': f'batch_size must be 1-{roster_import.MAX_CHUNK_SIZE}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        batch_size = int(batch_size)
+    else:
+        batch_size = None
+    dry_run = params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+
+    lines = codecs.iterdecode(request.stream or [], 'utf-8-sig')
+    try:
+        summary = roster_import.import_rows(source(lines), section_id=section, chunk_size=batch_size, dry_run=dry_run)
+    except roster_import.ImportFileError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except UnicodeDecodeError:
+        # batches before the bad bytes may already be committed
+        return Response({'error': 'Body is not UTF-8 text'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(summary)
+
+
+def _wants_background(request) -> bool:
+    return request.query_params.get('background', '').lower() in ('1', 'true', 'yes')
+
+
+def _queue_job(kind, params):
+    """Queue a background job; the response points at the job status endpoint."""
+    jobs.resume_pending()
+    job = jobs.enqueue(kind, params)
+    body = ExportJobSerializer(job).data
+    body['status_url'] = f"/api/attendance/export_jobs/{job.pk}/"
+    return Response(body, status=status.HTTP_202_ACCEPTED)
+
 
 @api_view(['DELETE'])
 def clear_all_registrations(request):
-    Registration.objects.all().delete()
+    """Delete every registration (with its attendance) in short chunked transactions.
+
+    ?background=1 queues the delete as a job and returns 202 with its status_url.
+    """
+    if _wants_background(request):
+        return _queue_job(ExportJob.KIND_CLEAR_REGISTRATIONS, {})
+    bulk_delete.clear_registrations()
     return Response({"message": "All registrations deleted."}, status=status.HTTP_204_NO_CONTENT)
 
 
 @api_view(['DELETE'])
 def clear_attendance(request):
-    """Clear attendance records. Query param 'scope' accepts 'today' or 'all'. Defaults to 'today'."""
+    """Clear attendance records. Query param 'scope' accepts 'today' or 'all'. Defaults to 'today'.
+
+    Records are deleted in chunks, each in its own transaction, so scans keep working
+    meanwhile; ?background=1 queues the clear as a job and returns 202 with its status_url.
+    """
     scope = request.GET.get('scope', 'today')
+    if scope != 'all':
+        scope = 'today'
+    if _wants_background(request):
+        return _queue_job(ExportJob.KIND_CLEAR_ATTENDANCE, {'scope': scope, 'today': timezone.localdate().isoformat()})
     try:
-        if scope == 'all':
-            Attendance.objects.all().delete()
-            return Response({"message": "All attendance records deleted."}, status=status.HTTP_204_NO_CONTENT)
-        else:
-            today = timezone.localdate()
-            Attendance.objects.filter(time__date=today).delete()
-            return Response({"message": "Today's attendance deleted."}, status=status.HTTP_204_NO_CONTENT)
+        bulk_delete.clear_attendance(scope)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    if scope == 'all':
+        return Response({"message": "All attendance records deleted."}, status=status.HTTP_204_NO_CONTENT)
+    return Response({"message": "Today's attendance deleted."}, status=status.HTTP_204_NO_CONTENT)
 
 
 class AttendanceViewSet(viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
+    pagination_class = AttendanceKeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related('student')
+        if self.action == 'list':
+            queryset = filter_attendance(queryset, self.request.query_params)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        # flat values() fast path; same JSON shape as AttendanceSerializer
+        records = attendance_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(records)
+        if page is not None:
+            return self.get_paginated_response(render_attendance_rows(page))
+        return Response(render_attendance_rows(records))
+
+    def perform_create(self, serializer):
+        self._save_in_slot(serializer)
+
+    def perform_update(self, serializer):
+        self._save_in_slot(serializer)
+
+    def _save_in_slot(self, serializer):
+        # the serializer checked the slot; a scan committed since then still hits the constraint
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError({'non_field_errors': ['A scan for this student and session already exists']})
 
     @action(detail=False, methods=['get'])
     def today(self, request):
-        today_date = now().date()
-        attendances = Attendance.objects.filter(timestamp__date=today_date)
-        serializer = self.get_serializer(attendances, many=True)
-        return Response(serializer.data)
+        return Response(render_attendance_rows(todays_attendance(request.query_params)))
 
 
 @api_view(['POST'])
 def upload_excel(request):
-    """Accept an uploaded Excel file and save it to the backend 'exports' folder."""
+    """Accept an uploaded Excel file and save it to the backend 'exports' folder.
+
+    With mode=import (query or form field) the file is instead read as a roster: rows
+    under a header with LRN, student and sex columns are upserted as registrations by
+    LRN, optionally into ?section=<id>, and a summary of inserts, updates and rejected
+    rows is returned.
+    """
     f = request.FILES.get('file')
     if not f:
         return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
 
+    if (request.query_params.get('mode') or request.data.get('mode')) == 'import':
+        return _import_roster(request, f)
+
     # Ensure exports directory exists under BASE_DIR
     out_dir = settings.BASE_DIR / 'exports'
     try:
@@ -125,280 +600,175 @@ def upload_excel(request):
     return Response({'message': 'Saved', 'filename': filename, 'url': download_url}, status=status.HTTP_201_CREATED)
 
 
+def _import_roster(request, f):
+    if openpyxl is None:
+        return Response({'error': 'openpyxl not installed on server'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    section = _section_param(request.query_params) or _section_param(request.data)
+    if section is not None and not Section.objects.filter(pk=section).exists():
+        return Response({'error': 'Section not found'}, status=status.HTTP_400_BAD_REQUEST)
+    sheet = request.query_params.get('sheet') or request.data.get('sheet')
+    try:
+        summary = roster_import.import_rows(roster_import.excel_rows(f, sheet), section_id=section)
+    except roster_import.ImportFileError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(summary)
+
+
 @api_view(['GET'])
 def generate_excel_export(request):
     """Generate an Excel export server-side and save it to exports/. Returns download URL."""
     if openpyxl is None:
         return Response({'error': 'openpyxl not installed on server'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    regs = Registration.objects.all().order_by('student')
-    attends = Attendance.objects.all()
+    filename = generate_month_export(section_id=_section_param(request.query_params))
 
-    # Attempt to load an Excel template (if present in repo root `public/attendance_template.xlsx`)
-    today = timezone.localdate()
-    month_name = today.strftime('%b').upper()
-    template_path = None
-    try:
-        # public folder is assumed to live one level above backend/ (project root)
-        template_path = settings.BASE_DIR.parent / 'public' / 'attendance_template.xlsx'
-        if template_path.exists():
-            wb = openpyxl.load_workbook(str(template_path))
-            # use the month sheet if present, otherwise create/use active and set title
-            if month_name in wb.sheetnames:
-                ws = wb[month_name]
-            else:
-                ws = wb.active
-                try:
-                    ws.title = month_name
-                except Exception:
-                    # if title clashes, create a new sheet
-                    ws = wb.create_sheet(title=month_name)
-        else:
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = month_name
-    except Exception:
-        # fallback to a fresh workbook if loading template fails
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = month_name
+    download_url = f"/exports/{filename}"
+    return Response({'filename': filename, 'url': download_url}, status=status.HTTP_201_CREATED)
 
-    # If the worksheet is newly created or template missing header, ensure header row exists
-    try:
-        # Header row: Day numbers 1..31 starting at column 3 if not already present
-        existing_header = [cell.value for cell in ws[1]] if ws.max_row >= 1 else []
-        if not existing_header or len(existing_header) < 3:
-            ws.cell(row=1, column=1, value='Student')
-            for d in range(1, 32):
-                ws.cell(row=1, column=2 + d, value=d)
-    except Exception:
-        # best-effort: ensure header
-        ws.cell(row=1, column=1, value='Student')
-        for d in range(1, 32):
-            ws.cell(row=1, column=2 + d, value=d)
-
-    # Build attendance flags map keyed by lrn or student name lowercased
-    # Flags: AM=1, PM=2 (bitmask)
-    AM_FLAG = 1
-    PM_FLAG = 2
-    att_flags = {}
-    for a in attends:
-        try:
-            dt = a.time
-            d = dt.date()
-            hour = dt.hour
-        except Exception:
-            continue
-        if d.month != today.month or d.year != today.year:
-            continue
-        key = (a.student.lrn or a.student.student).strip().lower()
-        daynum = d.day
-        flag = AM_FLAG if hour < 12 else PM_FLAG
-        att_flags.setdefault(key, {}).setdefault(daynum, 0)
-        att_flags[key][daynum] = att_flags[key][daynum] | flag
-
-    # Render rows and remember mapping from row index -> student key for later overlays
-    row = 2
-    row_key_map = {}
-    for reg in regs:
-        name = reg.student or reg.lrn
-        key = (reg.lrn or reg.student).strip().lower()
-        row_key_map[row] = key
-        ws.cell(row=row, column=1, value=name)
-        for d in range(1, today.day + 1):
-            cell = ws.cell(row=row, column=2 + d)
-            has_flag = (key in att_flags and d in att_flags[key])
-            if has_flag:
-                # mark present; we'll overlay triangles later for AM/PM
-                cell.value = 'P'
-                cell.font = Font(bold=True, color='FF00A050')
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-            else:
-                cell.value = 'X'
-                cell.font = Font(color='FF000000')
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-        row += 1
-
-    # Try to add triangular image overlays for present cells (P) to create a half-cell shading.
-    # This is optional: if Pillow isn't installed we'll skip image overlays and keep P/X markers.
-    try:
-        from PIL import Image as PILImage, ImageDraw
-        from openpyxl.drawing.image import Image as OpenpyxlImage
 
-        # Helper to compute approximate pixel sizes (heuristic)
-        from openpyxl.utils import column_index_from_string
+@api_view(['GET'])
+def sf2_summary(request):
+    """SF2 footer figures for one month: daily present/absent per sex, average daily
+    attendance, percentage of attendance and learners absent 5 consecutive school days.
 
-        def get_column_width_pixels(ws, col_letter: str) -> int:
-            default_width = getattr(ws.sheet_format, 'defaultColWidth', None) or 8.43
-            cd = ws.column_dimensions.get(col_letter)
-            width = getattr(cd, 'width', None) or default_width
-            try:
-                px = int(float(width) * 7 + 5)
-            except Exception:
-                px = int(default_width * 7 + 5)
-            return max(px, 20)
-
-        def get_row_height_pixels(ws, row_idx: int) -> int:
-            default_height = getattr(ws.sheet_format, 'defaultRowHeight', None) or 15
-            rd = ws.row_dimensions.get(row_idx)
-            height = getattr(rd, 'height', None) or default_height
-            try:
-                px = int(float(height) * 96.0 / 72.0)
-            except Exception:
-                px = int(default_height * 96.0 / 72.0)
-            return max(px, 12)
-
-        # For each data cell, create a triangle PNG sized to the approximate cell pixels for AM/PM flags
-        max_row = row - 1
-        for r_idx in range(2, max_row + 1):
-            # Determine student key for this row (skip if not present)
-            key = row_key_map.get(r_idx)
-            if not key:
-                continue
-            for d in range(1, today.day + 1):
-                col_idx = 2 + d
-                col_letter = openpyxl.utils.get_column_letter(col_idx)
-                try:
-                    # flags from att_flags mapping
-                    flags = 0
-                    if key in att_flags and d in att_flags[key]:
-                        flags = att_flags[key][d]
-                    if not flags:
-                        continue
+    Query: ?month=YYYY-MM (default: this month) and optionally ?section=<id>.
+    """
+    if not presence_matrix.available():
+        return Response({'error': 'numpy not installed on server'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    section = _section_param(request.query_params)
+    raw = request.query_params.get('month')
+    if raw:
+        month = parse_date(f"{raw}-01")
+        if month is None:
+            return Response({'error': 'month must be YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        month = timezone.localdate()
+    return Response(sf2_month_summary(month.year, month.month, section_id=section))
 
-                    cell_w = get_column_width_pixels(ws, col_letter)
-                    cell_h = get_row_height_pixels(ws, r_idx)
 
-                    img_w, img_h = max(4, cell_w), max(4, cell_h)
-                    pil_img = PILImage.new('RGBA', (img_w, img_h), (255, 255, 255, 0))
-                    draw = ImageDraw.Draw(pil_img)
+@api_view(['GET'])
+def archived_school_years(request):
+    """Index of school years moved to archive files (see the archive_school_year command)."""
+    entries = ArchivedSchoolYear.objects.order_by('-school_year')
+    return Response(ArchivedSchoolYearSerializer(entries, many=True).data)
 
-                    # AM triangle -> top-right (green)
-                    if flags & AM_FLAG:
-                        am_pts = [(img_w, 0), (img_w, img_h), (0, 0)]
-                        draw.polygon(am_pts, fill=(67, 160, 71, 255))
-                        try:
-                            draw.line([am_pts[0], am_pts[1]], fill=(0,0,0,255), width=1)
-                            draw.line([am_pts[1], am_pts[2]], fill=(0,0,0,255), width=1)
-                            draw.line([am_pts[2], am_pts[0]], fill=(0,0,0,255), width=1)
-                        except Exception:
-                            pass
 
-                    # PM triangle -> bottom-left (green)
-                    if flags & PM_FLAG:
-                        pm_pts = [(0, img_h), (img_w, img_h), (0, 0)]
-                        draw.polygon(pm_pts, fill=(67, 160, 71, 255))
-                        try:
-                            draw.line([pm_pts[0], pm_pts[1]], fill=(0,0,0,255), width=1)
-                            draw.line([pm_pts[1], pm_pts[2]], fill=(0,0,0,255), width=1)
-                            draw.line([pm_pts[2], pm_pts[0]], fill=(0,0,0,255), width=1)
-                        except Exception:
-                            pass
-
-                    img_bytes = io.BytesIO()
-                    pil_img.save(img_bytes, format='PNG')
-                    img_bytes.seek(0)
-
-                    ximg = OpenpyxlImage(img_bytes)
-                    ximg.width = img_w
-                    ximg.height = img_h
-                    anchor = f"{col_letter}{r_idx}"
-                    ws.add_image(ximg, anchor)
-                except Exception:
-                    # If anything fails for a cell, continue — we still want the workbook to be returned
-                    continue
-    except Exception:
-        # Pillow not available or unexpected error — skip adding images
-        pass
+@api_view(['GET'])
+def archived_export(request, school_year):
+    """Regenerate an archived school year's SF2 workbook from its archive file.
 
-    # ------ Server-side shading for absent 'X' cells ------
-    # Use openpyxl PatternFill to shade cells containing 'X' so shading works even if Pillow
-    # is not installed in the environment. This is faster and more reliable than image overlays
-    # for full-cell coloring.
+    Query: ?include_names=1 and ?section=<id> as for live exports. Returns the download URL.
+    """
+    if openpyxl is None:
+        return Response({'error': 'openpyxl not installed on server'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    section = _section_param(request.query_params)
+    include_names = request.query_params.get('include_names', '').lower() in ('1', 'true', 'yes')
     try:
-        import re
-        # only match an exact single-character X-like glyph
-        x_re = re.compile(r"^[xX\u2715\u2716\u00D7\u2718\u2717]$")
-        from openpyxl.styles import PatternFill as _PatternFill
-
-        # determine fill color (ARGB) - use pale red
-        _fill_hex = 'FFD6D6'
-        if len(_fill_hex) == 6 and not _fill_hex.upper().startswith('FF'):
-            _fill_argb = 'FF' + _fill_hex
-        elif len(_fill_hex) == 8 and _fill_hex.upper().startswith('FF'):
-            _fill_argb = _fill_hex
-        else:
-            _fill_argb = 'FF' + _fill_hex
-
-        _fill = _PatternFill(fill_type='solid', start_color=_fill_argb, end_color=_fill_argb)
-
-        max_row = row - 1 if 'row' in locals() else wb.active.max_row
-        for r_idx in range(2, max_row + 1):
-            for d in range(1, today.day + 1):
-                try:
-                    col_idx = 2 + d
-                    cell = ws.cell(row=r_idx, column=col_idx)
-                    v = cell.value
-                    if v is None:
-                        continue
+        filename = archive.export_school_year(school_year, include_names=include_names, section_id=section)
+    except archive.ArchiveError as e:
+        return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'filename': filename, 'url': f"/exports/{filename}"}, status=status.HTTP_201_CREATED)
 
-                    # Skip formula cells entirely - we don't want to match "x" inside formulas
-                    if getattr(cell, 'data_type', None) == 'f':
-                        continue
-                    if isinstance(v, str) and v.startswith('='):
-                        continue
 
-                    s = str(v).strip()
-                    if not s:
-                        continue
+@api_view(['GET'])
+def archived_summary(request, school_year):
+    """SF2 summary figures for an archived school year, read from its archive file.
 
-                    # require exact match (single glyph) rather than substring search
-                    if not x_re.fullmatch(s):
-                        continue
+    Query: ?month=YYYY-MM for one month (default: every month of the year), ?section=<id>.
+    """
+    if not presence_matrix.available():
+        return Response({'error': 'numpy not installed on server'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    section = _section_param(request.query_params)
+    raw = request.query_params.get('month')
+    if raw:
+        month = parse_date(f"{raw}-01")
+        if month is None:
+            return Response({'error': 'month must be YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+        months = [(month.year, month.month)]
+    else:
+        months = school_year_months(school_year)
+    try:
+        summaries = [archive.month_summary(school_year, y, m, section_id=section) for y, m in months]
+    except archive.ArchiveError as e:
+        return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    return Response(summaries[0] if raw else summaries)
 
-                    # Apply a solid PatternFill so Excel will show the pale-red shading
-                    try:
-                        cell.fill = _fill
-                    except Exception:
-                        # best-effort: ignore if fill cannot be applied
-                        pass
-                except Exception:
-                    continue
-    except Exception:
-        # If anything unexpected happens, continue without blocking the export
-        pass
 
-    # Save workbook to exports
-    out_dir = settings.BASE_DIR / 'exports'
-    try:
-        os.makedirs(out_dir, exist_ok=True)
-    except Exception:
-        out_dir = os.path.join(str(settings.BASE_DIR), 'exports')
-        os.makedirs(out_dir, exist_ok=True)
+@api_view(['POST'])
+def create_export_job(request):
+    """Queue an export to run in the background instead of inside the request.
+
+    Body: {"kind": "month", "month": "YYYY-MM"},
+          {"kind": "school_year", "school_year": 2025, "include_names": true} or
+          {"kind": "all_sections", "school_year": 2025} (one workbook per section, zipped).
+    month and school_year exports accept "section": <id> to export one section only.
+    Returns 202 with the job; poll status_url for progress and the download url.
+    """
+    data = request.data
+    kind = data.get('kind') or ExportJob.KIND_MONTH
+    if kind not in jobs.RUNNERS or kind in ExportJob.MAINTENANCE_KINDS:
+        return Response({'error': f'Unknown export kind: {kind}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    params = {}
+    if kind == ExportJob.KIND_MONTH and data.get('month'):
+        month = parse_date(f"{data.get('month')}-01") if isinstance(data.get('month'), str) else None
+        if month is None:
+            return Response({'error': 'month must be YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+        params['month'] = month.strftime('%Y-%m')
+    if kind in (ExportJob.KIND_MONTH, ExportJob.KIND_SCHOOL_YEAR):
+        section = _section_param(data)
+        if section is not None:
+            if not Section.objects.filter(pk=section).exists():
+                return Response({'error': 'Section not found'}, status=status.HTTP_400_BAD_REQUEST)
+            params['section'] = section
+    if kind in (ExportJob.KIND_SCHOOL_YEAR, ExportJob.KIND_ALL_SECTIONS):
+        params['include_names'] = str(data.get('include_names', '')).lower() in ('1', 'true', 'yes')
+        if data.get('school_year') not in (None, ''):
+            try:
+                params['school_year'] = int(data.get('school_year'))
+            except (TypeError, ValueError):
+                return Response({'error': 'school_year must be a year, e.g. 2025'}, status=status.HTTP_400_BAD_REQUEST)
 
-    filename = f"attendance_server_export_{timezone.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    dest_path = out_dir / filename if hasattr(out_dir, '__truediv__') else os.path.join(out_dir, filename)
-    wb.save(dest_path)
+    return _queue_job(kind, params)
 
-    download_url = f"/exports/{filename}"
-    return Response({'filename': filename, 'url': download_url}, status=status.HTTP_201_CREATED)
+
+@api_view(['GET'])
+def export_job_status(request, pk):
+    """Progress of an export job; once status is 'done', url points at the saved file."""
+    jobs.resume_pending()
+    try:
+        job = ExportJob.objects.get(pk=pk)
+    except ExportJob.DoesNotExist:
+        return Response({'error': 'Export job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(ExportJobSerializer(job).data)
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def registrations_grouped(request):
-    """Return registrations grouped by sex (Male/Female) and sorted alphabetically by student name."""
+    """Return registrations grouped by sex (Male/Female) and sorted alphabetically by student name.
+
+    ?section=<id> limits the roster to one section.
+    """
     regs = Registration.objects.all()
-    males = regs.filter(sex__iexact='male').order_by('student')
-    females = regs.filter(sex__iexact='female').order_by('student')
+    section = _section_param(request.query_params)
+    if section is not None:
+        regs = regs.filter(section_id=section)
+
+    def grouped():
+        males = regs.filter(sex__iexact='male').order_by('student')
+        females = regs.filter(sex__iexact='female').order_by('student')
 
-    male_ser = RegistrationSerializer(males, many=True)
-    female_ser = RegistrationSerializer(females, many=True)
+        male_ser = RegistrationSerializer(males, many=True)
+        female_ser = RegistrationSerializer(females, many=True)
 
-    return Response({
-        'male': male_ser.data,
-        'female': female_ser.data,
-    })
+        return Response({
+            'male': male_ser.data,
+            'female': female_ser.data,
+        })
+
+    (version,), modified = versioning.stamp(versioning.REGISTRATION)
+    return _conditional(request, ('g', version), modified, grouped)
 
 
 @api_view(['POST'])
@@ -422,10 +792,15 @@ def drop_registration(request, pk):
             parent=reg.parent,
             guardian=reg.guardian,
             original_id=reg.id,
+            section_id=reg.section_id,
         )
 
         # delete original registration (this will cascade-delete attendances)
         reg.delete()
+        events.publish_on_commit(events.DROPPED, {
+            'id': dropped.id, 'registration': dropped.original_id, 'lrn': dropped.lrn,
+            'student': dropped.student, 'sex': dropped.sex, 'section': dropped.section_id,
+        })
 
         ser = DroppedRegistrationSerializer(dropped)
         return Response(ser.data, status=status.HTTP_201_CREATED)
@@ -436,12 +811,20 @@ def drop_registration(request, pk):
 
 @api_view(['GET'])
 def dropped_list(request):
-    try:
-        drops = DroppedRegistration.objects.all().order_by('-dropped_at')
-        ser = DroppedRegistrationSerializer(drops, many=True)
-        return Response(ser.data)
-    except Exception as e:
-        return Response({'error': f'Failed to fetch dropped list: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    section = _section_param(request.query_params)
+
+    def dropped():
+        try:
+            drops = DroppedRegistration.objects.all().order_by('-dropped_at')
+            if section is not None:
+                drops = drops.filter(section_id=section)
+            ser = DroppedRegistrationSerializer(drops, many=True)
+            return Response(ser.data)
+        except Exception as e:
+            return Response({'error': f'Failed to fetch dropped list: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    (version,), modified = versioning.stamp(versioning.DROPPED)
+    return _conditional(request, ('d', version), modified, dropped)
 
 
 @api_view(['POST'])
@@ -467,10 +850,16 @@ def restore_dropped(request, pk):
             sex=dropped.sex,
             parent=dropped.parent,
             guardian=dropped.guardian,
+            section_id=dropped.section_id,
         )
 
         # delete dropped record
+        dropped_id = dropped.id
         dropped.delete()
+        events.publish_on_commit(events.RESTORED, {
+            'id': reg.id, 'dropped': dropped_id, 'lrn': reg.lrn,
+            'student': reg.student, 'sex': reg.sex, 'section': reg.section_id,
+        })
 
         ser = RegistrationSerializer(reg)
         return Response(ser.data, status=status.HTTP_201_CREATED)
@@ -673,7 +1062,7 @@ def shade_x_cells_excel(request):
     try:
         template_path = settings.BASE_DIR.parent / 'public' / 'attendance_template.xlsx'
         if template_path.exists():
-            wb = openpyxl.load_workbook(str(template_path))
+            wb = template_registry.workbook(template_path)
         else:
             wb = openpyxl.Workbook()
     except Exception: